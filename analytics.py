@@ -0,0 +1,452 @@
+"""Incremental analytics over the submission log.
+
+Streams a JSONL or CSV export of the sheet, or the app's own spool (spool.py), in fixed-size chunks,
+appends every submission to a small columnar store (one raw NumPy file per column under
+analytics/, memory-mappable for ad-hoc analysis) and keeps running aggregates next to it:
+
+- accuracy per problem set (correct / almost / incorrect)
+- per-equation results per set and the most common mistakes (see diagnosis.py)
+- attempts until a student's currents were first correct (students identified by name or ID)
+- submissions by weekday and hour
+
+Submissions that name a course and assignment are graded against that assignment in the answer
+database (see answer_db.py) and counted per assignment, under keys like "PHY132-001/kirchhoff:3";
+submissions without a course use data/*.json and plain set numbers.
+
+The read position in the source is saved with the aggregates, so re-running after new rows arrive
+only reads the new tail. A source that was replaced or truncated is re-read from the start.
+
+    python analytics.py update submissions.jsonl
+    python analytics.py update --spool                 # spool/submissions.db (SUBMISSION_SPOOL)
+    python analytics.py report [--json]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+from answer_db import store_for, submission_assignment
+from diagnosis import get_index
+from equation_matcher import independent_rows, match_student_equations, solution_table, span_matches
+from grade_export import _equations, _number, _set_index
+from grading import ALMOST_CORRECT, CORRECT, INCORRECT, INVALID_SET, RESULT_LABELS, grade_currents, tolerance_rows
+from spool import SPOOL_PATH, Spool
+from store import get_store
+from student_sets import get_student_table
+
+ANALYTICS_DIR = "analytics"
+CHUNK_SIZE = 65536
+STATE_VERSION = 2
+
+# Columnar layout: name -> (dtype, values per row)
+COLUMNS = {
+    "timestamp": ("<i8", 1),    # wall-clock seconds as logged (naive times read as UTC); -1 if unknown
+    "kind": ("u1", 1),          # 0 currents, 1 equations
+    "assignment": ("<i4", 1),   # index into state["assignments"]; -1 for data/*.json
+    "set_number": ("<i4", 1),   # 0 if missing or invalid
+    "student": ("<i4", 1),      # index into state["students"]; -1 for anonymous submissions
+    "result": ("i1", 1),        # grading result code for currents; -1 for equations
+    "currents": ("<f8", 3),
+    "equations": ("<f8", 12),
+    "matches": ("u1", 1),       # bit i set when equation i+1 was correct
+    "independent": ("i1", 1),   # -1 for currents
+}
+
+KIND_CURRENTS, KIND_EQUATIONS = 0, 1
+LABEL_CODES = {str(label).lower(): code for code, label in enumerate(RESULT_LABELS)}
+
+
+class ColumnStore:
+    """ Append-only column files; the committed row count lives in the analytics state. """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def truncate(self, rows):
+        """ Drop rows past `rows` (left behind by an update that was interrupted before its checkpoint). """
+        for name, (dtype, width) in COLUMNS.items():
+            path = self._path(name)
+            size = rows * np.dtype(dtype).itemsize * width
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            if os.path.getsize(path) != size:
+                with open(path, "r+b") as file:
+                    file.truncate(size)
+
+    def append(self, columns):
+        for name, (dtype, width) in COLUMNS.items():
+            with open(self._path(name), "ab") as file:
+                file.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+    def column(self, name, rows):
+        """ A read-only memory map of one column (rows,) or (rows, width). """
+        dtype, width = COLUMNS[name]
+        if rows == 0:
+            return np.empty((0, width) if width > 1 else 0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=(rows, width) if width > 1 else (rows,))
+
+
+def empty_state(source):
+    return {
+        "version": STATE_VERSION,
+        "source": source,
+        "position": 0,
+        "header": None,
+        "rows": 0,
+        "students": [],
+        "assignments": [],       # [course, assignment] of every assignment seen
+        "set_results": {},       # set key (see _set_key) -> [correct, almost, incorrect, invalid]
+        "equation_results": {},  # set key -> [[correct, incorrect] per equation]
+        "mistakes": {},          # hint -> count
+        "attempts": {},          # "student|set key" -> [attempts so far, attempts when first correct (0 = not yet)]
+        "load": [[0] * 24 for _ in range(7)],  # weekday (Monday = 0) x hour
+    }
+
+
+def load_state(directory, source):
+    """ Saved state for `source`, or a fresh one if there is none or it belongs to another source. """
+    try:
+        with open(os.path.join(directory, "state.json"), "r") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return empty_state(source)
+    if state.get("version") != STATE_VERSION or state.get("source", {}).get("path") != source["path"]:
+        return empty_state(source)
+    return state
+
+
+def save_state(directory, state):
+    path = os.path.join(directory, "state.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as file:
+        json.dump(state, file)
+    os.replace(tmp, path)
+
+
+def _file_source(path):
+    stat = os.stat(path)
+    fmt = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+    return {"path": os.path.abspath(path), "type": fmt, "inode": stat.st_ino, "size": stat.st_size}
+
+
+def read_file_tail(path, state, limit):
+    """ Up to `limit` complete records after the saved byte position, with the position after each. """
+    records = []
+    with open(path, "rb") as file:
+        if state["source"]["type"] == "csv" and state["header"] is None:
+            first = file.readline()
+            if not first.endswith(b"\n"):
+                return records
+            state["header"] = next(csv.reader([first.decode("utf-8-sig")]))
+            state["position"] = file.tell()
+        file.seek(state["position"])
+        while len(records) < limit:
+            line = file.readline()
+            if not line.endswith(b"\n"):
+                break  # end of file, or a row still being written
+            position = file.tell()
+            text = line.decode("utf-8").strip()
+            if not text:
+                continue
+            if state["source"]["type"] == "jsonl":
+                try:
+                    record = json.loads(text)
+                except ValueError:
+                    continue
+            else:
+                record = dict(zip(state["header"], next(csv.reader([text]))))
+            records.append((position, record))
+    return records
+
+
+def read_spool_tail(spool, state, limit):
+    return spool.read(state["position"], limit)
+
+
+def _timestamp(value):
+    try:
+        moment = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return -1
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _set_key(state, assignment, set_number):
+    """ Aggregate key of a set: "3" for data/*.json, "PHY132-001/kirchhoff:3" for an assignment. """
+    if assignment < 0:
+        return str(set_number)
+    course, name = state["assignments"][assignment]
+    return f"{course}/{name}:{set_number}"
+
+
+def _key_order(key):
+    prefix, _, set_number = key.rpartition(":")
+    return prefix, int(set_number)
+
+
+def _stores(state, default):
+    """ Assignment index -> store, resolved once per update (-1 is data/*.json). """
+    stores = {-1: default}
+
+    def lookup(assignment):
+        if assignment not in stores:
+            stores[assignment] = store_for(tuple(state["assignments"][assignment]))
+        return stores[assignment]
+    return lookup
+
+
+def to_columns(records, state, stores):
+    """ Parse and grade one chunk of records into column arrays, plus each row's student ID ("" if none). """
+    n = len(records)
+    students = {name: i for i, name in enumerate(state["students"])}
+    assignments = {tuple(key): i for i, key in enumerate(state["assignments"])}
+    columns = {name: np.zeros((n, width) if width > 1 else n, dtype=dtype) for name, (dtype, width) in COLUMNS.items()}
+    student_ids = [""] * n
+    for i, record in enumerate(records):
+        columns["timestamp"][i] = _timestamp(record.get("timestamp"))
+        key = submission_assignment(record)
+        if key is not None and key not in assignments:
+            assignments[key] = len(state["assignments"])
+            state["assignments"].append(list(key))
+        columns["assignment"][i] = -1 if key is None else assignments[key]
+        is_equation = "student_equations" in record
+        columns["kind"][i] = KIND_EQUATIONS if is_equation else KIND_CURRENTS
+        student_ids[i] = str(record.get("student_id") or "").strip()
+        who = student_ids[i] or str(record.get("name") or "").strip()
+        if who:
+            if who not in students:
+                students[who] = len(state["students"])
+                state["students"].append(who)
+            columns["student"][i] = students[who]
+        else:
+            columns["student"][i] = -1
+        columns["currents"][i] = [_number(record.get(f"I{k}")) for k in (1, 2, 3)]
+        columns["equations"][i] = _equations(record.get("student_equations")).ravel() if is_equation else np.nan
+        label = str(record.get("result") or "").strip().lower()
+        columns["result"][i] = LABEL_CODES.get(label, -1) if not is_equation else -1
+
+    columns["independent"][:] = -1
+    # Each assignment's rows are graded against its own answer key
+    for assignment in np.unique(columns["assignment"]).tolist():
+        store = stores(assignment)
+        rows = np.flatnonzero(columns["assignment"] == assignment)
+        sets = _set_index([records[i].get("set_number") for i in rows], store.problems)
+        columns["set_number"][rows] = sets
+        currents = columns["kind"][rows] == KIND_CURRENTS
+        # Current rows without a logged result are graded with today's answer key
+        ungraded = currents & (columns["result"][rows] < 0)
+        if ungraded.any():
+            codes, _ = grade_currents(columns["currents"][rows[ungraded]], store.answers[sets[ungraded]],
+                                      tolerance_rows(store.tolerances[sets[ungraded]]))
+            columns["result"][rows[ungraded]] = codes
+
+        equations = rows[~currents]
+        if len(equations):
+            eqs = columns["equations"][equations].reshape(-1, 3, 4)
+            matches = span_matches(eqs, solution_table(store)[sets[~currents]]) & (sets[~currents] > 0)[:, None]
+            independent = independent_rows(eqs)
+            # Submissions graded against a student's own circuit are re-graded the same way
+            for j, i in enumerate(equations.tolist()):
+                if student_ids[i]:
+                    row_matches, row_independent = match_student_equations(student_ids[i], eqs[j])
+                    matches[j], independent[j] = row_matches, row_independent
+            columns["matches"][equations] = (matches * np.array([1, 2, 4])).sum(axis=1)
+            columns["independent"][equations] = independent
+    return columns, student_ids
+
+
+def _diagnosis(store, set_number, student_id):
+    """ The diagnosis index for the circuit a row was graded against, or None. """
+    if student_id:
+        table = get_student_table()
+        problem = None if table is None else table.problem(student_id)
+    else:
+        problem = store.problem(set_number) if set_number else None
+    return None if problem is None else get_index(*problem)
+
+
+def update_aggregates(state, columns, student_ids, stores):
+    """ Fold one chunk of columns into the running aggregates. """
+    kind, sets, results = columns["kind"], columns["set_number"], columns["result"]
+    assignments = columns["assignment"]
+    currents = kind == KIND_CURRENTS
+
+    set_results = state["set_results"]
+    counts = Counter(zip(assignments[currents].tolist(), sets[currents].tolist(), results[currents].tolist()))
+    for (assignment, set_number, code), count in counts.items():
+        if code >= 0:
+            set_results.setdefault(_set_key(state, assignment, set_number), [0, 0, 0, 0])[code] += count
+
+    equation_results = state["equation_results"]
+    for i in np.flatnonzero(~currents):
+        assignment, set_number = int(assignments[i]), int(sets[i])
+        slots = equation_results.setdefault(_set_key(state, assignment, set_number), [[0, 0] for _ in range(3)])
+        index = None
+        for k in range(3):
+            correct = bool(columns["matches"][i] >> k & 1)
+            slots[k][0 if correct else 1] += 1
+            if not correct:
+                index = index or _diagnosis(stores(assignment), set_number, student_ids[i])
+                hint = index and index.diagnose_equation(columns["equations"][i, 4 * k:4 * k + 4])
+                if hint:
+                    state["mistakes"][hint] = state["mistakes"].get(hint, 0) + 1
+
+    for i in np.flatnonzero(currents & (results == INCORRECT)):
+        index = _diagnosis(stores(int(assignments[i])), int(sets[i]), student_ids[i])
+        hint = index and index.diagnose_currents(columns["currents"][i])
+        if hint:
+            state["mistakes"][hint] = state["mistakes"].get(hint, 0) + 1
+
+    # Attempts until first correct, in log order, for students who gave a name or ID
+    attempts = state["attempts"]
+    for i in np.flatnonzero(currents & (columns["student"] >= 0) & (sets > 0)):
+        entry = attempts.setdefault(f"{columns['student'][i]}|{_set_key(state, assignments[i], sets[i])}", [0, 0])
+        if entry[1]:
+            continue
+        entry[0] += 1
+        if results[i] in (CORRECT, ALMOST_CORRECT):
+            entry[1] = entry[0]
+
+    stamps = columns["timestamp"][columns["timestamp"] >= 0]
+    if len(stamps):
+        # 1970-01-01 was a Thursday (weekday 3)
+        weekday = (stamps // 86400 + 3) % 7
+        hour = stamps % 86400 // 3600
+        load = np.array(state["load"]) + np.bincount(weekday * 24 + hour, minlength=7 * 24).reshape(7, 24)
+        state["load"] = load.tolist()
+
+
+def update(source_path=None, spool_path=None, directory=ANALYTICS_DIR, chunk_size=CHUNK_SIZE):
+    """ Process everything new in the source; returns the number of new submissions. """
+    if spool_path:
+        spool = Spool(spool_path)
+        source = {"path": os.path.abspath(spool_path), "type": "spool"}
+        state = load_state(directory, source)
+        read = lambda: read_spool_tail(spool, state, chunk_size)
+    else:
+        spool = None
+        source = _file_source(source_path)
+        state = load_state(directory, source)
+        previous = state["source"]
+        if previous.get("inode") != source["inode"] or source["size"] < state["position"]:
+            state = empty_state(source)  # replaced or truncated: start over
+        state["source"] = source
+        read = lambda: read_file_tail(source_path, state, chunk_size)
+
+    stores = _stores(state, get_store())
+    columns_store = ColumnStore(directory)
+    columns_store.truncate(state["rows"])
+    added = 0
+    try:
+        while True:
+            records = read()
+            if not records:
+                break
+            columns, student_ids = to_columns([record for _, record in records], state, stores)
+            update_aggregates(state, columns, student_ids, stores)
+            columns_store.append(columns)
+            state["rows"] += len(records)
+            state["position"] = records[-1][0]
+            save_state(directory, state)  # checkpoint after every chunk
+            added += len(records)
+    finally:
+        if spool is not None:
+            spool.close()
+    if not added:
+        save_state(directory, state)
+    return added
+
+
+def report(directory=ANALYTICS_DIR):
+    """ The aggregates in a readable shape. """
+    try:
+        with open(os.path.join(directory, "state.json"), "r") as file:
+            state = json.load(file)
+    except OSError:
+        return None
+    accuracy = {}
+    for set_number, counts in sorted(state["set_results"].items(), key=lambda item: _key_order(item[0])):
+        total = sum(counts)
+        accuracy[set_number] = {str(RESULT_LABELS[code]): count for code, count in enumerate(counts) if count or code != INVALID_SET}
+        accuracy[set_number]["submissions"] = total
+        accuracy[set_number]["correct_rate"] = round((counts[CORRECT] + counts[ALMOST_CORRECT]) / total, 3) if total else None
+    equations = {
+        set_number: [round(correct / (correct + wrong), 3) if correct + wrong else None for correct, wrong in slots]
+        for set_number, slots in sorted(state["equation_results"].items(), key=lambda item: _key_order(item[0]))
+    }
+    solved = [entry[1] for entry in state["attempts"].values() if entry[1]]
+    return {
+        "submissions": state["rows"],
+        "current_accuracy_by_set": accuracy,
+        "equation_accuracy_by_set": equations,
+        "common_mistakes": Counter(state["mistakes"]).most_common(10),
+        "attempts_to_correct": {
+            "students_solved": len(solved),
+            "students_not_yet": len(state["attempts"]) - len(solved),
+            "mean": round(float(np.mean(solved)), 2) if solved else None,
+            "histogram": dict(sorted(Counter(min(n, 10) for n in solved).items())),  # 10 means 10 or more
+        },
+        "load_by_hour": np.array(state["load"]).sum(axis=0).tolist(),
+        "load_by_weekday": np.array(state["load"]).sum(axis=1).tolist(),
+    }
+
+
+def print_report(summary, out=sys.stdout):
+    print(f"Submissions: {summary['submissions']}", file=out)
+    print("\nCurrents, correct or almost correct by set:", file=out)
+    for set_number, row in summary["current_accuracy_by_set"].items():
+        rate = "n/a" if row["correct_rate"] is None else f"{row['correct_rate']:.0%}"
+        print(f"  Set {set_number:>3}: {rate:>5} of {row['submissions']}", file=out)
+    print("\nEquations correct by set (Eq 1 / Eq 2 / Eq 3):", file=out)
+    for set_number, rates in summary["equation_accuracy_by_set"].items():
+        print(f"  Set {set_number:>3}: " + " / ".join("n/a" if r is None else f"{r:.0%}" for r in rates), file=out)
+    print("\nMost common mistakes:", file=out)
+    for hint, count in summary["common_mistakes"]:
+        print(f"  {count:6d}  {hint}", file=out)
+    attempts = summary["attempts_to_correct"]
+    print(f"\nAttempts until correct: mean {attempts['mean']} over {attempts['students_solved']} solved "
+          f"({attempts['students_not_yet']} not yet)", file=out)
+    busiest = int(np.argmax(summary["load_by_hour"])) if any(summary["load_by_hour"]) else None
+    if busiest is not None:
+        print(f"Busiest hour: {busiest:02d}:00-{busiest + 1:02d}:00 ({summary['load_by_hour'][busiest]} submissions)", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental analytics over the submission log.")
+    parser.add_argument("--dir", default=ANALYTICS_DIR, help="where the columns and aggregates are kept")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update_parser = commands.add_parser("update", help="process new submissions")
+    update_parser.add_argument("source", nargs="?", help="CSV or JSONL export")
+    update_parser.add_argument("--spool", nargs="?", const=SPOOL_PATH, help="read the app's spool instead")
+    report_parser = commands.add_parser("report", help="print the aggregates")
+    report_parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "update":
+        if not args.source and not args.spool:
+            parser.error("give an export file or --spool")
+        added = update(args.source, args.spool, args.dir)
+        print(f"Processed {added} new submissions.")
+        return
+    summary = report(args.dir)
+    if summary is None:
+        parser.exit(1, "No analytics yet; run 'python analytics.py update <source>' first.\n")
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Answer keys for several courses and assignments in one SQLite database.
+
+data/javab.json and data/problems.json hold one course's sets. This database holds any number of
+them, one row per (course, assignment, set) with the circuit, the answer key and the tolerance
+bands, under a primary key so loading an assignment is a single indexed range read:
+
+    python answer_db.py import PHY132-001 kirchhoff      # from data/*.json (see --answers etc.)
+    python answer_db.py list
+    python answer_db.py show PHY132-001 kirchhoff
+
+Nothing is read until an assignment is first asked for. Loaded assignments are kept in a small LRU
+shared by every session (ANSWER_DB_CACHE of them), each with the same interface as
+store.ProblemStore, so memory depends on how many assignments are in use, not on how many exist.
+Reads go through a pool of read-only connections; importing an assignment (in place, in one
+transaction) is noticed within CHECK_INTERVAL seconds and drops the cached copies.
+
+The app picks an assignment from its link: ?course=PHY132-001&assignment=kirchhoff, and logs both
+with each submission; grade_export.py, analytics.py and the grading API look them up again with
+store_for().
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from store import ANSWERS_PATH, CHECK_INTERVAL, PROBLEMS_PATH, TOLERANCES_PATH, ProblemStore, get_store
+
+ANSWER_DB_PATH = os.environ.get("ANSWER_DB", "data/answers.db")
+ANSWER_DB_POOL = int(os.environ.get("ANSWER_DB_POOL", "4"))      # read-only connections
+ANSWER_DB_CACHE = int(os.environ.get("ANSWER_DB_CACHE", "32"))   # assignments kept in memory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sets (
+    course TEXT NOT NULL,
+    assignment TEXT NOT NULL,
+    set_number INTEGER NOT NULL,
+    V1 REAL NOT NULL, V2 REAL NOT NULL, R1 REAL NOT NULL, R2 REAL NOT NULL, R3 REAL NOT NULL,
+    I1 REAL NOT NULL, I2 REAL NOT NULL, I3 REAL NOT NULL,
+    T1 REAL, T2 REAL, T3 REAL,
+    PRIMARY KEY (course, assignment, set_number)
+) WITHOUT ROWID
+"""
+
+SELECT_ASSIGNMENT = ("SELECT set_number, V1, V2, R1, R2, R3, I1, I2, I3, T1, T2, T3 FROM sets "
+                     "WHERE course = ? AND assignment = ? ORDER BY set_number")
+SELECT_SUMMARY = ("SELECT course, assignment, COUNT(*), MIN(set_number), MAX(set_number) FROM sets "
+                  "GROUP BY course, assignment ORDER BY course, assignment")
+
+
+class ConnectionPool:
+    """ Up to `size` read-only connections, opened on demand and shared across threads. """
+
+    def __init__(self, path, size=ANSWER_DB_POOL):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """ Borrow a connection (waiting for one if all `size` are in use). """
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            except sqlite3.DatabaseError:
+                conn.close()
+                raise
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+class Assignment(ProblemStore):
+    """ One assignment's sets, with the same tables and lookups as ProblemStore. """
+
+    def __init__(self, course, assignment, rows):
+        self.course = course
+        self.assignment = assignment
+        problems = {row[0]: row[1:6] for row in rows}
+        answers = {row[0]: row[6:9] for row in rows}
+        tolerances = {row[0]: row[9:12] for row in rows if None not in row[9:12]}
+        self._install(answers, problems, tolerances)
+
+    def refresh(self, force=False):
+        # The database notices imports and replaces the whole Assignment (see AnswerDB.assignment)
+        return False
+
+
+class AnswerDB:
+    """ Lazily loaded assignments from the database at `path`, behind a shared LRU. """
+
+    def __init__(self, path=ANSWER_DB_PATH, pool_size=ANSWER_DB_POOL, cache_size=ANSWER_DB_CACHE,
+                 check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._cache = OrderedDict()  # (course, assignment) -> Assignment, or None if it has no sets
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self._checked = time.monotonic()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check(self):
+        """ Drop every cached assignment when the database file has changed. """
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        try:
+            stamp = self._file_stamp()
+        except OSError:
+            return
+        if stamp != self._stamp:
+            with self._lock:
+                self._cache.clear()
+                self._stamp = stamp
+
+    def assignment(self, course, assignment):
+        """ The Assignment for (course, assignment), or None if the database has no sets for it. """
+        self._check()
+        key = (course, assignment)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        with self.pool.connection() as conn:
+            rows = conn.execute(SELECT_ASSIGNMENT, key).fetchall()
+        loaded = Assignment(course, assignment, rows) if rows else None
+        with self._lock:
+            self._cache[key] = loaded
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return loaded
+
+    def summary(self):
+        """ [(course, assignment, set count, first set, last set)] for everything in the database. """
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_SUMMARY).fetchall()
+
+
+def import_assignment(course, assignment, answers_path=ANSWERS_PATH, problems_path=PROBLEMS_PATH,
+                      tolerances_path=TOLERANCES_PATH, path=ANSWER_DB_PATH):
+    """ Replace an assignment's sets with those in JSON files laid out like data/*.json. Returns the set count. """
+    source = ProblemStore(answers_path, problems_path, tolerances_path=tolerances_path)
+    rows = []
+    for set_number in source.set_numbers:
+        tolerance = source.tolerance(set_number) or [None] * 3
+        rows.append((course, assignment, set_number, *source.problem(set_number), *source.answer(set_number), *tolerance))
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(SCHEMA)
+            conn.execute("DELETE FROM sets WHERE course = ? AND assignment = ?", (course, assignment))
+            conn.executemany("INSERT INTO sets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+# Shared by every session in the process, like the store
+_db = {"path": None, "db": None}
+_db_lock = threading.Lock()
+
+
+def get_answer_db(path=ANSWER_DB_PATH):
+    """ The process-wide AnswerDB, or None when no database has been created. """
+    if _db["path"] != path:
+        if not os.path.exists(path):
+            return None
+        with _db_lock:
+            if _db["path"] != path:
+                _db["db"] = AnswerDB(path)
+                _db["path"] = path
+    return _db["db"]
+
+
+def get_assignment(course, assignment):
+    """ The assignment's store, or None when there is no database or no such assignment. """
+    db = get_answer_db()
+    return None if db is None else db.assignment(course, assignment)
+
+
+def submission_assignment(record):
+    """ (course, assignment) named by a logged submission or API request, or None when it has no course. """
+    course = str(record.get("course") or "").strip()
+    return (course, str(record.get("assignment") or "").strip()) if course else None
+
+
+def store_for(key, default=None):
+    """ The answer key for submission_assignment() `key`: data/*.json (or `default`) when None.
+
+    An assignment that is not in the database gets an empty store, so its submissions grade as
+    unknown sets instead of against another course's answer key.
+    """
+    if key is None:
+        return default or get_store()
+    return get_assignment(*key) or Assignment(*key, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the multi-course answer key database.")
+    parser.add_argument("--db", default=ANSWER_DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="load an assignment from JSON files (replacing it)")
+    import_parser.add_argument("course")
+    import_parser.add_argument("assignment")
+    import_parser.add_argument("--answers", default=ANSWERS_PATH)
+    import_parser.add_argument("--problems", default=PROBLEMS_PATH)
+    import_parser.add_argument("--tolerances", default=TOLERANCES_PATH)
+    commands.add_parser("list", help="list courses and assignments")
+    show_parser = commands.add_parser("show", help="print an assignment's sets")
+    show_parser.add_argument("course")
+    show_parser.add_argument("assignment")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        count = import_assignment(args.course, args.assignment, args.answers, args.problems, args.tolerances, args.db)
+        print(f"Imported {count} sets into {args.course}/{args.assignment} ({args.db})")
+        return
+    if not os.path.exists(args.db):
+        parser.exit(1, f"{args.db} does not exist; import an assignment first.\n")
+    db = AnswerDB(args.db)
+    if args.command == "list":
+        for course, assignment, count, first, last in db.summary():
+            print(f"{course}/{assignment}: {count} sets ({first}-{last})")
+        return
+    store = db.assignment(args.course, args.assignment)
+    if store is None:
+        parser.exit(1, f"No sets for {args.course}/{args.assignment}\n")
+    for set_number in store.set_numbers:
+        print(f"Set {set_number}: V1, V2, R1, R2, R3 = {store.problem(set_number)}  "
+              f"I1, I2, I3 = {store.answer(set_number)} mA  tolerance = {store.tolerance(set_number)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,35 @@
 
 import streamlit as st
 import json
-import requests
-import numpy as np
+import os
+import time
+import uuid
 from datetime import datetime
+import metrics
+from answer_db import get_assignment
+from assets import has_asset, picture_html
+from dedupe import get_gate
+from snapshot import get_startup_store
 
-# Normalize equations for comparison
-def normalize_equation(eq):
-    """ Normalize an equation by dividing all terms by the first nonzero coefficient. """
-    coeffs = np.array(eq, dtype=np.float64)
-    nonzero_indices = np.nonzero(coeffs[:-1])[0]  # Find nonzero coefficients (ignore constant term)
-    
-    if len(nonzero_indices) == 0:  # If all coefficients are zero, return as-is to avoid errors
-        return coeffs
-            
-    first_nonzero = nonzero_indices[0]  # Get index of first nonzero coefficient
-    return coeffs / coeffs[first_nonzero]  # Normalize
-
-def compare_equations(student_eqs, expected_eqs):
-    """ Check if student equations match expected equations (within tolerance). """
-    normalized_student_eqs = [normalize_equation(eq) for eq in student_eqs]
-    normalized_expected_eqs = [normalize_equation(eq) for eq in expected_eqs]
-
-    matches = []
-    for stud_eq in normalized_student_eqs:
-        match_found = any(np.allclose(stud_eq, exp_eq, atol=0.1) for exp_eq in normalized_expected_eqs)
-        matches.append(match_found)
-    
-    return matches
+# Grading and hints (NumPy), diagram drawing and logging (requests) are imported where they are first
+# used, so after an idle sleep the page is drawn before any of them load (see benchmarks/bench_startup.py)
 
-def check_linear_independence(equations):
-    """ Check if the given equations are linearly independent. """
-    coeff_matrix = np.array([eq[:-1] for eq in equations])  # Exclude the constant term
-    rank = np.linalg.matrix_rank(coeff_matrix)
-    return rank == len(equations)
+# Time the whole script run (see metrics.py; free when metrics are disabled)
+run_started = time.perf_counter()
 
-# Google Apps Script Web App URL
-APPS_SCRIPT_URL = "https://script.google.com/macros/s/AKfycbwYkzqimnnqLgoWS6BSmmpRbwPPMsPV-K2OZcBMcSRVlmFl-akUPRNf7nXBhKF1hg5J/exec"
-
-# Log Submission to Google Sheets via Apps Script
-def log_submission_to_apps_script(set_number, I1, I2, I3, result, name=""):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    gs_result = ""
+# Result label as stored in the Google Sheet
+def result_label(result):
     if result.startswith("✅"):
-        gs_result = "Correct"
+        return "Correct"
     elif result.startswith("⚠️"):
-        gs_result = "Almost correct"
+        return "Almost correct"
     else:
-        gs_result = "Incorrect"
+        return "Incorrect"
+
+# Log Submission to Google Sheets via Apps Script (sent in the background, see submission_logger.py)
+def log_submission_to_apps_script(set_number, I1, I2, I3, result, name="", student_id="", course=None):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    gs_result = result_label(result)
 
     payload = {
         "timestamp": timestamp,
@@ -58,11 +40,16 @@ def log_submission_to_apps_script(set_number, I1, I2, I3, result, name=""):
         "result": gs_result,
         "name": name
     }
-    requests.post(APPS_SCRIPT_URL, json=payload)
+    if student_id:
+        payload["student_id"] = student_id
+    if course:
+        payload["course"], payload["assignment"] = course
+    from submission_logger import log_payload
+    log_payload(payload)
 
 
 # Log Kirchhoff Submission to Google Sheets via Apps Script
-def log_Kirchhoff_submission_to_apps_script(set_number, student_eqs, name=""):
+def log_Kirchhoff_submission_to_apps_script(set_number, student_eqs, name="", student_id="", course=None):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Convert student equations to a JSON string
@@ -76,37 +63,34 @@ def log_Kirchhoff_submission_to_apps_script(set_number, student_eqs, name=""):
         "student_equations": student_eqs_str,  # Send equations as a string
         "sheet": "Kirchhoff_Submissions"  # Specify the target sheet name (must be handled in Apps Script)
     }
-
-    # Send the data to Google Apps Script
-    response = requests.post(APPS_SCRIPT_URL, json=payload)
-
-    # Optional: Print response for debugging
-    if response.status_code == 200:
-        print("Submission logged successfully.")
-    else:
-        print(f"Error logging submission: {response.text}")
-        
-# Load javab from the JSON file
-with open('data/javab.json', 'r') as file:
-    javab = json.load(file)
-
-# Tolerance for rounding (in mA)
-tolerance = 1
-
-# Load problem sets from JSON file
-with open("data/problems.json", "r") as file:
-    problems = json.load(file)
-    
-# Function to compute Kirchhoff equation coefficients
-def compute_kirchhoff_coefficients(V1, V2, R1, R2, R3):
-    eq1 = (1, -1, -1, 0)  # I1 - I2 - I3 = 0 (Junction rule)
-    eq2 = (-R1, 0, -R3, V1)  # V1 - R3 I3 - R1 I1 = 0 (Left loop)
-    eq3 = (0, R2, -R3, -V2)  # V2 + R2 I2 - R3 I3 = 0 (Right loop)
-    eq4 = (-R1, -R2, 0, V1 - V2)  # V1 - R2 I2 - V2 - R1 I1 = 0 (Big loop)
-    return [eq1, eq2, eq3, eq4]
+    if student_id:
+        payload["student_id"] = student_id
+    if course:
+        payload["course"], payload["assignment"] = course
+
+    # Queue the data for Google Apps Script; errors are reported by the background logger
+    from submission_logger import log_payload
+    log_payload(payload)
+
+# Answer key and problem sets: the course's assignment when the link names one (?course=...&assignment=...,
+# see answer_db.py), otherwise data/*.json via its startup snapshot (see snapshot.py). Both are loaded
+# once per process and shared by every session.
+course = (st.query_params.get("course", "").strip(), st.query_params.get("assignment", "").strip())
+with metrics.span("load_store"):
+    store = get_assignment(*course) if all(course) else None
+    if store is None:
+        course = None
+        store = get_startup_store()
+
+# Fallback location of the diagrams and logo when static/assets/ hasn't been built (see build_assets.py)
+ASSET_BASE_URL = os.environ.get("ASSET_BASE_URL", "https://raw.githubusercontent.com/ZAKI1905/phy132-kirchhoff-checker/main")
 
 # Title
 st.title("PHY 132 - Kirchhoff Current Checker")
+if course:
+    st.caption(f"{course[0]} · {course[1]}")
+elif st.query_params.get("course"):
+    st.warning("This link's course or assignment was not found, so the default problem sets are shown.")
 
 # Intro Text
 st.write("Welcome to the Kirchhoff Current Checker for PHY 132 at Eastern Kentucky University. 🤓")
@@ -126,17 +110,59 @@ with st.expander("📚 Kirchhoff’s Rules Recap"):
 name = st.text_input("Optional: Enter your name (leave blank if you prefer to remain anonymous 🫣)")
 
 # Select Problem Set
-set_number = st.number_input("Select your problem set number (1 to 10):", min_value=1, max_value=10, step=1)
+first_set, last_set = store.set_numbers[0], store.set_numbers[-1]
+set_number = st.number_input(f"Select your problem set number ({first_set} to {last_set}):",
+                             min_value=first_set, max_value=last_set, step=1)
+
+# Per-student circuits, when the instructor has built a roster table (see student_sets.py)
+student_table = None
+if os.path.exists(os.environ.get("STUDENT_SETS", "data/students.bin")):  # same default as student_sets.TABLE_PATH
+    from student_sets import get_student_table
+    student_table = get_student_table()
+student_id = ""
+if student_table is not None:
+    student_id = st.text_input("Student ID (for your personal circuit; leave blank to use the set number above)").strip()
+    if student_id and student_table.lookup(student_id) is None:
+        st.warning("That student ID is not on the class roster, so the problem set number above is used.")
+        student_id = ""
 
 # Get corresponding circuit parameters
-V1, V2, R1, R2, R3 = problems[str(set_number)]
-
-# Display corresponding circuit diagram
-diagram_path = f"https://raw.githubusercontent.com/ZAKI1905/phy132-kirchhoff-checker/main/Diagrams/circuit_set_{set_number}.png"
-st.image(diagram_path, caption=f"Problem Set {set_number} Circuit Diagram")
-
-# Compute expected Kirchhoff equations dynamically
-expected_eqs = compute_kirchhoff_coefficients(V1, V2, R1, R2, R3)
+with metrics.span("load_problem"):
+    if student_id:
+        V1, V2, R1, R2, R3 = student_table.problem(student_id)
+    else:
+        problem = store.problem(set_number)
+        if problem is None:
+            st.error(f"There is no problem set {set_number}. Please check with your instructor.")
+            st.stop()
+        V1, V2, R1, R2, R3 = problem
+
+# Feedback is only shown for the circuit it was given for
+if student_id:
+    problem_key = f"student:{student_id}"
+elif course:
+    problem_key = f"{course[0]}/{course[1]}:{set_number}"
+else:
+    problem_key = set_number
+
+# Display corresponding circuit diagram (served by the app itself, sized for the device)
+diagram_path = f"Diagrams/circuit_set_{set_number}.png"
+with metrics.span("diagram"):
+    if student_id or course or not has_asset(diagram_path):
+        from diagram_renderer import problem_netlist, render, render_problem
+    if student_id:
+        st.image(render(problem_netlist(V1, V2, R1, R2, R3)).decode(), caption="Your Circuit Diagram", width="stretch")
+    elif course:
+        st.image(render(problem_netlist(V1, V2, R1, R2, R3)).decode(), caption=f"Problem Set {set_number} Circuit Diagram",
+                 width="stretch")
+    elif has_asset(diagram_path):
+        diagram = picture_html(diagram_path, f"Problem Set {set_number} circuit diagram", f"{ASSET_BASE_URL}/{diagram_path}",
+                               sizes="(max-width: 736px) 100vw, 704px")
+        st.markdown(f'<figure style="margin: 0;">{diagram}<figcaption style="text-align: center; font-size: 0.875rem; opacity: 0.6;">'
+                    f'Problem Set {set_number} Circuit Diagram</figcaption></figure>', unsafe_allow_html=True)
+    else:
+        # No prepared image for this set: draw it from its parameters (cached, see diagram_renderer.py)
+        st.image(render_problem(set_number).decode(), caption=f"Problem Set {set_number} Circuit Diagram", width="stretch")
 
 # Input Fields for Kirchhoff Coefficients
 st.write("### Enter your Kirchhoff equation coefficients in the following format:")
@@ -150,70 +176,167 @@ st.markdown(r"""
 """, unsafe_allow_html=True)
 
 coeff_labels = ["I1", "I2", "I3", "Constant"]
-student_eqs = []
 
-for i in range(3):
-    st.write(f"#### Equation {i+1}")
-    eq = [st.number_input(f"Eq {i+1}: Coefficient of {label}", value=0.0, format="%.2f") for label in coeff_labels]
-    student_eqs.append(eq)
+# Latest feedback per section, kept in session state so it survives reruns of the rest of the page
+results = st.session_state.setdefault("results", {})
+
+# Repeated submissions get their cached feedback and new ones are rate limited per session (see dedupe.py)
+gate = get_gate()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
 
-# Check Kirchhoff Equations
-if st.button("Check Kirchhoff Equations"):
-    matches = compare_equations(student_eqs, expected_eqs)
+def show_rate_limited():
+    st.warning(f"⏳ You're submitting very quickly. Please wait {gate.retry_after(session_id):.0f} s and try again.")
 
-    if not check_linear_independence(student_eqs):
+def show_equation_feedback(matches, independent, hints):
+    if not independent:
         st.error("⚠️ Your equations are not linearly independent! You may have repeated the same equation multiple times.")
 
     feedback_messages = []
-    for i, match in enumerate(matches):
+    for i, (match, hint) in enumerate(zip(matches, hints)):
         if match:
             feedback_messages.append(f"✅ Equation {i+1} is correctly set up.")
         else:
             feedback_messages.append(f"❌ Equation {i+1} does not match any expected Kirchhoff equation. Check signs and coefficients.")
+            if hint:
+                feedback_messages.append(f"💡 Equation {i+1} looks like {hint}.")
 
     st.write("\n".join(feedback_messages))
-    log_Kirchhoff_submission_to_apps_script(set_number, student_eqs, name)
-    
-# Input Fields for Currents
-st.write("### Enter your calculated currents (in mA)")
-I1 = st.number_input("Current I1 (mA)", value=0.0, format="%.2f")
-I2 = st.number_input("Current I2 (mA)", value=0.0, format="%.2f")
-I3 = st.number_input("Current I3 (mA)", value=0.0, format="%.2f")
-
-# Check Answer Logic
-def is_close(actual, expected, tol=tolerance):
-    return abs(actual - expected) <= tol
-
-def check_answer(set_number, I1, I2, I3):
-    if str(set_number) not in javab:
-        return "⚠️ Invalid set number. Please check with your instructor."
-    
-    correct = javab[str(set_number)]
-    close_match = all(is_close(student, correct_value) for student, correct_value in zip([I1, I2, I3], correct))
-
-    if [I1, I2, I3] == correct:
-        return "✅ Correct! All currents exactly match the answer key."
-    elif close_match:
-        differences = [abs(student - correct_value) for student, correct_value in zip([I1, I2, I3], correct)]
-        diff_message = "\n".join([f"I{index+1}: off by {diff:.2f} mA" for index, diff in enumerate(differences)])
-        return f"⚠️ Almost correct (within rounding tolerance).\n{diff_message}"
+
+def live_matcher(problem_key, problem, create=True):
+    """ This session's live checker for the circuit, kept in session state across reruns (None until `create`). """
+    live = st.session_state.get("live_equations")
+    if live is None or live[0] != problem_key:
+        if not create:
+            return None
+        from live_check import LiveMatcher
+        # The snapshot stores each set's solution vector; other stores and per-student circuits are solved with NumPy
+        solution = None if student_id or not hasattr(store, "solution") else store.solution(set_number)
+        live = (problem_key, LiveMatcher(solution) if solution else LiveMatcher.for_problem(problem))
+        st.session_state["live_equations"] = live
+    return live[1]
+
+def show_live_status(live, i, eq, problem):
+    # Only an equation whose coefficients changed is re-checked; the others keep their memoized result
+    if live.update(i, eq) and not live.matches[i] and any(eq[:-1]):
+        from diagnosis import get_index
+        live.hints[i] = get_index(*problem).diagnose_equation(eq)
+    if not any(eq[:-1]):
+        return
+    if live.matches[i]:
+        st.caption(f"✅ Equation {i+1} is a valid Kirchhoff equation for this circuit.")
+    elif live.hints[i]:
+        st.caption(f"❌ Not yet: equation {i+1} looks like {live.hints[i]}.")
     else:
-        return "❌ Incorrect. Try again!"
+        st.caption(f"❌ Equation {i+1} doesn't match a junction or loop rule for this circuit yet.")
+
+# Equations are entered inside a fragment: changing a coefficient reruns only this section and gives
+# live feedback for that equation, and submitting grades all three and logs them.
+@st.fragment
+def kirchhoff_equations_section(set_number, name, student_id, problem_key, problem):
+    live = live_matcher(problem_key, problem, create=False)
+    student_eqs = []
+    for i in range(3):
+        st.write(f"#### Equation {i+1}")
+        eq = [st.number_input(f"Eq {i+1}: Coefficient of {label}", value=0.0, format="%.2f") for label in coeff_labels]
+        student_eqs.append(eq)
+        # The checker is built when the first coefficient is entered, so the first paint stays free of NumPy
+        if live is None and any(eq[:-1]):
+            live = live_matcher(problem_key, problem)
+        if live is not None:
+            show_live_status(live, i, eq, problem)
+    if live is not None and all(any(eq[:-1]) for eq in student_eqs) and not live.independent():
+        st.caption("⚠️ These three equations are not linearly independent yet.")
+    submitted = st.button("Check Kirchhoff Equations")
+
+    def grade():
+        from diagnosis import equation_hints
+        from equation_matcher import match_equations, match_student_equations
+
+        # Any valid junction/loop equation for this circuit is accepted (see equation_matcher.py)
+        with metrics.span("grade_equations"):
+            if student_id:
+                matches, independent = match_student_equations(student_id, student_eqs)
+            else:
+                matches, independent = match_equations(set_number, student_eqs, store=store)
+        # Known mistakes are looked up in a precomputed index (see diagnosis.py)
+        return matches, independent, equation_hints(problem, student_eqs, matches)
+
+    # Check Kirchhoff Equations
+    if submitted:
+        outcome = gate.submit(session_id, "equations", problem_key, student_eqs, grade, store.version)
+        if outcome is None:
+            show_rate_limited()
+        else:
+            matches, independent, hints = outcome.result
+            results["equations"] = (problem_key, matches, independent, hints)
+            if outcome.fresh:
+                metrics.inc("kirchhoff_submissions_total", kind="equations", source="app")
+                metrics.inc("kirchhoff_outcomes_total", kind="equations", result="correct" if all(matches) and independent else "incorrect")
+                with metrics.span("log_submission"):
+                    log_Kirchhoff_submission_to_apps_script(set_number, student_eqs, name, student_id, course)
 
-# Submit Button
-if st.button("Check Answers"):
-    result = check_answer(set_number, I1, I2, I3)
-    log_submission_to_apps_script(set_number, I1, I2, I3, result, name)
+    previous = results.get("equations")
+    if previous and previous[0] == problem_key:
+        show_equation_feedback(*previous[1:])
+
+kirchhoff_equations_section(set_number, name, student_id, problem_key, (V1, V2, R1, R2, R3))
+
+def show_current_feedback(result, hint):
     if result.startswith("✅"):
         st.success(result)
     elif result.startswith("⚠️"):
         st.warning(result)
     else:
         st.error(result)
+        if hint:
+            st.info(f"💡 Hint: {hint}.")
+
+# Input Fields for Currents (in a form inside a fragment: typing doesn't rerun anything, and submitting
+# reruns only this section)
+@st.fragment
+def currents_section(set_number, name, student_id, problem_key, problem):
+    with st.form("currents"):
+        st.write("### Enter your calculated currents (in mA)")
+        I1 = st.number_input("Current I1 (mA)", value=0.0, format="%.2f")
+        I2 = st.number_input("Current I2 (mA)", value=0.0, format="%.2f")
+        I3 = st.number_input("Current I3 (mA)", value=0.0, format="%.2f")
+        submitted = st.form_submit_button("Check Answers")
+
+    def grade():
+        from diagnosis import current_hint
+        from grading import check_answer, check_student_answer
+
+        with metrics.span("grade_currents"):
+            if student_id:
+                result = check_student_answer(student_id, I1, I2, I3)
+            else:
+                result = check_answer(set_number, I1, I2, I3, store=store)
+        return result, current_hint(problem, [I1, I2, I3]) if result.startswith("❌") else None
+
+    # Submit Button
+    if submitted:
+        outcome = gate.submit(session_id, "currents", problem_key, [I1, I2, I3], grade, store.version)
+        if outcome is None:
+            show_rate_limited()
+        else:
+            result, hint = outcome.result
+            results["currents"] = (problem_key, result, hint)
+            if outcome.fresh:
+                metrics.inc("kirchhoff_submissions_total", kind="currents", source="app")
+                metrics.inc("kirchhoff_outcomes_total", kind="currents", result=result_label(result))
+                with metrics.span("log_submission"):
+                    log_submission_to_apps_script(set_number, I1, I2, I3, result, name, student_id, course)
+
+    previous = results.get("currents")
+    if previous and previous[0] == problem_key:
+        show_current_feedback(*previous[1:])
+
+currents_section(set_number, name, student_id, problem_key, (V1, V2, R1, R2, R3))
 
 
 # Footer with contact info and right-aligned EKU logo
-footer = '''
+logo = picture_html("img/PrimaryLogo_Maroon.png", "EKU logo", f"{ASSET_BASE_URL}/img/PrimaryLogo_Maroon.png", sizes="150px", width=150)
+footer = f'''
 ---
 <div style="display: flex; justify-content: space-between; align-items: center;">
     <div>
@@ -221,8 +344,16 @@ footer = '''
         For questions, contact: <b>Professor Zakeri</b> (m.zakeri@eku.edu)
     </div>
     <div>
-        <img src="https://raw.githubusercontent.com/ZAKI1905/phy132-kirchhoff-checker/main/img/PrimaryLogo_Maroon.png" width="150">
+        {logo}
     </div>
 </div>
 '''
 st.markdown(footer, unsafe_allow_html=True)
+
+# Instructor-only debug panel: open the app with ?debug=<INSTRUCTOR_TOKEN>
+if metrics.ENABLED:
+    metrics.observe("script_run", time.perf_counter() - run_started)
+    instructor_token = os.environ.get("INSTRUCTOR_TOKEN")
+    if instructor_token and st.query_params.get("debug") == instructor_token:
+        with st.expander("🔧 Metrics (instructor only)"):
+            st.code(metrics.render_prometheus(), language="text")
@@ -0,0 +1,61 @@
+import html
+import json
+import os
+
+# Built by build_assets.py; served by Streamlit from ./app/static/
+MANIFEST_PATH = "static/assets/manifest.json"
+STATIC_URL = "./app/static/assets"
+
+# MIME types in order of preference for <source> elements
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "png": "image/png"}
+
+_manifest = {"stamp": None, "data": {}}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """ The asset manifest, re-read only when the file changes ({} if it hasn't been built). """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if _manifest["stamp"] != stamp:
+        with open(path, "r") as file:
+            _manifest["data"] = json.load(file)
+        _manifest["stamp"] = stamp
+    return _manifest["data"]
+
+
+def has_asset(source_path):
+    return source_path in load_manifest()
+
+
+def _srcset(variants):
+    return ", ".join(f"{STATIC_URL}/{name} {width}w" for width, name, _ in variants)
+
+
+def picture_html(source_path, alt, fallback_url, sizes="100vw", width=None):
+    """ A responsive <picture> for a repo image, or a plain <img> of fallback_url if no variants exist.
+
+    The browser picks the first format it supports and the smallest width that covers `sizes`
+    at the device's pixel density. Without `width` the image scales to the container width.
+    """
+    alt = html.escape(alt, quote=True)
+    style = ' style="max-width: 100%; height: auto;"'
+    entry = load_manifest().get(source_path)
+    if not entry:
+        size = f' width="{width}"' if width else ""
+        return f'<img src="{html.escape(fallback_url, quote=True)}" alt="{alt}"{size}{style}>'
+
+    # Explicit dimensions let the browser reserve space before the image arrives
+    display_width = width or entry["width"]
+    display_height = round(entry["height"] * display_width / entry["width"])
+    sources = "".join(
+        f'<source type="{mime}" srcset="{_srcset(entry["variants"][fmt])}" sizes="{sizes}">'
+        for fmt, mime in MIME_TYPES.items() if fmt != "png" and fmt in entry["variants"]
+    )
+    png = entry["variants"]["png"]
+    return (
+        f'<picture>{sources}<img src="{STATIC_URL}/{png[-1][1]}" srcset="{_srcset(png)}" sizes="{sizes}" '
+        f'alt="{alt}" width="{display_width}" height="{display_height}"{style} decoding="async"></picture>'
+    )
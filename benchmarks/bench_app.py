@@ -0,0 +1,232 @@
+"""Headless load and latency benchmark for app.py.
+
+Drives the Streamlit script with AppTest across many simulated student sessions. Each session picks
+a problem set, fills the 12 equation inputs and 3 current inputs and submits both sections. Each
+equation edit is a rerun of its own, as in the browser where every change reruns the equation section
+for live feedback; those reruns are also reported separately (edit_*_ms). A local mock server stands in
+for APPS_SCRIPT_URL and for the GitHub-hosted images, so the run is offline and reproducible.
+
+    python benchmarks/bench_app.py --sessions 50 --concurrency 8   # 8 worker processes
+    python benchmarks/bench_app.py --save-baseline       # record benchmarks/baseline_app.json
+
+The committed baseline records the machine and settings it was taken with; timings from another
+machine are compared anyway but flagged, so re-record the baseline on the machine you compare on.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline_app.json")
+
+# Allowed slowdown against the baseline before a metric is reported as a regression
+REGRESSION_FACTOR = 1.25
+
+# Sessions per worker traced for memory use
+MEMORY_SESSIONS = 3
+
+
+class MockHandler(SimpleHTTPRequestHandler):
+    """ Serves the repo's Diagrams/ and img/ files and accepts Apps Script POSTs. """
+
+    posts = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with MockHandler.lock:
+            MockHandler.posts += 1
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    def log_message(self, *args):
+        pass
+
+
+def start_mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(MockHandler, directory=ROOT))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def widget(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"no widget labelled {label!r}")
+
+
+def timed_run(at, latencies):
+    start = time.perf_counter()
+    at.run()
+    latencies.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+def simulate_session(seed, latencies, edit_latencies):
+    """ One student's visit: returns the AppTest so its session state stays alive for memory accounting. """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    timed_run(at, latencies)
+
+    widget(at.number_input, "Select your problem set number (1 to 10):").set_value(rng.randint(1, 10))
+    timed_run(at, latencies)
+    # AppTest only reruns on run(), so each coefficient edit is run explicitly (the live check's cost)
+    for i in range(1, 4):
+        for label in ["I1", "I2", "I3", "Constant"]:
+            widget(at.number_input, f"Eq {i}: Coefficient of {label}").set_value(rng.choice([-220.0, -1.0, 1.0, 15.0]))
+            timed_run(at, edit_latencies)
+            latencies.append(edit_latencies[-1])
+    widget(at.button, "Check Kirchhoff Equations").click()
+    timed_run(at, latencies)
+    for i in range(1, 4):
+        widget(at.number_input, f"Current I{i} (mA)").set_value(round(rng.uniform(10, 60), 1))
+    widget(at.button, "Check Answers").click()
+    timed_run(at, latencies)
+    return at
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_sessions(seeds):
+    """ Run sessions one after another in this process (AppTest is not thread-safe).
+
+    Returns (rerun latencies, equation edit latencies, bytes still allocated per kept-alive session).
+    """
+    # Each worker gets its own spool so flushers don't deliver each other's rows
+    spool_dir = os.path.dirname(os.environ["SUBMISSION_SPOOL"])
+    os.environ["SUBMISSION_SPOOL"] = os.path.join(spool_dir, f"submissions-{os.getpid()}.db")
+
+    simulate_session(-1, [], [])  # warm-up: imports and first-load caches are not what we measure
+    latencies = []
+    edit_latencies = []
+    for seed in seeds:
+        simulate_session(seed, latencies, edit_latencies)
+
+    # Memory is measured on a few extra sessions kept alive; tracing would distort the timings above
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    apps = [simulate_session(seed, [], []) for seed in seeds[:MEMORY_SESSIONS]]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del apps
+
+    from submission_logger import get_logger
+    get_logger().flush(timeout=10)
+    return latencies, edit_latencies, retained / max(min(len(seeds), MEMORY_SESSIONS), 1)
+
+
+def run_benchmark(sessions, concurrency, seed=0):
+    """ Simulate `sessions` students spread over `concurrency` worker processes. """
+    seeds = list(range(seed, seed + sessions))
+    chunks = [seeds[i::concurrency] for i in range(concurrency) if seeds[i::concurrency]]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        results = list(pool.map(run_sessions, chunks))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for chunk, _, _ in results for latency in chunk]
+    edit_latencies = [latency for _, chunk, _ in results for latency in chunk]
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "reruns": len(latencies),
+        "reruns_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "edit_p50_ms": percentile(edit_latencies, 50) * 1000,
+        "edit_p95_ms": percentile(edit_latencies, 95) * 1000,
+        "memory_per_session_kb": statistics.fmean(memory for _, _, memory in results) / 1024,
+    }
+
+
+def machine_info():
+    """ Where a run was recorded; timings are only comparable on the same machine and versions. """
+    import numpy
+    import streamlit
+
+    return {"platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "streamlit": streamlit.__version__, "numpy": numpy.__version__}
+
+
+def compare(result, baseline, settings=("sessions", "concurrency", "seed")):
+    """ Print result vs baseline; return the names of metrics that regressed. """
+    if baseline.get("machine") != result.get("machine"):
+        print(f"  note: baseline was recorded on {baseline.get('machine')}")
+    for key in settings:
+        if baseline.get(key) != result.get(key):
+            print(f"  note: baseline used {key}={baseline.get(key)}, this run {result.get(key)}")
+    regressions = []
+    higher_is_better = {"reruns_per_second"}
+    for key in ["p50_ms", "p95_ms", "p99_ms", "mean_ms", "edit_p50_ms", "edit_p95_ms", "memory_per_session_kb",
+                "reruns_per_second"]:
+        old, new = baseline.get(key), result[key]
+        if old is None:
+            continue
+        ratio = new / old if old else float("inf")
+        worse = ratio < 1 / REGRESSION_FACTOR if key in higher_is_better else ratio > REGRESSION_FACTOR
+        print(f"  {key:24s} {old:10.2f} -> {new:10.2f}  ({ratio:5.2f}x){'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app.py reruns across simulated sessions.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    server, url = start_mock_server()
+    spool_dir = tempfile.mkdtemp(prefix="kirchhoff-bench-")
+    os.environ["APPS_SCRIPT_URL"] = url
+    os.environ["ASSET_BASE_URL"] = url
+    os.environ["SUBMISSION_SPOOL"] = os.path.join(spool_dir, "submissions.db")
+    os.chdir(ROOT)  # the app loads data/ relative to the repo root
+    sys.path.insert(0, ROOT)
+
+    result = run_benchmark(args.sessions, args.concurrency, args.seed)
+    result["log_posts"] = MockHandler.posts
+    result["seed"] = args.seed
+    result["machine"] = machine_info()
+    server.shutdown()
+
+    print(json.dumps(result, indent=2))
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(result, file, indent=2)
+            file.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        print("Compared with baseline:")
+        if compare(result, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Cold-start benchmark for app.py: import time, first paint and the first check.
+
+Every repetition is a fresh Python process (as after a Streamlit Cloud idle sleep) that imports
+Streamlit, runs app.py once with AppTest (the first paint) and then submits the currents form (the
+first check, which loads the grading code). It reports the median of each phase and which heavy
+modules were loaded by the first paint; none of NumPy, requests, SciPy or Pillow should be.
+
+    python benchmarks/bench_startup.py --runs 7
+    python benchmarks/bench_startup.py --save-baseline     # record benchmarks/baseline_startup.json
+    python benchmarks/bench_startup.py --importtime         # slowest imports of the first paint
+
+The committed baseline records the machine it was taken on (see bench_app.machine_info); re-record
+it on the machine you compare on.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench_app import machine_info
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline_startup.json")
+
+# Allowed slowdown against the baseline before a phase is reported as a regression
+REGRESSION_FACTOR = 1.25
+
+HEAVY_MODULES = ("numpy", "requests", "scipy", "PIL", "pandas")
+
+# Runs in the child process; prints one JSON line of timings in seconds
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+painted = time.perf_counter()
+heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+if PAINT_ONLY:
+    sys.exit(0)
+for element in at.number_input:
+    if element.label.startswith("Current I"):
+        element.set_value(10.0)
+next(b for b in at.button if b.label == "Check Answers").click()
+at.run()
+checked = time.perf_counter()
+errors = [e.value for e in at.exception]
+print(json.dumps({"import_s": imported - start, "first_paint_s": painted - imported,
+                  "first_check_s": checked - painted, "heavy_at_first_paint": heavy, "errors": errors}))
+"""
+
+
+def run_probe(env, importtime=False):
+    """ One cold start; with `importtime`, stops after the first paint and returns only the import log. """
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\nPAINT_ONLY = {importtime}\n{PROBE}"
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    done = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return (None if importtime else json.loads(done.stdout.strip().splitlines()[-1])), done.stderr
+
+
+def slowest_imports(stderr, count=15):
+    """ (cumulative microseconds, module) of the slowest top-level imports in -X importtime output. """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not name.startswith(" ") and "." not in name:
+            rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:count]
+
+
+def run_benchmark(runs, env):
+    results = [run_probe(env)[0] for _ in range(runs)]
+    errors = [e for r in results for e in r["errors"]]
+    if errors:
+        raise RuntimeError(errors[0])
+    summary = {"runs": runs}
+    for key in ("import_s", "first_paint_s", "first_check_s"):
+        summary[key.replace("_s", "_ms")] = statistics.median(r[key] for r in results) * 1000
+    summary["heavy_at_first_paint"] = sorted({m for r in results for m in r["heavy_at_first_paint"]})
+    return summary
+
+
+def compare(result, baseline):
+    """ Print result vs baseline; return the names of phases that regressed. """
+    if baseline.get("machine") != result.get("machine"):
+        print(f"  note: baseline was recorded on {baseline.get('machine')}")
+    if baseline.get("runs") != result.get("runs"):
+        print(f"  note: baseline used runs={baseline.get('runs')}, this run {result.get('runs')}")
+    regressions = []
+    for key in ("import_ms", "first_paint_ms", "first_check_ms"):
+        old, new = baseline.get(key), result[key]
+        if old is None:
+            continue
+        ratio = new / old if old else float("inf")
+        worse = ratio > REGRESSION_FACTOR
+        print(f"  {key:16s} {old:10.1f} -> {new:10.1f}  ({ratio:5.2f}x){'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app.py cold-start time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports up to the first paint")
+    args = parser.parse_args()
+
+    # Submissions go to a throwaway spool and an unreachable endpoint; nothing is sent
+    env = dict(os.environ, KIRCHHOFF_METRICS="0", APPS_SCRIPT_URL="http://127.0.0.1:9/",
+               SUBMISSION_SPOOL=os.path.join(tempfile.mkdtemp(prefix="kirchhoff-startup-"), "submissions.db"))
+
+    if args.importtime:
+        _, stderr = run_probe(env, importtime=True)
+        for cumulative, name in slowest_imports(stderr):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        return
+
+    result = run_benchmark(args.runs, env)
+    result["machine"] = machine_info()
+    print(json.dumps(result, indent=2))
+    if result["heavy_at_first_paint"]:
+        print(f"Loaded before the first paint: {', '.join(result['heavy_at_first_paint'])}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(result, file, indent=2)
+            file.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        print("Compared with baseline:")
+        if compare(result, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
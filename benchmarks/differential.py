@@ -0,0 +1,405 @@
+"""Differential correctness and speed harness for every grading implementation in the repo.
+
+app_old.py and app_2.py carry their own copies of the grading functions (0.5 vs 1 mA tolerance, a
+three-row expected set with the right loop's V2 sign flipped), and grading.py, equation_matcher.py
+and the live checker each have scalar and batch versions. Before a faster engine is accepted, this runs
+all of them on the same randomized and adversarial corpora and reports where they disagree:
+
+- currents: random answers, values just inside/on/outside every tolerance, exact answers, zeros,
+  sign flips, huge values, NaN/inf, unknown set numbers
+- equations: expected rows scaled, negated and combined, rows perturbed around the 0.1 allclose
+  tolerance, zero and constant-only rows, repeated rows, NaN/inf, random rows
+
+The old scripts are Streamlit pages, so their functions are pulled out with `ast` and compiled on
+their own (nothing else in the file runs). Pairs listed in MUST_AGREE are meant to be the same
+rules; any disagreement between them, or an invariant violation (a non-finite submission graded as
+correct), makes the run exit with status 1. Other differences are expected and only reported.
+
+    python benchmarks/differential.py                      # 2000 cases per corpus category
+    python benchmarks/differential.py --size 20000 --seed 3 --examples 5
+    python benchmarks/differential.py --json > differential.json
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from equation_matcher import LiveMatcher, independent_rows, match_equations, solution_table, span_matches  # noqa: E402
+from grading import (ALMOST_CORRECT, CORRECT, INCORRECT, INVALID_SET, check_answer, check_linear_independence,  # noqa: E402
+                     compare_equations, compute_kirchhoff_coefficients, grade_currents, grade_equations,
+                     kirchhoff_coefficients_table, tolerance_rows)
+from store import ANSWERS_PATH, get_store  # noqa: E402
+
+# Functions and constants compiled out of the older Streamlit scripts
+LEGACY_SCRIPTS = ("app_old.py", "app_2.py")
+LEGACY_FUNCTIONS = ("normalize_equation", "compare_equations", "compute_kirchhoff_coefficients", "is_close", "check_answer")
+LEGACY_CONSTANTS = ("tolerance", "problems")
+
+# Result code for an engine that raised on an input
+ERROR = -1
+LABELS = {
+    "currents": {CORRECT: "Correct", ALMOST_CORRECT: "Almost correct", INCORRECT: "Incorrect", INVALID_SET: "Invalid set"},
+    "equations": {True: "match", False: "no match"},
+    "independence": {True: "independent", False: "dependent"},
+}
+
+# Engines implementing the same rules; any disagreement between them is a failure
+MUST_AGREE = {
+    "currents": [("app_2.check_answer", "grading.check_answer[tol=1]"),
+                 ("grading.check_answer", "grading.grade_currents")],
+    "equations": [("grading.compare_equations", "grading.grade_equations"),
+                  ("equation_matcher.match_equations", "equation_matcher.span_matches"),
+                  ("equation_matcher.span_matches", "LiveMatcher")],
+    "independence": [("equation_matcher.independent_rows", "LiveMatcher.independent")],
+}
+
+
+def extract_functions(path, names=LEGACY_FUNCTIONS, constants=LEGACY_CONSTANTS, namespace=None):
+    """ Compile the named top-level functions and constant assignments of a script, in source order.
+
+    Nothing else in the file runs. Returns the namespace they were defined in (missing names are skipped).
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    keep = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name in names:
+            keep.append(node)
+        elif isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id in constants for t in node.targets):
+            keep.append(node)
+    namespace = dict(namespace or {})
+    exec(compile(ast.Module(body=keep, type_ignores=[]), path, "exec"), namespace)
+    return namespace
+
+
+def result_code(message):
+    """ Result code of a feedback message from any of the check_answer copies. """
+    if message.startswith("✅"):
+        return CORRECT
+    if message.startswith("⚠️ Almost"):
+        return ALMOST_CORRECT
+    if message.startswith("⚠️ Invalid"):
+        return INVALID_SET
+    return INCORRECT
+
+
+def scalar(grade):
+    """ Run a one-submission grader over a corpus; exceptions become ERROR for that row. """
+    def run(sets, values):
+        out = []
+        for s, v in zip(sets.tolist(), values.tolist()):
+            try:
+                out.append(grade(s, v))
+            except Exception:
+                out.append(ERROR)
+        return out
+    return run
+
+
+def current_engines(legacy):
+    """ name -> fn(sets (N,), currents (N, 3)) -> result codes. """
+    store = get_store()
+    engines = {}
+    for script, ns in legacy.items():
+        if "check_answer" in ns:
+            engines[f"{script}.check_answer"] = scalar(lambda s, c, f=ns["check_answer"]: result_code(f(s, *c)))
+    engines["grading.check_answer"] = scalar(lambda s, c: result_code(check_answer(s, *c)))
+    engines["grading.check_answer[tol=1]"] = scalar(lambda s, c: result_code(check_answer(s, *c, tol=1)))
+
+    def batch(sets, currents):
+        index = np.where((sets > 0) & (sets < len(store.answers)), sets, 0)
+        codes, _ = grade_currents(currents, store.answers[index], tolerance_rows(store.tolerances[index]))
+        return codes.tolist()
+    engines["grading.grade_currents"] = batch
+    return engines
+
+
+def equation_engines(legacy):
+    """ name -> fn(sets (N,), equations (N, 3, 4)) -> per-row matches (N x 3 lists). """
+    store = get_store()
+    engines = {}
+    for script, ns in legacy.items():
+        if "compare_equations" in ns:
+            problems = ns["problems"]
+
+            def legacy_compare(s, eqs, ns=ns, problems=problems):
+                expected = ns["compute_kirchhoff_coefficients"](*problems[str(s)])
+                return [bool(m) for m in ns["compare_equations"](eqs, expected)]
+            engines[f"{script}.compare_equations"] = scalar(legacy_compare)
+    engines["grading.compare_equations"] = scalar(
+        lambda s, eqs: [bool(m) for m in compare_equations(eqs, compute_kirchhoff_coefficients(*store.problem(s)))])
+    engines["grading.grade_equations"] = lambda sets, eqs: grade_equations(eqs, kirchhoff_coefficients_table(store.problems[sets]))[0].tolist()
+    engines["equation_matcher.match_equations"] = scalar(lambda s, eqs: match_equations(s, eqs)[0])
+    engines["equation_matcher.span_matches"] = lambda sets, eqs: span_matches(eqs, solution_table()[sets]).tolist()
+
+    def live(sets, eqs):
+        out = []
+        matchers = {}
+        for s, rows in zip(sets.tolist(), eqs.tolist()):
+            matcher = matchers.get(s) or matchers.setdefault(s, LiveMatcher.for_problem(store.problem(s)))
+            out.append([matcher.match(tuple(row)) for row in rows])
+        return out
+    engines["LiveMatcher"] = live
+    return engines
+
+
+def independence_engines():
+    """ name -> fn(sets (N,), equations (N, 3, 4)) -> independent (N,). """
+    def live(sets, eqs):
+        out = []
+        for rows in eqs.tolist():
+            matcher = LiveMatcher((np.nan,) * 4)
+            for k, row in enumerate(rows):
+                matcher.update(k, row)
+            out.append(matcher.independent())
+        return out
+    return {
+        "grading.check_linear_independence": scalar(lambda s, eqs: bool(check_linear_independence(eqs))),
+        "grading.grade_equations": lambda sets, eqs: grade_equations(eqs, np.zeros((1, 4)))[1].tolist(),
+        "equation_matcher.independent_rows": lambda sets, eqs: independent_rows(eqs).tolist(),
+        "LiveMatcher.independent": live,
+    }
+
+
+def current_corpus(size, rng):
+    """ (sets, currents (N, 3), category per row) for the current engines. """
+    store = get_store()
+    sets_known = np.array(store.set_numbers)
+    answers = store.answers
+    bands = tolerance_rows(store.tolerances)
+    parts = []
+
+    def add(name, sets, currents):
+        parts.append((np.asarray(sets, dtype=np.int64), np.asarray(currents, dtype=np.float64), [name] * len(sets)))
+
+    sets = rng.choice(sets_known, size)
+    add("random", sets, answers[sets] + rng.uniform(-5, 5, (size, 3)))
+    add("exact", sets, answers[sets])
+    # Just inside, on and just outside each tolerance in use (0.5 and 1 mA, and the per-set bands)
+    for tol_name, tol in (("0.5", 0.5), ("1", 1.0), ("band", None)):
+        sets = rng.choice(sets_known, size)
+        width = bands[sets] if tol is None else np.full((size, 3), tol)
+        sign = rng.choice([-1.0, 1.0], (size, 3))
+        offset = rng.choice([-1e-9, 0.0, 1e-9], (size, 3))
+        add(f"near tolerance {tol_name}", sets, answers[sets] + sign * (width + offset))
+    sets = rng.choice(sets_known, size)
+    flipped = answers[sets] * np.where(rng.random((size, 3)) < 0.5, -1.0, 1.0)
+    add("sign flips", sets, flipped)
+    add("zeros", rng.choice(sets_known, size), np.zeros((size, 3)))
+    add("huge", rng.choice(sets_known, size), rng.choice([-1.0, 1.0], (size, 3)) * 10.0 ** rng.uniform(6, 300, (size, 3)))
+    sets = rng.choice(sets_known, size)
+    special = answers[sets].copy()
+    special[np.arange(size), rng.integers(0, 3, size)] = rng.choice([np.nan, np.inf, -np.inf], size)
+    add("nan/inf", sets, special)
+    unknown = rng.choice([0, -1, len(answers), len(answers) + 7, 999], size)
+    add("unknown set", unknown, rng.uniform(0, 60, (size, 3)))
+
+    sets = np.concatenate([p[0] for p in parts])
+    currents = np.concatenate([p[1] for p in parts])
+    categories = [c for p in parts for c in p[2]]
+    return sets, currents, categories
+
+
+def equation_corpus(size, rng):
+    """ (sets, equations (N, 3, 4), category per row) for the equation and independence engines. """
+    store = get_store()
+    sets_known = np.array(store.set_numbers)
+    parts = []
+
+    def expected(sets):
+        return kirchhoff_coefficients_table(store.problems[sets])  # (N, 4, 4)
+
+    def pick(table, rows):
+        return np.take_along_axis(table, rows[..., None], axis=1)
+
+    def add(name, sets, eqs):
+        parts.append((np.asarray(sets, dtype=np.int64), np.asarray(eqs, dtype=np.float64), [name] * len(sets)))
+
+    sets = rng.choice(sets_known, size)
+    add("expected", sets, pick(expected(sets), np.tile([0, 1, 2], (size, 1))))
+    sets = rng.choice(sets_known, size)
+    scale = rng.choice([-1.0, 1e-3, 2.0, 1e3, -7.5], (size, 3, 1))
+    add("scaled", sets, pick(expected(sets), rng.integers(0, 4, (size, 3))) * scale)
+    sets = rng.choice(sets_known, size)
+    table = expected(sets)
+    combos = rng.uniform(-2, 2, (size, 3, 4)) @ table
+    add("combinations", sets, combos)
+    # Noise on the normalized rows around the 0.1 allclose tolerance
+    sets = rng.choice(sets_known, size)
+    rows = pick(expected(sets), rng.integers(0, 4, (size, 3)))
+    nonzero = rows[..., :-1] != 0
+    pivot = np.take_along_axis(rows, nonzero.argmax(axis=-1)[..., None], axis=-1)
+    noise = rng.choice([0.09, 0.1, 0.11], (size, 3, 1)) * rng.choice([-1.0, 1.0], (size, 3, 4)) * (rng.random((size, 3, 4)) < 0.3)
+    add("near atol", sets, (rows / pivot + noise) * pivot)
+    sets = rng.choice(sets_known, size)
+    zeros = pick(expected(sets), np.tile([0, 1, 2], (size, 1)))
+    zeros[np.arange(size), rng.integers(0, 3, size)] = 0.0
+    add("zero row", sets, zeros)
+    sets = rng.choice(sets_known, size)
+    constant = pick(expected(sets), np.tile([0, 1, 2], (size, 1)))
+    constant[np.arange(size), rng.integers(0, 3, size), :3] = 0.0
+    add("constant only", sets, constant)
+    sets = rng.choice(sets_known, size)
+    repeated = pick(expected(sets), np.tile([0, 1, 2], (size, 1)))
+    repeated[:, 2] = repeated[:, 1] * rng.choice([1.0, -2.0, 1 + 1e-9], (size, 1))
+    add("repeated", sets, repeated)
+    sets = rng.choice(sets_known, size)
+    special = pick(expected(sets), np.tile([0, 1, 2], (size, 1)))
+    special[np.arange(size), rng.integers(0, 3, size), rng.integers(0, 4, size)] = rng.choice([np.nan, np.inf, -np.inf], size)
+    add("nan/inf", sets, special)
+    sets = rng.choice(sets_known, size)
+    add("random", sets, rng.choice([-250.0, -150.0, -1.0, 0.0, 1.0, 3.0, 12.0, 200.0], (size, 3, 4)))
+
+    sets = np.concatenate([p[0] for p in parts])
+    eqs = np.concatenate([p[1] for p in parts])
+    categories = [c for p in parts for c in p[2]]
+    return sets, eqs, categories
+
+
+@contextmanager
+def quiet_native_output():
+    """ Silence file descriptors 1 and 2 (LAPACK prints to them directly when given NaN/inf). """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        yield
+    finally:
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [devnull]:
+            os.close(fd)
+
+
+def run_engines(engines, sets, values):
+    """ name -> (outputs, rows per second). """
+    results = {}
+    for name, engine in engines.items():
+        with quiet_native_output():
+            start = time.perf_counter()
+            output = engine(sets, values)
+            elapsed = time.perf_counter() - start
+        results[name] = (output, len(sets) / elapsed if elapsed else float("inf"))
+    return results
+
+
+def disagreements(results, a, b, categories, values, limit, labels):
+    """ Count rows where engines a and b differ, per category, with a few examples. """
+    counts = Counter()
+    examples = []
+    for i, (x, y) in enumerate(zip(results[a][0], results[b][0])):
+        if x != y:
+            counts[categories[i]] += 1
+            if len(examples) < limit:
+                examples.append({"category": categories[i], "input": np.asarray(values[i]).tolist(),
+                                 a: _label(x, labels), b: _label(y, labels)})
+    return counts, examples
+
+
+def _label(output, labels):
+    if isinstance(output, list):
+        return [_label(o, labels) for o in output]
+    return "error" if output is ERROR else labels.get(output, output)
+
+
+def invariant_violations(kind, results, values):
+    """ Engines that accept a non-finite submission: {engine: count}. """
+    finite = np.isfinite(values.reshape(len(values), -1)).all(axis=1)
+    violations = {}
+    for name, (output, _) in results.items():
+        if kind == "currents":
+            bad = [not f and o in (CORRECT, ALMOST_CORRECT) for o, f in zip(output, finite)]
+        else:
+            rows_finite = np.isfinite(values).all(axis=-1)
+            bad = [any(m and not rf for m, rf in zip(o, r)) for o, r in zip(output, rows_finite.tolist())]
+        if any(bad):
+            violations[name] = int(sum(bad))
+    return violations
+
+
+def compare_all(kind, results, categories, values, limit):
+    names = list(results)
+    report = {"throughput": {name: rate for name, (_, rate) in results.items()}, "pairs": [], "failures": []}
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            counts, examples = disagreements(results, a, b, categories, values, limit, LABELS[kind])
+            required = (a, b) in MUST_AGREE[kind] or (b, a) in MUST_AGREE[kind]
+            report["pairs"].append({"engines": [a, b], "must_agree": required, "disagreements": sum(counts.values()),
+                                    "by_category": dict(counts), "examples": examples})
+            if required and counts:
+                report["failures"].append(f"{kind}: {a} and {b} disagree on {sum(counts.values())} cases")
+    if kind != "independence":
+        violations = invariant_violations(kind, results, values)
+        report["invariant_violations"] = violations
+        report["failures"] += [f"{kind}: {name} accepts {count} non-finite submissions" for name, count in violations.items()]
+    return report
+
+
+def print_report(kind, total, report, out=sys.stdout):
+    print(f"\n== {kind} ({total} cases) ==", file=out)
+    print("Throughput:", file=out)
+    for name, rate in sorted(report["throughput"].items(), key=lambda item: -item[1]):
+        print(f"  {name:40s} {rate:14,.0f} /s", file=out)
+    print("Disagreements:", file=out)
+    for pair in report["pairs"]:
+        if not pair["disagreements"] and not pair["must_agree"]:
+            continue
+        flag = "  MUST AGREE" if pair["must_agree"] and pair["disagreements"] else ""
+        categories = ", ".join(f"{c}: {n}" for c, n in sorted(pair["by_category"].items())) or "none"
+        print(f"  {pair['engines'][0]} vs {pair['engines'][1]}: {pair['disagreements']} ({categories}){flag}", file=out)
+        for example in pair["examples"]:
+            print(f"      {json.dumps(example)}", file=out)
+    for name, count in report.get("invariant_violations", {}).items():
+        print(f"  INVARIANT: {name} accepts {count} non-finite submissions", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every grading engine on shared corpora and compare.")
+    parser.add_argument("--size", type=int, default=2000, help="cases per corpus category")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--examples", type=int, default=2, help="examples printed per disagreeing pair")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # data/ and the legacy scripts are relative to the repo root
+    with open(ANSWERS_PATH, "r") as file:
+        javab = json.load(file)
+    legacy = {os.path.splitext(script)[0]: extract_functions(script, namespace={"np": np, "javab": javab})
+              for script in LEGACY_SCRIPTS}
+    rng = np.random.default_rng(args.seed)
+
+    reports = {}
+    sets, currents, categories = current_corpus(args.size, rng)
+    reports["currents"] = (len(sets), compare_all("currents", run_engines(current_engines(legacy), sets, currents),
+                                                  categories, currents, args.examples))
+    sets, eqs, categories = equation_corpus(args.size, rng)
+    with np.errstate(all="ignore"):
+        reports["equations"] = (len(sets), compare_all("equations", run_engines(equation_engines(legacy), sets, eqs),
+                                                       categories, eqs, args.examples))
+        reports["independence"] = (len(sets), compare_all("independence", run_engines(independence_engines(), sets, eqs),
+                                                          categories, eqs, args.examples))
+
+    failures = [f for _, report in reports.values() for f in report["failures"]]
+    if args.json:
+        print(json.dumps({kind: dict(report, cases=total) for kind, (total, report) in reports.items()}, indent=2))
+    else:
+        for kind, (total, report) in reports.items():
+            print_report(kind, total, report)
+        print("\n" + ("\n".join(f"FAIL {f}" for f in failures) if failures else "All required engine pairs agree."))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
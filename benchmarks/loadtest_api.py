@@ -0,0 +1,96 @@
+"""Load test for grading_api.py.
+
+Opens many keep-alive connections and fires single grading requests for a fixed duration, then
+reports throughput and latency percentiles.
+
+    python grading_api.py --port 8600 &
+    python benchmarks/loadtest_api.py --url http://127.0.0.1:8600 --connections 64 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlparse
+
+
+def make_requests(count, seed=0):
+    """ A mix of current and equation requests across the ten sets, pre-encoded. """
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        set_number = rng.randint(1, 10)
+        if rng.random() < 0.5:
+            path = "/grade/currents"
+            body = {"set_number": set_number, **{f"I{i}": round(rng.uniform(0, 70), 1) for i in (1, 2, 3)}}
+        else:
+            path = "/grade/equations"
+            body = {"set_number": set_number,
+                    "equations": [[rng.choice([-1, 0, 1]) * rng.choice([1, 120, 220]) for _ in range(4)] for _ in range(3)]}
+        data = json.dumps(body).encode()
+        requests.append(
+            f"POST {path} HTTP/1.1\r\nHost: loadtest\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+    return requests
+
+
+async def read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, requests, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        writer.write(requests[i % len(requests)])
+        await writer.drain()
+        if await read_response(reader) != 200:
+            errors.append(i)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    writer.close()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else float("nan")
+
+
+async def main_async(args):
+    url = urlparse(args.url)
+    requests = make_requests(10000)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*[
+        client(url.hostname, url.port or 80, requests[i::args.connections] or requests, deadline, latencies, errors)
+        for i in range(args.connections)
+    ])
+    elapsed = time.perf_counter() - start
+    print(f"{len(latencies)} requests in {elapsed:.1f} s over {args.connections} connections, {len(errors)} errors")
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s")
+    for q in (50, 95, 99):
+        print(f"p{q}: {percentile(latencies, q) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the grading API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Pre-process the diagrams and logo into responsive, content-hashed static assets.
+
+    pip install pillow
+    python build_assets.py
+
+Every image in Diagrams/ and img/ is resized to a few widths and saved as AVIF (when Pillow
+supports it), WebP and optimized PNG under static/assets/, with a hash of the file contents in
+each name. static/assets/manifest.json maps the original path to its variants; assets.py reads it
+to build <picture> tags, and Streamlit serves the files from ./app/static/ (enableStaticServing in
+.streamlit/config.toml). Because a file's name changes whenever its bytes do, the files can be
+cached forever by browsers or a CDN. Re-run this after changing an image and commit the output.
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+
+from PIL import Image, features
+
+OUTPUT_DIR = "static/assets"
+SOURCES = ["Diagrams/*.png", "img/*.png"]
+
+# Target widths per source (the original width is always kept as the largest variant)
+WIDTHS = {"Diagrams/": (360, 720), "img/": (150, 300)}
+
+QUALITY = {"avif": 60, "webp": 80}
+
+
+def formats():
+    available = ["webp", "png"]
+    if features.check("avif"):
+        available.insert(0, "avif")
+    return available
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "png":
+        # Line-art diagrams and the logo lose nothing visible in a 256-colour palette
+        image = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.save(buffer, fmt.upper(), quality=QUALITY[fmt])
+    return buffer.getvalue()
+
+
+def build_image(path, output_dir):
+    """ Write all variants of one image and return its manifest entry. """
+    source = Image.open(path)
+    source.load()
+    widths = next((w for prefix, w in WIDTHS.items() if path.startswith(prefix)), ())
+    widths = sorted({w for w in widths if w < source.width} | {source.width})
+    stem = os.path.splitext(os.path.basename(path))[0]
+
+    entry = {"width": source.width, "height": source.height, "variants": {}}
+    for fmt in formats():
+        variants = []
+        for width in widths:
+            height = round(source.height * width / source.width)
+            image = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+            data = encode(image, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            name = f"{stem}.{width}w.{digest}.{fmt}"
+            with open(os.path.join(output_dir, name), "wb") as file:
+                file.write(data)
+            variants.append([width, name, len(data)])
+        entry["variants"][fmt] = variants
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build responsive static image assets.")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = {}
+    for pattern in SOURCES:
+        for path in sorted(glob.glob(pattern)):
+            manifest[path.replace(os.sep, "/")] = build_image(path, args.output)
+
+    # Remove variants left over from previous builds
+    keep = {name for entry in manifest.values() for v in entry["variants"].values() for _, name, _ in v}
+    for name in os.listdir(args.output):
+        if name != "manifest.json" and name not in keep:
+            os.remove(os.path.join(args.output, name))
+
+    with open(os.path.join(args.output, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+        file.write("\n")
+
+    for path, entry in manifest.items():
+        original = os.path.getsize(path)
+        smallest = min(size for v in entry["variants"].values() for _, _, size in v)
+        print(f"{path}: {original} bytes -> smallest variant {smallest} bytes")
+
+
+if __name__ == "__main__":
+    main()
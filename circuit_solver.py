@@ -0,0 +1,155 @@
+"""Solve netlist circuits with modified nodal analysis and derive answer keys from them.
+
+    python circuit_solver.py circuit.net          # branch currents and Kirchhoff equations
+    python circuit_solver.py --check              # compare data/javab.json with the solver
+    python circuit_solver.py --write-key          # regenerate data/javab.json from data/problems.json
+"""
+import argparse
+import json
+import threading
+
+import numpy as np
+
+from netlist import expected_equations, load_netlist, two_loop_netlist
+
+try:  # sparse solve for large circuits; small ones are fine dense
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.linalg import spsolve
+except ImportError:
+    coo_matrix = spsolve = None
+
+# Above this many unknowns the system is assembled as a sparse matrix (when SciPy is available)
+SPARSE_THRESHOLD = 200
+
+
+def mna_system(netlist):
+    """ Assemble the MNA system A x = z.
+
+    Unknowns are the non-ground node voltages followed by the currents of zero-resistance
+    (ideal source) branches. Returns (rows, cols, values, z, size) in COO form.
+    """
+    n_nodes = len(netlist.nodes) - 1  # ground is eliminated
+    ideal = [k for k, b in enumerate(netlist.branches) if b.R == 0]
+    size = n_nodes + len(ideal)
+    rows, cols, values = [], [], []
+    z = np.zeros(size)
+
+    def stamp(i, j, value):
+        if i >= 0 and j >= 0:
+            rows.append(i)
+            cols.append(j)
+            values.append(value)
+
+    for k, b in enumerate(netlist.branches):
+        f = netlist.node_index[b.node_from] - 1  # -1 means ground
+        t = netlist.node_index[b.node_to] - 1
+        if b.R > 0:
+            # I = (V_from - V_to + V) / R leaves `from` and enters `to`
+            g = 1.0 / b.R
+            stamp(f, f, g)
+            stamp(t, t, g)
+            stamp(f, t, -g)
+            stamp(t, f, -g)
+            if f >= 0:
+                z[f] -= g * b.V
+            if t >= 0:
+                z[t] += g * b.V
+    for extra, k in enumerate(ideal):
+        b = netlist.branches[k]
+        f = netlist.node_index[b.node_from] - 1
+        t = netlist.node_index[b.node_to] - 1
+        row = n_nodes + extra
+        # KCL: the source current leaves `from` and enters `to`; constraint V_to - V_from = V
+        stamp(f, row, 1.0)
+        stamp(t, row, -1.0)
+        stamp(row, t, 1.0)
+        stamp(row, f, -1.0)
+        z[row] = b.V
+    return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp), np.array(values), z, size
+
+
+def solve_currents(netlist):
+    """ Branch currents in amps, in netlist branch order (positive from `from` to `to`). """
+    rows, cols, values, z, size = mna_system(netlist)
+    if spsolve is not None and size > SPARSE_THRESHOLD:
+        x = spsolve(coo_matrix((values, (rows, cols)), shape=(size, size)).tocsc(), z)
+        if not np.all(np.isfinite(x)):
+            raise ValueError("circuit has no unique solution")
+    else:
+        A = np.zeros((size, size))
+        np.add.at(A, (rows, cols), values)
+        try:
+            x = np.linalg.solve(A, z)
+        except np.linalg.LinAlgError:
+            raise ValueError("circuit has no unique solution") from None
+
+    voltages = np.concatenate([[0.0], x[:len(netlist.nodes) - 1]])
+    currents = np.empty(len(netlist.branches))
+    extra = len(netlist.nodes) - 1
+    for k, b in enumerate(netlist.branches):
+        if b.R > 0:
+            vf, vt = voltages[netlist.node_index[b.node_from]], voltages[netlist.node_index[b.node_to]]
+            currents[k] = (vf - vt + b.V) / b.R
+        else:
+            currents[k] = x[extra]
+            extra += 1
+    return currents
+
+
+# Solved answer keys by netlist hash, shared across reruns and sessions
+_answer_cache = {}
+_answer_lock = threading.Lock()
+
+
+def answer_key(netlist, decimals=1):
+    """ Branch currents in mA rounded like data/javab.json, cached per netlist hash. """
+    key = (netlist.hash(), decimals)
+    answer = _answer_cache.get(key)
+    if answer is None:
+        answer = [round(float(i), decimals) for i in solve_currents(netlist) * 1000]
+        with _answer_lock:
+            _answer_cache[key] = answer
+    return list(answer)
+
+
+def derive_answer_key(problems):
+    """ Answer key for a {"set": [V1, V2, R1, R2, R3]} mapping like data/problems.json. """
+    return {str(s): answer_key(two_loop_netlist(*params)) for s, params in problems.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve netlist circuits / derive the answer key.")
+    parser.add_argument("netlist", nargs="?", help="netlist file to solve")
+    parser.add_argument("--problems", default="data/problems.json")
+    parser.add_argument("--answers", default="data/javab.json")
+    parser.add_argument("--check", action="store_true", help="compare the answer key with the solver")
+    parser.add_argument("--write-key", action="store_true", help="rewrite the answer key from the solver")
+    args = parser.parse_args(argv)
+
+    if args.netlist:
+        netlist = load_netlist(args.netlist)
+        for label, current in zip(netlist.labels, solve_currents(netlist)):
+            print(f"{label}: {current * 1000:.3f} mA")
+        print("Expected equations (" + ", ".join(netlist.labels) + ", constant):")
+        for row in expected_equations(netlist):
+            print("  ", row)
+        return
+
+    with open(args.problems, "r") as file:
+        derived = derive_answer_key(json.load(file))
+    if args.write_key:
+        with open(args.answers, "w") as file:
+            json.dump(derived, file, indent=4)
+            file.write("\n")
+        print(f"Wrote {len(derived)} sets to {args.answers}")
+    else:
+        with open(args.answers, "r") as file:
+            current = json.load(file)
+        differences = [s for s in derived if current.get(s) != derived[s]]
+        for s in differences:
+            print(f"Set {s}: answer key {current.get(s)} != solver {derived[s]}")
+        print("Answer key matches the solver." if not differences else f"{len(differences)} sets differ.")
+
+
+if __name__ == "__main__":
+    main()
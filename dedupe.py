@@ -0,0 +1,158 @@
+"""De-duplication and rate limiting for app submissions, in front of grading and logging.
+
+A double-click or an unchanged resubmission has the same (session, kind, problem, rounded inputs)
+key as the last one, so it gets the cached feedback back: no grading, and no second row sent to
+Apps Script. New submissions spend a token from a per-session bucket (SUBMIT_BURST tokens,
+refilled at SUBMIT_RATE per second); when it is empty the submission is refused instead of
+graded and logged, which keeps a handful of students hammering the button inside the Apps Script
+quota. Both tables are bounded LRUs with a time-to-live, shared by all sessions in the process.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import metrics
+
+SUBMIT_CACHE_TTL = float(os.environ.get("SUBMIT_CACHE_TTL", "600"))  # seconds a result is reused
+SUBMIT_CACHE_SIZE = int(os.environ.get("SUBMIT_CACHE_SIZE", "10000"))
+SUBMIT_RATE = float(os.environ.get("SUBMIT_RATE", "0.2"))  # new submissions per second per session
+SUBMIT_BURST = int(os.environ.get("SUBMIT_BURST", "5"))
+
+# Inputs are rounded to this many decimals before hashing (the form shows two)
+KEY_DECIMALS = 4
+
+Outcome = namedtuple("Outcome", ["result", "fresh"])
+
+
+class TTLCache:
+    """ Thread-safe LRU mapping whose entries also expire `ttl` seconds after they were stored. """
+
+    def __init__(self, max_items, ttl):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class TokenBucket:
+    """ `burst` tokens, refilled continuously at `rate` per second. """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def wait_time(self):
+        """ Seconds until the next token is available. """
+        if self.rate <= 0:
+            return float("inf")
+        tokens = min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate)
+        return max(0.0, (1 - tokens) / self.rate)
+
+
+def submission_key(session_id, kind, problem_key, values, version=None):
+    """ Content hash of a submission; inputs that round to the same numbers share a key.
+
+    `version` is the answer key's store.version, so results cached before a reload or re-import
+    are not reused.
+    """
+    flat = []
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            flat.extend(value)
+        else:
+            flat.append(value)
+    rounded = ",".join(f"{round(float(v), KEY_DECIMALS) + 0.0!r}" for v in flat)  # + 0.0 folds -0.0 into 0.0
+    blob = f"{session_id}\0{kind}\0{problem_key}\0{version}\0{rounded}"
+    return hashlib.blake2b(blob.encode(), digest_size=16).digest()
+
+
+class SubmissionGate:
+    """ Cached results for repeated submissions and a token bucket per session for new ones. """
+
+    def __init__(self, ttl=SUBMIT_CACHE_TTL, max_items=SUBMIT_CACHE_SIZE, rate=SUBMIT_RATE, burst=SUBMIT_BURST):
+        self.results = TTLCache(max_items, ttl)
+        self.buckets = TTLCache(max_items, ttl)
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, kind, problem_key, values, grade, version=None):
+        """ Grade a submission once.
+
+        Returns Outcome(result, fresh): the cached result with fresh=False for a repeat, or
+        grade()'s result with fresh=True (the caller logs only fresh submissions). Returns None
+        when the session is over its rate limit; see retry_after().
+        """
+        key = submission_key(session_id, kind, problem_key, values, version)
+        cached = self.results.get(key)
+        if cached is not None:
+            metrics.inc("kirchhoff_submission_gate_total", kind=kind, outcome="repeat")
+            return Outcome(cached, False)
+        with self._lock:
+            bucket = self.buckets.get(session_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self.buckets.put(session_id, bucket)
+            allowed = bucket.take()
+        if not allowed:
+            metrics.inc("kirchhoff_submission_gate_total", kind=kind, outcome="limited")
+            return None
+        result = grade()
+        self.results.put(key, result)
+        metrics.inc("kirchhoff_submission_gate_total", kind=kind, outcome="graded")
+        return Outcome(result, True)
+
+    def retry_after(self, session_id):
+        """ Seconds until the session may submit something new. """
+        bucket = self.buckets.get(session_id)
+        return 0.0 if bucket is None else bucket.wait_time()
+
+
+# Shared by every session in the process, like the logger and the store
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_gate():
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = SubmissionGate()
+    return _gate
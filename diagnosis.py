@@ -0,0 +1,188 @@
+"""Hints for wrong answers: common mistakes precomputed per circuit in a quantized hash index.
+
+For a circuit's junction and loop rules this enumerates the usual slips (a flipped sign, a
+missing term, the wrong resistor, V1 and V2 swapped) and evaluates each one ahead of time: the
+normalized equation it produces and the currents a student would get by solving with it. Currents
+are also indexed for answers given in A instead of mA, a reversed current and two currents swapped.
+
+Predictions are stored under their values rounded to a grid (one grid cell per tolerance width,
+entered into every cell the tolerance box touches), so classifying a submission is one dictionary
+lookup on its own rounded values followed by an exact check of the few candidates in that cell.
+"""
+import itertools
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+from grading import TOLERANCE, normalize_equations
+
+# Normalized equations within this of a predicted mistake are diagnosed as that mistake
+EQUATION_ATOL = 0.01
+
+# Junction and loop rules of compute_kirchhoff_coefficients as (column, sign, parameter) terms;
+# columns 0-2 are I1-I3 and column 3 the constant
+RULES = [
+    ("junction rule", [(0, 1, "1"), (1, -1, "1"), (2, -1, "1")]),
+    ("left loop", [(0, -1, "R1"), (2, -1, "R3"), (3, 1, "V1")]),
+    ("right loop", [(1, 1, "R2"), (2, -1, "R3"), (3, 1, "V2")]),
+    ("outer loop", [(0, -1, "R1"), (1, -1, "R2"), (3, 1, "V1"), (3, -1, "V2")]),
+]
+PARAMETERS = ("V1", "V2", "R1", "R2", "R3")
+
+
+def _term_name(column, parameter):
+    if column == 3:
+        return parameter
+    current = f"I{column + 1}"
+    return current if parameter == "1" else f"{parameter}·{current}"
+
+
+def _evaluate(terms, values):
+    row = np.zeros(4)
+    for column, sign, parameter in terms:
+        row[column] += sign * values.get(parameter, 1.0)
+    return row
+
+
+def rule_variants(name, terms):
+    """ (description, terms) for each common mistake in one rule. """
+    variants = []
+    for i, (column, sign, parameter) in enumerate(terms):
+        term = _term_name(column, parameter)
+        flipped = terms[:i] + [(column, -sign, parameter)] + terms[i + 1:]
+        variants.append((f"the {name} with the sign of the {term} term flipped", flipped))
+        if len(terms) > 2:
+            variants.append((f"the {name} with the {term} term missing", terms[:i] + terms[i + 1:]))
+        if parameter.startswith("R"):
+            for other in ("R1", "R2", "R3"):
+                if other != parameter:
+                    swapped = terms[:i] + [(column, sign, other)] + terms[i + 1:]
+                    variants.append((f"the {name} with {other} used instead of {parameter}", swapped))
+    swap = {"V1": "V2", "V2": "V1"}
+    if any(parameter in swap for _, _, parameter in terms):
+        variants.append((f"the {name} with V1 and V2 swapped",
+                         [(column, sign, swap.get(parameter, parameter)) for column, sign, parameter in terms]))
+    return variants
+
+
+def _cells(values, width, tol):
+    """ Every grid cell (cell size `width`) that the box values ± tol touches. """
+    ranges = [range(int(np.floor((v - tol) / width)), int(np.floor((v + tol) / width)) + 1) for v in values]
+    return itertools.product(*ranges)
+
+
+def _cell(values, width):
+    return tuple(int(np.floor(v / width)) for v in values)
+
+
+class DiagnosisIndex:
+    """ Precomputed mistakes for one circuit (V1, V2, R1, R2, R3). """
+
+    def __init__(self, V1, V2, R1, R2, R3):
+        values = dict(zip(PARAMETERS, (V1, V2, R1, R2, R3)))
+        self.equations = {}
+        self.currents = {}
+
+        # Equation mistakes: normalized rows, skipping any that equal a correct rule
+        correct = normalize_equations([_evaluate(terms, values) for _, terms in RULES])
+        described, rows = [], []
+        for name, terms in RULES:
+            for description, variant in rule_variants(name, terms):
+                described.append(description)
+                rows.append(_evaluate(variant, values))
+        for description, row in zip(described, normalize_equations(rows)):
+            if not np.any(row[:-1]) or np.any(np.all(np.abs(correct - row) <= EQUATION_ATOL, axis=1)):
+                continue
+            self._insert(self.equations, row, 2 * EQUATION_ATOL, EQUATION_ATOL, description)
+
+        # Current mistakes: solve the junction, left and right rules with one of them replaced
+        systems, described = [], []
+        base = [terms for _, terms in RULES[:3]]
+        for k, (name, terms) in enumerate(RULES[:3]):
+            for description, variant in rule_variants(name, terms):
+                systems.append([_evaluate(t, values) for t in base[:k] + [variant] + base[k + 1:]])
+                described.append(f"what you get from {description}")
+        for a, b in itertools.combinations(PARAMETERS, 2):
+            if a[0] == b[0]:
+                swapped = dict(values, **{a: values[b], b: values[a]})
+                systems.append([_evaluate(t, swapped) for t in base])
+                described.append(f"what you get with {a} and {b} swapped")
+        systems = np.array(systems)
+        solvable = np.abs(np.linalg.det(systems[..., :3])) > 1e-12
+        solutions = np.full((len(systems), 3), np.nan)
+        solutions[solvable] = np.linalg.solve(systems[solvable, :, :3], -systems[solvable, :, 3:])[..., 0]
+        predictions = list(zip(described, np.round(solutions * 1000, 1), itertools.repeat(TOLERANCE)))
+
+        system = np.array([_evaluate(t, values) for t in base])
+        answer = np.round(np.linalg.solve(system[:, :3], -system[:, 3]) * 1000, 1)
+        predictions.append(("your currents are in A instead of mA", answer / 1000, TOLERANCE / 1000))
+        for i in range(3):
+            reversed_current = answer.copy()
+            reversed_current[i] = -reversed_current[i]
+            predictions.append((f"I{i + 1} has the wrong sign (its direction is reversed)", reversed_current, TOLERANCE))
+        for i, j in itertools.combinations(range(3), 2):
+            swapped = answer.copy()
+            swapped[[i, j]] = swapped[[j, i]]
+            predictions.append((f"I{i + 1} and I{j + 1} are swapped", swapped, TOLERANCE))
+
+        for description, currents, tol in predictions:
+            if not np.all(np.isfinite(currents)) or np.all(np.abs(currents - answer) <= TOLERANCE):
+                continue
+            self._insert(self.currents, currents, 2 * TOLERANCE, tol, description)
+
+    @staticmethod
+    def _insert(index, values, width, tol, description):
+        for cell in _cells(values, width, tol):
+            candidates = index.setdefault(cell, [])
+            if not any(np.array_equal(values, known) for known, _, _ in candidates):
+                candidates.append((values, tol, description))
+
+    @staticmethod
+    def _lookup(index, values, width):
+        """ The closest candidate within its tolerance, from the cell `values` falls in. """
+        best, best_distance = None, np.inf
+        for known, tol, description in index.get(_cell(values, width), ()):
+            distance = np.max(np.abs(values - known))
+            if distance <= tol and distance < best_distance:
+                best, best_distance = description, distance
+        return best
+
+    def diagnose_equation(self, equation):
+        """ Description of the mistake behind a wrong equation [I1, I2, I3, constant], or None. """
+        row = normalize_equations(np.asarray(equation, dtype=np.float64))
+        if not np.all(np.isfinite(row)) or not np.any(row[:-1]):
+            return None
+        return self._lookup(self.equations, row, 2 * EQUATION_ATOL)
+
+    def diagnose_currents(self, currents):
+        """ Description of the mistake behind wrong currents [I1, I2, I3] in mA, or None. """
+        values = np.asarray(currents, dtype=np.float64)
+        if not np.all(np.isfinite(values)):
+            return None
+        # A-instead-of-mA predictions are tiny and all share the cells around zero, so one lookup
+        # finds them too
+        return self._lookup(self.currents, values, 2 * TOLERANCE)
+
+
+@lru_cache(maxsize=1024)
+def get_index(V1, V2, R1, R2, R3):
+    """ Diagnosis index for a circuit, built once per parameter set. """
+    with metrics.span("build_diagnosis"):
+        return DiagnosisIndex(float(V1), float(V2), float(R1), float(R2), float(R3))
+
+
+def equation_hints(problem, student_eqs, matches):
+    """ A hint (or None) for every student equation that didn't match. """
+    index = get_index(*problem)
+    hints = [None if match else index.diagnose_equation(eq) for eq, match in zip(student_eqs, matches)]
+    metrics.inc("kirchhoff_hints_total", kind="equations", value=sum(hint is not None for hint in hints))
+    return hints
+
+
+def current_hint(problem, currents):
+    """ A hint for incorrect currents, or None when no known mistake explains them. """
+    hint = get_index(*problem).diagnose_currents(currents)
+    if hint is not None:
+        metrics.inc("kirchhoff_hints_total", kind="currents")
+    return hint
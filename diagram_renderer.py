@@ -0,0 +1,501 @@
+"""Draw circuit diagrams from netlists as SVG or PNG, with a content-addressed render cache.
+
+The two-loop problem sets come out in the same arrangement as the hand-drawn Diagrams/ (V1 and R1
+on the left, R3 in the middle, R2 and V2 on the right); other netlists are drawn with ground as a
+rail along the bottom and the remaining nodes in a row above it. Renders are cached on disk under a hash of the
+netlist, format and style, with least-recently-used files evicted past DIAGRAM_CACHE_MAX_MB, and
+the most recent ones are also kept in memory so a repeat request costs a dictionary lookup.
+
+    python diagram_renderer.py --set 3 -o set3.svg
+    python diagram_renderer.py circuit.net --format png -o circuit.png
+    python diagram_renderer.py --prerender      # fill the cache for every problem set
+"""
+import argparse
+import hashlib
+import html
+import io
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+
+import metrics
+from netlist import Netlist, load_netlist, two_loop_netlist
+
+# Bump when the drawing code changes so stale cached renders are not served
+RENDER_VERSION = 1
+
+CACHE_DIR = os.environ.get("DIAGRAM_CACHE_DIR", "cache/diagrams")
+CACHE_MAX_BYTES = int(float(os.environ.get("DIAGRAM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+MEMORY_ITEMS = 256
+
+STYLE = {
+    "stroke": "#000000",
+    "background": "#ffffff",
+    "line_width": 3.0,
+    "font_size": 20,
+    "font_family": "serif",
+    "scale": 1.0,  # output pixels per drawing unit
+}
+
+# Drawing units
+BRANCH_SPACING = 260  # between parallel branches
+LADDER_HEIGHT = 300   # between the two nodes of a parallel circuit
+RESISTOR_LENGTH = 70
+RESISTOR_AMPLITUDE = 12
+BATTERY_GAP = 12
+MARGIN = 30
+
+FORMATS = {"svg": "image/svg+xml", "png": "image/png"}
+
+# TrueType fonts tried for PNG text; Pillow's built-in fallback has no Ω, so "ohm" is spelled out
+PNG_FONTS = ("DejaVuSerif-Italic.ttf", "DejaVuSans.ttf", "LiberationSerif-Italic.ttf", "Arial.ttf")
+
+
+def _style(style):
+    merged = dict(STYLE)
+    for key, value in (style or {}).items():
+        if key not in STYLE:
+            raise ValueError(f"unknown style option {key!r}")
+        merged[key] = value
+    return merged
+
+
+def _component_names(netlist):
+    """ Resistor and source labels for each branch: I2 -> R2; sources numbered V1, V2, ... in order. """
+    names = []
+    sources = 0
+    for b in netlist.branches:
+        match = re.fullmatch(r"I_?(\w+)", b.label)
+        resistor = f"R{match.group(1)}" if match else f"R_{b.label}"
+        source = None
+        if b.V:
+            sources += 1
+            source = f"V{sources}"
+        names.append((resistor, source))
+    return names
+
+
+def _row_order(netlist):
+    """ Non-ground node indices in breadth-first order, so chains of nodes end up next to each other. """
+    adjacency = {i: [] for i in range(1, len(netlist.nodes))}
+    for b in netlist.branches:
+        f, t = netlist.node_index[b.node_from], netlist.node_index[b.node_to]
+        if f and t:
+            adjacency[f].append(t)
+            adjacency[t].append(f)
+    order, seen = [], set()
+    for first in adjacency:
+        if first in seen:
+            continue
+        seen.add(first)
+        queue = deque([first])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for other in adjacency[node]:
+                if other not in seen:
+                    seen.add(other)
+                    queue.append(other)
+    return order
+
+
+def _add(p, q, k=1.0):
+    return (p[0] + k * q[0], p[1] + k * q[1])
+
+
+def _text(position, text, side, size):
+    """ Text next to `position`, on the side given by the unit vector `side`. """
+    if abs(side[0]) >= abs(side[1]):
+        anchor = "start" if side[0] > 0 else "end"
+    else:
+        anchor = "middle"
+    return ("text", position, text, anchor, size)
+
+
+def _routes(netlist):
+    """ Wire route of every branch as (points, span, outward side).
+
+    Ground is a rail along the bottom and the other nodes sit in a row above it. A branch to ground
+    is a column dropping from its node to the rail (several columns per node are spread out
+    sideways, which gives the problem sets' three-column layout); a branch between two nodes is a
+    bracket above the row, stacked in levels so brackets don't overlap. Components are drawn on the
+    second segment of the route, between the distances along it given by `span`.
+    """
+    order = _row_order(netlist)
+    columns = {i: [] for i in order}
+    links = []
+    for k, b in enumerate(netlist.branches):
+        f, t = netlist.node_index[b.node_from], netlist.node_index[b.node_to]
+        if f and t:
+            links.append(k)
+        else:
+            columns[f or t].append(k)
+
+    # Each node takes as many column slots as it has branches to ground (at least one)
+    x, position, slots = 0.0, {}, {}
+    for i in order:
+        slots[i] = max(1, len(columns[i]))
+        position[i] = x + (slots[i] - 1) * BRANCH_SPACING / 2
+        x += slots[i] * BRANCH_SPACING
+
+    routes = {}
+    for i, branches in columns.items():
+        for j, k in enumerate(branches):
+            column = position[i] + (j - (len(branches) - 1) / 2) * BRANCH_SPACING
+            outward = (1.0, 0.0) if column >= position[i] else (-1.0, 0.0)
+            points = [(position[i], 0.0), (column, 0.0), (column, LADDER_HEIGHT), (column, LADDER_HEIGHT)]
+            routes[k] = (points, (0.0, LADDER_HEIGHT), outward)
+
+    # Brackets between nodes: the lowest level whose brackets don't overlap this one
+    levels = []
+    for k in sorted(links, key=lambda k: abs(position[netlist.node_index[netlist.branches[k].node_to]]
+                                             - position[netlist.node_index[netlist.branches[k].node_from]])):
+        b = netlist.branches[k]
+        left, right = sorted((position[netlist.node_index[b.node_from]], position[netlist.node_index[b.node_to]]))
+        level = 0
+        while level < len(levels) and any(left < r and l < right for l, r in levels[level]):
+            level += 1
+        if level == len(levels):
+            levels.append([])
+        levels[level].append((left, right))
+        height = -(level + 1) * LADDER_HEIGHT / 2
+        points = [(left, 0.0), (left, height), (right, height), (right, 0.0)]
+        routes[k] = (points, (0.0, right - left), (0.0, -1.0))
+
+    rail = [position[i] + (j - (len(columns[i]) - 1) / 2) * BRANCH_SPACING for i in order for j in range(len(columns[i]))]
+    return routes, position, rail
+
+
+def layout(netlist, style):
+    """ Drawing primitives for a netlist: ("path", points, width), ("text", xy, text, anchor, size), ("dot", xy, r). """
+    width = style["line_width"]
+    size = style["font_size"]
+    names = _component_names(netlist)
+    routes, position, rail = _routes(netlist)
+
+    items = []
+    if len(rail) > 1:
+        items.append(("path", [(min(rail), LADDER_HEIGHT), (max(rail), LADDER_HEIGHT)], width))
+    for k, b in enumerate(netlist.branches):
+        resistor_name, source_name = names[k]
+        points, (begin, finish), outward = routes[k]
+        inward = (-outward[0], -outward[1])
+        p1, p2 = points[1], points[2]
+        length = math.dist(p1, p2)
+        d = ((p2[0] - p1[0]) / length, (p2[1] - p1[1]) / length)
+        normal = (-d[1], d[0])
+        # Unit vector along the drawn segment in the direction the current is defined
+        starts_at_from = points[0] == (position.get(netlist.node_index[b.node_from]), 0.0)
+        flow = d if starts_at_from else (-d[0], -d[1])
+
+        components = [("R", 0.38 if b.V else 0.5)]
+        if b.V:
+            components.append(("V", 0.72))
+        wire = [points[0], p1]
+        for kind, t in components:
+            center = _add(p1, d, begin + t * (finish - begin))
+            if kind == "R":
+                half = RESISTOR_LENGTH / 2
+                wire.append(_add(center, d, -half))
+                for j in range(6):
+                    sign = 1 if j % 2 == 0 else -1
+                    wire.append(_add(_add(center, d, -half + RESISTOR_LENGTH * (j + 0.5) / 6), normal, sign * RESISTOR_AMPLITUDE))
+                wire.append(_add(center, d, half))
+                items.append(_text(_add(center, outward, RESISTOR_AMPLITUDE + 10),
+                                   f"{resistor_name} = {b.R:g} Ω", outward, size))
+                # Current arrow and label on the other side of the resistor
+                tail = _add(_add(center, inward, RESISTOR_AMPLITUDE + 16), flow, -22)
+                head = _add(tail, flow, 44)
+                back = _add(head, flow, -10)
+                items.append(("path", [tail, head], width * 0.6))
+                items.append(("path", [_add(back, normal, 6), head, _add(back, normal, -6)], width * 0.6))
+                items.append(_text(_add(center, inward, RESISTOR_AMPLITUDE + 30), b.label, inward, size))
+            else:
+                # The long (+) plate faces the way the source pushes current
+                plus = flow if b.V > 0 else (-flow[0], -flow[1])
+                long_plate, short_plate = _add(center, plus, BATTERY_GAP / 2), _add(center, plus, -BATTERY_GAP / 2)
+                wire.append(_add(center, d, -BATTERY_GAP / 2))
+                items.append(("path", wire, width))
+                items.append(("path", [_add(long_plate, normal, -22), _add(long_plate, normal, 22)], width))
+                items.append(("path", [_add(short_plate, normal, -12), _add(short_plate, normal, 12)], width * 2))
+                # Along a bracket the resistor label is right next to it, so the source is labelled below
+                side = outward if outward[0] else inward
+                items.append(_text(_add(center, side, 32), f"{source_name} = {abs(b.V):g} V", side, size))
+                wire = [_add(center, d, BATTERY_GAP / 2)]
+        wire += [p2, points[3]]
+        items.append(("path", wire, width))
+
+    # Junction dots and names only matter once there is more than one node above ground
+    if len(position) > 1:
+        for i, x in position.items():
+            items.append(("dot", (x, 0.0), width * 1.6))
+            items.append(_text((x + 8, 16.0), netlist.nodes[i], (1.0, 0.0), size * 0.8))
+    # Paths first keeps the SVG element order stable and readable
+    items.sort(key=lambda item: item[0] != "path")
+    return items
+
+
+def _bounds(items):
+    xs, ys = [], []
+    for item in items:
+        if item[0] == "path":
+            xs += [p[0] for p in item[1]]
+            ys += [p[1] for p in item[1]]
+        elif item[0] == "dot":
+            xs.append(item[1][0])
+            ys.append(item[1][1])
+        else:
+            (x, y), text, anchor, size = item[1:]
+            w = 0.55 * size * len(text)
+            left = {"start": x, "middle": x - w / 2, "end": x - w}[anchor]
+            xs += [left, left + w]
+            ys += [y - size * 0.7, y + size * 0.7]
+    return min(xs) - MARGIN, min(ys) - MARGIN, max(xs) + MARGIN, max(ys) + MARGIN
+
+
+def render_svg(netlist, style=None):
+    """ SVG source for a netlist diagram. """
+    style = _style(style)
+    items = layout(netlist, style)
+    x0, y0, x1, y1 = _bounds(items)
+    w, h = x1 - x0, y1 - y0
+    color = html.escape(style["stroke"], quote=True)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{x0:.1f} {y0:.1f} {w:.1f} {h:.1f}" '
+        f'width="{w * style["scale"]:.0f}" height="{h * style["scale"]:.0f}">',
+        f'<rect x="{x0:.1f}" y="{y0:.1f}" width="{w:.1f}" height="{h:.1f}" fill="{html.escape(style["background"], quote=True)}"/>',
+        f'<g fill="none" stroke="{color}" stroke-linecap="round" stroke-linejoin="round">',
+    ]
+    texts = []
+    for item in items:
+        if item[0] == "path":
+            points = " ".join(f"{x:.1f},{y:.1f}" for x, y in item[1])
+            parts.append(f'<polyline points="{points}" stroke-width="{item[2]:g}"/>')
+        elif item[0] == "dot":
+            texts.append(f'<circle cx="{item[1][0]:.1f}" cy="{item[1][1]:.1f}" r="{item[2]:g}"/>')
+        else:
+            (x, y), text, anchor, size = item[1:]
+            texts.append(f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="{anchor}" dominant-baseline="middle" '
+                         f'font-size="{size:g}">{html.escape(text)}</text>')
+    parts.append("</g>")
+    parts.append(f'<g fill="{color}" font-family="{html.escape(style["font_family"], quote=True)}" font-style="italic">')
+    parts += texts
+    parts.append("</g></svg>")
+    return "\n".join(parts) + "\n"
+
+
+def render_png(netlist, style=None):
+    """ PNG bytes for a netlist diagram (needs Pillow). """
+    from PIL import Image, ImageDraw, ImageFont
+
+    style = _style(style)
+    items = layout(netlist, style)
+    x0, y0, x1, y1 = _bounds(items)
+    scale = style["scale"]
+    image = Image.new("RGB", (round((x1 - x0) * scale), round((y1 - y0) * scale)), style["background"])
+    draw = ImageDraw.Draw(image)
+
+    def at(p):
+        return ((p[0] - x0) * scale, (p[1] - y0) * scale)
+
+    fonts = {}
+
+    def font(size):
+        if size not in fonts:
+            for name in PNG_FONTS:
+                try:
+                    fonts[size] = (ImageFont.truetype(name, size), True)
+                    break
+                except OSError:
+                    continue
+            else:
+                fonts[size] = (ImageFont.load_default(size), False)
+        return fonts[size]
+
+    for item in items:
+        if item[0] == "path":
+            draw.line([at(p) for p in item[1]], fill=style["stroke"], width=max(1, round(item[2] * scale)), joint="curve")
+        elif item[0] == "dot":
+            x, y = at(item[1])
+            r = item[2] * scale
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=style["stroke"])
+        else:
+            xy, text, anchor, size = item[1:]
+            face, unicode = font(round(size * scale))
+            if not unicode:
+                text = text.replace("Ω", "ohm")
+            draw.text(at(xy), text, fill=style["stroke"], font=face, anchor={"start": "lm", "middle": "mm", "end": "rm"}[anchor])
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class RenderCache:
+    """ Rendered diagrams on disk, named by the hash of what was rendered, plus an in-memory LRU.
+
+    Disk recency is the file mtime (touched on every disk hit), so eviction survives restarts and
+    is shared by every process using the same directory.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, memory_items=MEMORY_ITEMS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, counted on first write
+
+    @staticmethod
+    def key(netlist, fmt, style):
+        blob = json.dumps([RENDER_VERSION, fmt, sorted(style.items()), netlist.to_text()])
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _path(self, key, fmt):
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def get(self, key, fmt):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        path = self._path(key, fmt)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key, fmt, data):
+        self._remember(key, data)
+        path = self._path(key, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _evict(self):
+        """ Delete least recently used files until the cache is at 80% of its limit. """
+        files = sorted(self._files())
+        self._size = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self._size <= self.max_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = RenderCache()
+    return _cache
+
+
+def render(netlist, fmt="svg", style=None, cache=None):
+    """ Diagram bytes for a netlist in `fmt` ("svg" or "png"), served from the render cache when possible. """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format {fmt!r}")
+    style = _style(style)
+    cache = cache or get_cache()
+    key = cache.key(netlist, fmt, style)
+    data = cache.get(key, fmt)
+    if data is not None:
+        metrics.inc("kirchhoff_diagram_renders_total", cache="hit")
+        return data
+    metrics.inc("kirchhoff_diagram_renders_total", cache="miss")
+    with metrics.span("render_diagram"):
+        data = render_svg(netlist, style).encode() if fmt == "svg" else render_png(netlist, style)
+    cache.put(key, fmt, data)
+    return data
+
+
+def problem_netlist(V1, V2, R1, R2, R3):
+    """ The two-loop circuit with branches in drawing order (left, middle, right) as in Diagrams/. """
+    branches = two_loop_netlist(V1, V2, R1, R2, R3).branches
+    return Netlist([branches[0], branches[2], branches[1]])
+
+
+def render_problem(set_number, fmt="svg", style=None):
+    """ Diagram for a problem set from data/problems.json, or None if the set doesn't exist. """
+    from store import get_store
+
+    problem = get_store().problem(set_number)
+    if problem is None:
+        return None
+    return render(problem_netlist(*problem), fmt, style)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render circuit diagrams from netlists or problem sets.")
+    parser.add_argument("netlist", nargs="?", help="netlist file to draw")
+    parser.add_argument("--set", type=int, help="problem set number to draw")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="svg")
+    parser.add_argument("-o", "--output", help="output file (default: stdout for SVG)")
+    parser.add_argument("--prerender", action="store_true", help="render every problem set into the cache")
+    args = parser.parse_args()
+
+    if args.prerender:
+        from store import get_store
+        for set_number in get_store().set_numbers:
+            for fmt in FORMATS:
+                render_problem(int(set_number), fmt)
+        print(f"Rendered {len(get_store().set_numbers)} sets into {get_cache().directory}")
+        return
+    if args.netlist:
+        data = render(load_netlist(args.netlist), args.format)
+    elif args.set is not None:
+        data = render_problem(args.set, args.format)
+        if data is None:
+            parser.error(f"no problem set {args.set}")
+    else:
+        parser.error("give a netlist file, --set or --prerender")
+
+    if args.output:
+        with open(args.output, "wb") as file:
+            file.write(data)
+    elif args.format == "svg":
+        print(data.decode(), end="")
+    else:
+        parser.error("PNG output needs -o")
+
+
+if __name__ == "__main__":
+    main()
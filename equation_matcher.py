@@ -0,0 +1,124 @@
+"""Row-space matching of student Kirchhoff equations.
+
+A student equation is correct when it lies in the span of the expected junction and loop rules
+(any loop, any combination of the rules), not only when it equals one of the hard-coded rows.
+For a circuit with a unique solution the augmented system [A | D] has rank 3 and its row space is
+exactly the set of rows orthogonal to x = (I1, I2, I3, 1). So the projector onto the complement of
+the span is n n^T with n = x / |x|, and membership is a single dot product with x per row.
+
+The residual is scale-aware: |r . x| is compared with sum(|r_i x_i|), the size of the individual
+terms, so junction rows (coefficients ~1, currents ~0.05 A) and loop rows (coefficients ~100 ohm,
+constants ~10 V) get the same relative tolerance.
+"""
+import threading
+import weakref
+
+import numpy as np
+
+from live_check import MATCH_RTOL, RANK_TOL, LiveMatcher  # noqa: F401 (LiveMatcher re-exported)
+from netlist import expected_equations_table, two_loop_netlist
+from store import get_store
+from student_sets import get_student_table
+
+
+# Topology of the app's circuit; only the values change between sets
+TWO_LOOP = two_loop_netlist(1, 1, 1, 1, 1)
+
+
+def expected_systems(params):
+    """ Junction and fundamental-loop rules of the app's circuit from its netlist (see netlist.py).
+
+    params (..., 5) = (V1, V2, R1, R2, R3) -> (..., 3, 4). Every valid Kirchhoff equation for the
+    circuit is a combination of these rows.
+    """
+    V1, V2, R1, R2, R3 = np.moveaxis(np.asarray(params, dtype=np.float64), -1, 0)
+    R = np.stack([R1, R2, R3], axis=-1)
+    V = np.stack([V1, -V2, np.zeros_like(V1)], axis=-1)  # two_loop_netlist's source directions
+    return expected_equations_table(TWO_LOOP, R, V)
+
+
+def solution_vectors(expected_eqs):
+    """ Null vectors x = (I..., 1) of stacked expected systems (..., E, n+1) via one batched SVD.
+
+    Rows of a set that has no unique solution (or NaN parameters) come back as NaN.
+    """
+    expected = np.asarray(expected_eqs, dtype=np.float64)
+    finite = np.isfinite(expected).all(axis=(-2, -1))
+    safe = np.where(finite[..., None, None], expected, 0.0)
+    _, s, vt = np.linalg.svd(safe)
+    n = vt[..., -1, :]
+    # Unique solution: rank one less than the number of columns and a nonzero constant component
+    rank = (s > 1e-9 * s[..., :1]).sum(axis=-1)
+    ok = finite & (rank == expected.shape[-1] - 1) & (np.abs(n[..., -1]) > 1e-12)
+    x = n / np.where(ok, n[..., -1], 1.0)[..., None]
+    return np.where(ok[..., None], x, np.nan)
+
+
+def span_matches(student_eqs, solutions, rtol=MATCH_RTOL):
+    """ Which student rows lie in the expected row space.
+
+    student_eqs: (N, k, n+1); solutions: (N, n+1) or (n+1,). Returns a (N, k) bool array.
+    """
+    rows = np.asarray(student_eqs, dtype=np.float64)
+    x = np.asarray(solutions, dtype=np.float64)
+    x = np.broadcast_to(x, (rows.shape[0], x.shape[-1]))[:, :, None]
+    residual = np.abs(rows @ x)[..., 0]
+    scale = (np.abs(rows) @ np.abs(x))[..., 0]
+    nonzero = np.any(rows[..., :-1] != 0, axis=-1)  # a bare constant or all-zero row is never an equation
+    finite = np.isfinite(rows).all(axis=-1)  # an inf coefficient would make residual <= rtol * scale hold
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return nonzero & finite & (residual <= rtol * scale)
+
+
+def independent_rows(student_eqs, tol=RANK_TOL):
+    """ Scale-aware version of check_linear_independence for stacked (N, k, n+1) equations. """
+    coeffs = np.asarray(student_eqs, dtype=np.float64)[..., :-1]
+    norms = np.linalg.norm(coeffs, axis=-1, keepdims=True)
+    ok = np.isfinite(coeffs).all(axis=(-2, -1)) & (norms[..., 0] > 0).all(axis=-1)
+    unit = np.where(ok[:, None, None], coeffs / np.where(norms > 0, norms, 1.0), 0.0)
+    s = np.linalg.svd(unit, compute_uv=False)
+    return ok & (s[..., -1] > tol) & (coeffs.shape[-2] <= coeffs.shape[-1])
+
+
+# Solution vectors for every problem set per store, rebuilt when the store reloads
+_cache = weakref.WeakKeyDictionary()  # store -> (version, solutions)
+_cache_lock = threading.Lock()
+
+
+def solution_table(store=None):
+    """ (max_set + 1, 4) table of x = (I1, I2, I3, 1) per set number (NaN rows for unknown sets). """
+    store = store or get_store()
+    store.refresh()
+    cached = _cache.get(store)
+    if cached is None or cached[0] != store.version:
+        with _cache_lock:
+            cached = _cache.get(store)
+            if cached is None or cached[0] != store.version:
+                if hasattr(store, "solutions"):  # precomputed in snapshots (see snapshot.py)
+                    cached = (store.version, store.solutions)
+                else:
+                    cached = (store.version, solution_vectors(expected_systems(store.problems)))
+                _cache[store] = cached
+    return cached[1]
+
+
+def match_equations(set_number, student_eqs, rtol=MATCH_RTOL, store=None):
+    """ Grade one submission: (list of per-equation matches, whether the equations are independent). """
+    table = solution_table(store)
+    rows = np.asarray(student_eqs, dtype=np.float64)[None]
+    set_number = int(set_number)
+    if not 0 < set_number < len(table):
+        return [False] * rows.shape[1], bool(independent_rows(rows)[0])
+    matches = span_matches(rows, table[set_number], rtol)[0]
+    return matches.tolist(), bool(independent_rows(rows)[0])
+
+
+def match_student_equations(student_id, student_eqs, rtol=MATCH_RTOL):
+    """ match_equations against a student's own circuit (see student_sets.py). """
+    table = get_student_table()
+    problem = None if table is None else table.problem(student_id)
+    rows = np.asarray(student_eqs, dtype=np.float64)[None]
+    if problem is None:
+        return [False] * rows.shape[1], bool(independent_rows(rows)[0])
+    solution = solution_vectors(expected_systems(problem))
+    return span_matches(rows, solution, rtol)[0].tolist(), bool(independent_rows(rows)[0])
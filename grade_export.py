@@ -0,0 +1,179 @@
+"""Grade a whole-class export of the Apps Script sheet.
+
+Reads a CSV or JSONL export (columns named like the logged payloads: set_number, I1, I2, I3 for
+current submissions, or set_number, student_equations for Kirchhoff submissions), grades it in
+chunks with the vectorized engine in grading.py and streams the graded rows to the output. Rows
+with course/assignment columns are graded against that assignment in the answer database (see
+answer_db.py); rows without a course use data/*.json.
+
+    python grade_export.py submissions.csv -o graded.csv
+    python grade_export.py kirchhoff.jsonl -o graded.jsonl --tolerance 0.5
+"""
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+
+import numpy as np
+
+from answer_db import store_for, submission_assignment
+from equation_matcher import independent_rows, solution_table, span_matches
+from grading import RESULT_LABELS, grade_currents, grade_equations, kirchhoff_coefficients_table, tolerance_rows
+from store import get_store
+
+CHUNK_SIZE = 65536
+
+# Columns added to current and equation rows
+CURRENT_COLUMNS = ["graded_result", "dI1", "dI2", "dI3"]
+EQUATION_COLUMNS = ["eq1_correct", "eq2_correct", "eq3_correct", "independent"]
+
+
+def read_rows(path, fmt):
+    """ Yield the export's rows as dicts, one at a time. """
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        if fmt == "jsonl":
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _set_index(values, table):
+    """ Set numbers as row indices into a store table; anything unknown maps to row 0 (all NaN). """
+    sets = np.array([_number(v) for v in values])
+    valid = np.isfinite(sets) & (sets == np.round(sets)) & (sets >= 1) & (sets < len(table))
+    return np.where(valid, sets, 0).astype(np.intp)
+
+
+def is_equation_row(row):
+    """ True for a Kirchhoff submission (current rows of a CSV export of the shared sheet leave this cell empty). """
+    return row.get("student_equations") not in (None, "")
+
+
+def _fieldnames(chunk):
+    """ CSV header for the output: the first chunk's columns plus the graded columns of each kind it can hold. """
+    fields = dict.fromkeys(key for row in chunk for key in row)
+    if "student_equations" in fields:
+        fields.update(dict.fromkeys(EQUATION_COLUMNS))
+    if "I1" in fields:
+        fields.update(dict.fromkeys(CURRENT_COLUMNS))
+    return list(fields)
+
+
+def _equations(value):
+    """ Parse the JSON-encoded student_equations column into a 3x4 array (NaN if malformed). """
+    try:
+        eqs = np.array(json.loads(value) if isinstance(value, str) else value, dtype=np.float64)
+        if eqs.shape == (3, 4):
+            return eqs
+    except (TypeError, ValueError):
+        pass
+    return np.full((3, 4), np.nan)
+
+
+def grade_current_chunk(rows, store, tolerance):
+    """ Add graded_result and dI1..dI3 to each row of currents. """
+    index = _set_index([row.get("set_number") for row in rows], store.answers)
+    currents = np.array([[_number(row.get(f"I{i}")) for i in (1, 2, 3)] for row in rows])
+    if tolerance is None:
+        tolerance = tolerance_rows(store.tolerances[index])  # per-set bands from data/tolerances.json
+    results, differences = grade_currents(currents, store.answers[index], tolerance)
+    for row, result, diff in zip(rows, RESULT_LABELS[results].tolist(), differences.tolist()):
+        row["graded_result"] = result
+        for i, d in enumerate(diff, start=1):
+            row[f"dI{i}"] = round(d, 4)
+
+
+def grade_equation_chunk(rows, store, atol, matcher="span"):
+    """ Add eq1_correct..eq3_correct and independent to each row of equations. """
+    index = _set_index([row.get("set_number") for row in rows], store.problems)
+    student_eqs = np.stack([_equations(row.get("student_equations")) for row in rows])
+    if matcher == "span":
+        matches = span_matches(student_eqs, solution_table(store)[index])
+        independent = independent_rows(student_eqs)
+    else:
+        expected = kirchhoff_coefficients_table(store.problems[index])
+        matches, independent = grade_equations(student_eqs, expected, atol=atol)
+    matches &= (index > 0)[:, None]  # unknown set: nothing matches
+    for row, match, indep in zip(rows, matches.tolist(), independent.tolist()):
+        for i, m in enumerate(match, start=1):
+            row[f"eq{i}_correct"] = m
+        row["independent"] = indep
+
+
+def grade_export(rows, out, out_format, tolerance=None, atol=0.1, matcher="span", chunk_size=CHUNK_SIZE):
+    """ Grade an iterable of exported rows chunk by chunk and write them to `out`. Returns the row count. """
+    default = get_store()
+    stores = {}
+    writer = None
+    count = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        # Each course's rows are graded (in place) against its own answer key, and the sheet mixes
+        # current and equation submissions, so group by both; output keeps the input order
+        groups = {}
+        for row in chunk:
+            groups.setdefault((submission_assignment(row), is_equation_row(row)), []).append(row)
+        for (key, equations), group in groups.items():
+            if key not in stores:
+                stores[key] = store_for(key, default)
+            if equations:
+                grade_equation_chunk(group, stores[key], atol, matcher)
+            else:
+                grade_current_chunk(group, stores[key], tolerance)
+        if out_format == "csv" and writer is None:
+            writer = csv.DictWriter(out, fieldnames=_fieldnames(chunk), extrasaction="ignore")
+            writer.writeheader()
+        for row in chunk:
+            if out_format == "jsonl":
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            else:
+                writer.writerow(row)
+        count += len(chunk)
+    return count
+
+
+def _format(path, explicit):
+    if explicit:
+        return explicit
+    return "jsonl" if path and path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade a CSV/JSONL export of submissions in bulk.")
+    parser.add_argument("input", help="CSV or JSONL export of the submissions sheet")
+    parser.add_argument("-o", "--output", help="where to write graded rows (default: stdout)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="current tolerance in mA (default: per-set bands, or 1 where none were derived)")
+    parser.add_argument("--matcher", choices=["span", "pairwise"], default="span",
+                        help="span: any valid junction/loop equation (as in the app); pairwise: the original row-by-row check")
+    parser.add_argument("--atol", type=float, default=0.1, help="pairwise equation tolerance after normalization (default 0.1)")
+    args = parser.parse_args(argv)
+
+    rows = read_rows(args.input, _format(args.input, args.input_format))
+    out_format = _format(args.output, args.output_format)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = grade_export(rows, out, out_format, args.tolerance, args.atol, args.matcher)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Graded {count} submissions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Grading core shared by the Streamlit app, the batch CLI and the HTTP API.
+
+The first half grades one submission at a time (what app.py does on a button click); the second
+half grades N submissions at once with the same rules in a single NumPy pass.
+"""
+import numpy as np
+
+from store import get_store
+
+# Tolerance for rounding (in mA)
+TOLERANCE = 1
+
+# Result codes used by the batch engine, and their labels as written to the Google Sheet
+CORRECT, ALMOST_CORRECT, INCORRECT, INVALID_SET = 0, 1, 2, 3
+RESULT_LABELS = np.array(["Correct", "Almost correct", "Incorrect", "Invalid set"])
+
+
+# Normalize equations for comparison
+def normalize_equation(eq):
+    """ Normalize an equation by dividing all terms by the first nonzero coefficient. """
+    coeffs = np.array(eq, dtype=np.float64)
+    nonzero_indices = np.nonzero(coeffs[:-1])[0]  # Find nonzero coefficients (ignore constant term)
+
+    if len(nonzero_indices) == 0:  # If all coefficients are zero, return as-is to avoid errors
+        return coeffs
+
+    first_nonzero = nonzero_indices[0]  # Get index of first nonzero coefficient
+    return coeffs / coeffs[first_nonzero]  # Normalize
+
+
+def compare_equations(student_eqs, expected_eqs):
+    """ Check if student equations match expected equations (within tolerance). """
+    normalized_student_eqs = [normalize_equation(eq) for eq in student_eqs]
+    normalized_expected_eqs = [normalize_equation(eq) for eq in expected_eqs]
+
+    matches = []
+    for stud_eq in normalized_student_eqs:
+        match_found = any(np.allclose(stud_eq, exp_eq, atol=0.1) for exp_eq in normalized_expected_eqs)
+        matches.append(match_found)
+
+    return matches
+
+
+def check_linear_independence(equations):
+    """ Check if the given equations are linearly independent. """
+    coeff_matrix = np.array([eq[:-1] for eq in equations])  # Exclude the constant term
+    rank = np.linalg.matrix_rank(coeff_matrix)
+    return rank == len(equations)
+
+
+# Function to compute Kirchhoff equation coefficients
+def compute_kirchhoff_coefficients(V1, V2, R1, R2, R3):
+    eq1 = (1, -1, -1, 0)  # I1 - I2 - I3 = 0 (Junction rule)
+    eq2 = (-R1, 0, -R3, V1)  # V1 - R3 I3 - R1 I1 = 0 (Left loop)
+    eq3 = (0, R2, -R3, V2)  # V2 + R2 I2 - R3 I3 = 0 (Right loop)
+    eq4 = (-R1, -R2, 0, V1 - V2)  # V1 - R2 I2 - V2 - R1 I1 = 0 (Big loop)
+    return [eq1, eq2, eq3, eq4]
+
+
+# Check Answer Logic
+def is_close(actual, expected, tol=TOLERANCE):
+    return abs(actual - expected) <= tol
+
+
+def result_message(code, differences=None):
+    """ The feedback text shown to students for a result code. """
+    if code == CORRECT:
+        return "✅ Correct! All currents exactly match the answer key."
+    if code == ALMOST_CORRECT:
+        diff_message = "\n".join([f"I{index+1}: off by {diff:.2f} mA" for index, diff in enumerate(differences)])
+        return f"⚠️ Almost correct (within rounding tolerance).\n{diff_message}"
+    if code == INVALID_SET:
+        return "⚠️ Invalid set number. Please check with your instructor."
+    return "❌ Incorrect. Try again!"
+
+
+def check_answer(set_number, I1, I2, I3, tol=None, store=None):
+    """ Feedback for one submission; tol defaults to the set's derived bands (see tolerances.py).
+
+    store is the answer key to grade against (an answer_db assignment); the default is data/*.json.
+    """
+    store = store or get_store()
+    if tol is None:
+        tol = store.tolerance(set_number) or TOLERANCE
+    return grade_answer(store.answer(set_number), I1, I2, I3, tol)
+
+
+def check_student_answer(student_id, I1, I2, I3, tol=TOLERANCE):
+    """ check_answer against a student's own circuit (see student_sets.py). """
+    from student_sets import get_student_table
+
+    table = get_student_table()
+    return grade_answer(None if table is None else table.answer(student_id), I1, I2, I3, tol)
+
+
+def grade_answer(correct, I1, I2, I3, tol=TOLERANCE):
+    """ Feedback for one submission against an answer key row (None when the set is unknown).
+
+    tol is one tolerance for all three currents or a list with one per current.
+    """
+    if correct is None:
+        return result_message(INVALID_SET)
+
+    tols = tol if isinstance(tol, (list, tuple)) else [tol] * 3
+    close_match = all(is_close(student, correct_value, t) for student, correct_value, t in zip([I1, I2, I3], correct, tols))
+
+    if [I1, I2, I3] == correct:
+        return result_message(CORRECT)
+    elif close_match:
+        differences = [abs(student - correct_value) for student, correct_value in zip([I1, I2, I3], correct)]
+        return result_message(ALMOST_CORRECT, differences)
+    else:
+        return result_message(INCORRECT)
+
+
+def tolerance_rows(bands):
+    """ Store tolerance rows with the global TOLERANCE in place of missing (NaN) bands. """
+    bands = np.asarray(bands, dtype=np.float64)
+    return np.where(np.isnan(bands), TOLERANCE, bands)
+
+
+def normalize_equations(eqs):
+    """ Vectorized normalize_equation: divide each row (last axis) by its first nonzero coefficient. """
+    coeffs = np.asarray(eqs, dtype=np.float64)
+    nonzero = coeffs[..., :-1] != 0  # ignore the constant term
+    first = nonzero.argmax(axis=-1)[..., None]
+    pivot = np.take_along_axis(coeffs, first, axis=-1)
+    pivot = np.where(nonzero.any(axis=-1, keepdims=True), pivot, 1.0)  # all-zero rows stay as-is
+    return coeffs / pivot
+
+
+def kirchhoff_coefficients_table(params):
+    """ Vectorized compute_kirchhoff_coefficients: params (..., 5) -> expected equations (..., 4, 4). """
+    V1, V2, R1, R2, R3 = np.moveaxis(np.asarray(params, dtype=np.float64), -1, 0)
+    zero, one = np.zeros_like(V1), np.ones_like(V1)
+    return np.stack([
+        np.stack([one, -one, -one, zero], axis=-1),   # I1 - I2 - I3 = 0 (Junction rule)
+        np.stack([-R1, zero, -R3, V1], axis=-1),      # V1 - R3 I3 - R1 I1 = 0 (Left loop)
+        np.stack([zero, R2, -R3, V2], axis=-1),       # V2 + R2 I2 - R3 I3 = 0 (Right loop)
+        np.stack([-R1, -R2, zero, V1 - V2], axis=-1), # V1 - R2 I2 - V2 - R1 I1 = 0 (Big loop)
+    ], axis=-2)
+
+
+def grade_currents(currents, answers, tol=TOLERANCE):
+    """ Grade N submissions at once.
+
+    currents: (N, 3) student currents in mA; answers: (N, 3) or (3,) answer key rows (NaN for
+    an unknown set); tol: a scalar or per-row/per-current bands broadcastable to (N, 3).
+    Returns (result codes (N,), absolute differences (N, 3)).
+    """
+    currents = np.asarray(currents, dtype=np.float64)
+    answers = np.broadcast_to(np.asarray(answers, dtype=np.float64), currents.shape)
+    differences = np.abs(currents - answers)
+    results = np.full(len(currents), INCORRECT, dtype=np.int8)
+    results[(differences <= tol).all(axis=1)] = ALMOST_CORRECT
+    results[(currents == answers).all(axis=1)] = CORRECT
+    results[np.isnan(answers).any(axis=1)] = INVALID_SET
+    return results, differences
+
+
+def grade_equations(student_eqs, expected_eqs, atol=0.1, rtol=1e-5):
+    """ Grade N equation submissions at once.
+
+    student_eqs: (N, 3, 4); expected_eqs: (N, E, 4) or (E, 4). A student row matches when it is
+    np.allclose to any expected row after normalization. Returns (matches (N, 3), independent (N,)).
+    """
+    student_eqs = np.asarray(student_eqs, dtype=np.float64)
+    student = normalize_equations(student_eqs)
+    expected = normalize_equations(expected_eqs)
+    if expected.ndim == 2:
+        expected = expected[None]
+
+    # (N, 3, 1, 4) against (N|1, 1, E, 4), same test as np.allclose
+    close = np.abs(student[:, :, None, :] - expected[:, None, :, :]) <= atol + rtol * np.abs(expected[:, None, :, :])
+    matches = close.all(axis=-1).any(axis=-1)
+
+    # Rank test of check_linear_independence, one stacked SVD for the whole batch
+    coeffs = student_eqs[..., :-1]
+    finite = np.isfinite(coeffs).all(axis=(1, 2))
+    ranks = np.linalg.matrix_rank(np.where(finite[:, None, None], coeffs, 0.0))
+    independent = finite & (ranks == student_eqs.shape[1])
+    return matches, independent
@@ -0,0 +1,348 @@
+"""Headless grading service: the app's grading rules over JSON/HTTP for LMS integrations.
+
+    python grading_api.py --port 8600 [--workers 4] [--processes 2]
+
+Endpoints (JSON in, JSON out):
+
+    GET  /health
+    GET  /metrics          Prometheus text (when KIRCHHOFF_METRICS=1)
+    POST /grade/currents   {"set_number": 1, "I1": 55.9, "I2": 18.3, "I3": 37.7}
+    POST /grade/equations  {"set_number": 1, "equations": [[1, -1, -1, 0], [...], [...]]}
+    POST /grade/bulk       {"currents": [<currents request>...], "equations": [<equations request>...]}
+
+A request may also name "course" and "assignment" to be graded against that assignment in the
+answer database (see answer_db.py); without them data/*.json is used. An assignment that isn't in
+the database grades every set as unknown.
+
+Incorrect answers come back with a "hint" (currents) or "hints" (equations) naming the likely
+mistake when it is one of the common ones (see diagnosis.py).
+
+Single requests arriving close together are collected into micro-batches and graded with one
+vectorized NumPy call on a thread pool, so the event loop only parses and answers HTTP.
+Connections are HTTP/1.1 keep-alive.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+from answer_db import store_for, submission_assignment
+from diagnosis import current_hint, equation_hints
+from equation_matcher import independent_rows, solution_table, span_matches
+from grading import INCORRECT, RESULT_LABELS, grade_currents, result_message, tolerance_rows
+
+MAX_BODY = 16 * 1024 * 1024
+SET_NUMBER_LIMIT = 2 ** 31  # set numbers are int32 in the student table and analytics
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _set_number(request):
+    value = request.get("set_number")
+    # json.loads accepts NaN and Infinity, and Python ints of any size
+    if (isinstance(value, bool) or not isinstance(value, (int, float))
+            or (isinstance(value, float) and not math.isfinite(value))
+            or abs(value) >= SET_NUMBER_LIMIT or value != int(value)):
+        raise RequestError("set_number must be an integer")
+    return int(value)
+
+
+def _finite(values, name):
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in values):
+        raise RequestError(f"{name} must be finite numbers")
+    return [float(v) for v in values]
+
+
+def _assignment(request):
+    if not all(isinstance(request.get(name), (str, type(None))) for name in ("course", "assignment")):
+        raise RequestError("course and assignment must be strings")
+    return submission_assignment(request)
+
+
+def parse_currents(request):
+    """ Validate a currents request into (set_number, [I1, I2, I3], (course, assignment) or None). """
+    if not isinstance(request, dict):
+        raise RequestError("expected a JSON object")
+    return _set_number(request), _finite([request.get(f"I{i}") for i in (1, 2, 3)], "I1, I2, I3"), _assignment(request)
+
+
+def parse_equations(request):
+    """ Validate an equations request into (set_number, 3x4 list, (course, assignment) or None). """
+    if not isinstance(request, dict):
+        raise RequestError("expected a JSON object")
+    eqs = request.get("equations")
+    if not isinstance(eqs, list) or len(eqs) != 3 or not all(isinstance(eq, list) and len(eq) == 4 for eq in eqs):
+        raise RequestError("equations must be 3 rows of 4 coefficients")
+    return _set_number(request), [_finite(eq, "equations") for eq in eqs], _assignment(request)
+
+
+def _set_index(set_numbers, table):
+    # Out-of-range sets map to row 0 before they reach NumPy (a huge int would overflow int64)
+    return np.array([s if 1 <= s < len(table) else 0 for s in set_numbers], dtype=np.int64)
+
+
+def _by_store(items, grade):
+    """ Run grade(store, items) once per answer key named by the items, keeping the items' order. """
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(item[2], []).append(i)
+    results = [None] * len(items)
+    for key, positions in groups.items():
+        store = store_for(key)
+        store.refresh()
+        for i, result in zip(positions, grade(store, [items[i] for i in positions])):
+            results[i] = result
+    return results
+
+
+def _grade_currents(store, items):
+    answers = store.answers
+    index = _set_index([s for s, _, _ in items], answers)
+    with metrics.span("api_grade_currents"):
+        codes, differences = grade_currents(np.array([c for _, c, _ in items]), answers[index], tolerance_rows(store.tolerances[index]))
+    return [
+        {"set_number": s, "result": str(RESULT_LABELS[code]), "message": result_message(code, diff),
+         "differences": [None if math.isnan(d) else d for d in diff],
+         "hint": current_hint(store.problem(s), c) if code == INCORRECT else None}
+        for (s, c, _), code, diff in zip(items, codes.tolist(), differences.tolist())
+    ]
+
+
+def _grade_equations(store, items):
+    solutions = solution_table(store)
+    index = _set_index([s for s, _, _ in items], solutions)
+    eqs = np.array([e for _, e, _ in items], dtype=np.float64)
+    with metrics.span("api_grade_equations"):
+        matches = span_matches(eqs, solutions[index]) & (index > 0)[:, None]
+        independent = independent_rows(eqs)
+    return [
+        {"set_number": s, "matches": m, "independent": ind,
+         "hints": equation_hints(store.problem(s), e, m) if index[i] and not all(m) else [None] * len(m)}
+        for i, ((s, e, _), m, ind) in enumerate(zip(items, matches.tolist(), independent.tolist()))
+    ]
+
+
+def grade_current_items(items):
+    """ Grade [(set_number, currents, assignment)...], one vectorized pass per answer key. """
+    results = _by_store(items, _grade_currents)
+    metrics.inc("kirchhoff_submissions_total", len(items), kind="currents", source="api")
+    return results
+
+
+def grade_equation_items(items):
+    """ Grade [(set_number, equations, assignment)...], one vectorized pass per answer key. """
+    results = _by_store(items, _grade_equations)
+    metrics.inc("kirchhoff_submissions_total", len(items), kind="equations", source="api")
+    return results
+
+
+class MicroBatcher:
+    """ Collects concurrent single requests and grades them together on the worker pool. """
+
+    def __init__(self, grade, executor, max_batch=512, max_delay=0.002):
+        self.grade = grade
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._items = []
+        self._futures = []
+        self._timer = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        if not items:
+            return
+        task = asyncio.get_running_loop().run_in_executor(self.executor, self._grade, items)
+
+        def resolve(done):
+            error = done.exception()
+            for i, future in enumerate(futures):
+                if future.done():
+                    continue
+                result = error if error is not None else done.result()[i]
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+        task.add_done_callback(resolve)
+
+    def _grade(self, items):
+        """ Grade a batch; if it fails, grade its items one by one so a bad item only fails its own request. """
+        try:
+            return self.grade(items)
+        except Exception:
+            if len(items) == 1:
+                raise
+        results = []
+        for item in items:
+            try:
+                results.append(self.grade([item])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class GradingServer:
+    def __init__(self, workers=None, max_batch=512, max_delay=0.002):
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 2)
+        self.currents = MicroBatcher(grade_current_items, self.executor, max_batch, max_delay)
+        self.equations = MicroBatcher(grade_equation_items, self.executor, max_batch, max_delay)
+
+    async def dispatch(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, metrics.render_prometheus()
+        if path not in ("/grade/currents", "/grade/equations", "/grade/bulk"):
+            raise RequestError("not found", 404)
+        if method != "POST":
+            raise RequestError("use POST", 405)
+        try:
+            request = json.loads(body or b"null")
+        except ValueError:
+            raise RequestError("body is not valid JSON") from None
+
+        if path == "/grade/currents":
+            return 200, await self.currents.submit(parse_currents(request))
+        if path == "/grade/equations":
+            return 200, await self.equations.submit(parse_equations(request))
+
+        if not isinstance(request, dict):
+            raise RequestError("expected a JSON object")
+        currents = [parse_currents(r) for r in request.get("currents") or []]
+        equations = [parse_equations(r) for r in request.get("equations") or []]
+        loop = asyncio.get_running_loop()
+        response = {}
+        if currents:
+            response["currents"] = await loop.run_in_executor(self.executor, grade_current_items, currents)
+        if equations:
+            response["equations"] = await loop.run_in_executor(self.executor, grade_equation_items, equations)
+        return 200, response
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = header.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # Without a usable length the rest of the stream cannot be framed
+                    status, payload, keep_alive = 400, {"error": "invalid Content-Length"}, False
+                elif length > MAX_BODY:
+                    status, payload, keep_alive = 413, {"error": "request too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+                    except RequestError as e:
+                        status, payload = e.status, {"error": str(e)}
+                    except Exception:
+                        traceback.print_exc()
+                        status, payload = 500, {"error": "internal error"}
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, reuse_port=False):
+        # Warm the store and per-set solution cache before taking traffic
+        solution_table()
+        server = await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port or None, backlog=1024)
+        print(f"Grading API listening on http://{host}:{port} (pid {os.getpid()})")
+        async with server:
+            await server.serve_forever()
+
+
+def run(host, port, workers, reuse_port=False):
+    try:
+        asyncio.run(GradingServer(workers).serve(host, port, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the grading core over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=None, help="grading threads per process")
+    parser.add_argument("--processes", type=int, default=1, help="event-loop processes sharing the port (Linux)")
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1:
+        run(args.host, args.port, args.workers)
+        return
+    processes = [
+        multiprocessing.Process(target=run, args=(args.host, args.port, args.workers, True))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Live checking of the three Kirchhoff equations as students type, in plain Python.
+
+The same rules as span_matches and independent_rows in equation_matcher.py, for one row at a time.
+This module imports no NumPy, so the app can build a checker from the startup snapshot's solution
+vector (see snapshot.py) without loading the grading code.
+"""
+import math
+
+# Relative residual below which an equation counts as satisfied by the circuit's solution
+MATCH_RTOL = 0.01
+
+# Row-normalized coefficient matrices with a singular value below this are dependent
+RANK_TOL = 1e-6
+
+
+def _unit(coeffs):
+    """ Coefficients scaled to unit length, or None for an all-zero or non-finite row. """
+    norm = math.sqrt(sum(c * c for c in coeffs))
+    if not math.isfinite(norm) or norm == 0:
+        return None
+    return tuple(c / norm for c in coeffs)
+
+
+def _cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+class LiveMatcher:
+    """ Per-equation matching for three equations edited one at a time (live feedback as students type).
+
+    Same rules as span_matches and independent_rows, in plain Python on one row: a changed row costs
+    one dot product with the solution vector. Independence is the determinant of the unit coefficient
+    rows, taken as the changed row dotted with the cross product of the other two, which is cached
+    until one of those two changes. Unchanged rows keep their results.
+    """
+
+    def __init__(self, solution, rtol=MATCH_RTOL, tol=RANK_TOL):
+        self.x = tuple(float(v) for v in solution)
+        self.rtol = rtol
+        self.tol = tol
+        self.rows = [None] * 3
+        self.matches = [False] * 3
+        self.hints = [None] * 3
+        self._units = [None] * 3
+        self._crosses = [None] * 3  # _crosses[k]: cross product of the two rows other than k
+        self._last = 0
+
+    @classmethod
+    def for_problem(cls, problem):
+        """ A matcher for circuit (V1, V2, R1, R2, R3), solved with NumPy (the snapshot stores the solution). """
+        from equation_matcher import expected_systems, solution_vectors
+
+        return cls(solution_vectors(expected_systems(problem)))
+
+    def match(self, row):
+        """ span_matches for a single row. """
+        if not any(row[:-1]) or not all(math.isfinite(v) for v in row):
+            return False
+        residual = abs(sum(r * x for r, x in zip(row, self.x)))
+        scale = sum(abs(r * x) for r, x in zip(row, self.x))
+        return residual <= self.rtol * scale  # False for NaN rows or an unknown circuit
+
+    def update(self, k, row):
+        """ Record equation k's current coefficients; returns True if they changed. """
+        row = tuple(float(v) for v in row)
+        if row == self.rows[k]:
+            return False
+        self.rows[k] = row
+        self.matches[k] = self.match(row)
+        self.hints[k] = None
+        self._units[k] = _unit(row[:-1])
+        for j in range(3):
+            if j != k:
+                self._crosses[j] = None
+        self._last = k
+        return True
+
+    def independent(self):
+        """ independent_rows for the three current rows. """
+        k = self._last
+        if any(unit is None for unit in self._units):
+            return False
+        if self._crosses[k] is None:
+            i, j = (n for n in range(3) if n != k)
+            self._crosses[k] = _cross(self._units[i], self._units[j])
+        det = sum(a * b for a, b in zip(self._units[k], self._crosses[k]))
+        return abs(det) > self.tol
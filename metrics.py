@@ -0,0 +1,151 @@
+"""Lightweight timing spans and counters with Prometheus text export.
+
+Off unless KIRCHHOFF_METRICS=1. When off, span() hands back a shared no-op context manager and
+inc()/set_gauge() return after one flag check, so the instrumentation can stay in the app.
+When on, a background thread rewrites KIRCHHOFF_METRICS_FILE (Prometheus text format, suitable for
+the node_exporter textfile collector) every KIRCHHOFF_METRICS_INTERVAL seconds, and grading_api.py
+serves the same text at GET /metrics.
+"""
+import contextlib
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("KIRCHHOFF_METRICS", "") not in ("", "0", "false")
+METRICS_FILE = os.environ.get("KIRCHHOFF_METRICS_FILE", "metrics/kirchhoff.prom")
+METRICS_INTERVAL = float(os.environ.get("KIRCHHOFF_METRICS_INTERVAL", "10"))
+
+# Histogram buckets for stage timings (seconds)
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_NOOP = contextlib.nullcontext()
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_gauges = {}      # (name, labels) -> value or zero-argument callable
+_histograms = {}  # stage -> [bucket counts..., count, sum]
+_writer = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """ Add to a counter, e.g. inc("kirchhoff_outcomes_total", result="Correct"). """
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """ Set a gauge to a number, or to a callable evaluated at export time. """
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(stage, seconds):
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def span(stage):
+    """ Time a block: `with span("grade_currents"): ...` """
+    if not ENABLED:
+        return _NOOP
+    _ensure_writer()
+    return _Span(stage)
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """ All metrics in Prometheus text exposition format. """
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {stage: list(h) for stage, h in _histograms.items()}
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_labels(labels)} {value}")
+    for name in sorted({name for name, _ in gauges}):
+        lines.append(f"# TYPE {name} gauge")
+        for (n, labels), value in sorted(gauges.items(), key=lambda item: item[0]):
+            if n == name:
+                try:
+                    value = value() if callable(value) else value
+                except Exception:
+                    continue
+                lines.append(f"{name}{_labels(labels)} {value}")
+    if histograms:
+        name = "kirchhoff_stage_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for stage, h in sorted(histograms.items()):
+            for bound, count in zip(BUCKETS, h):
+                lines.append(f"{name}_bucket{_labels([('stage', stage)], [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_labels([('stage', stage)], [('le', '+Inf')])} {h[-2]}")
+            lines.append(f"{name}_count{_labels([('stage', stage)])} {h[-2]}")
+            lines.append(f"{name}_sum{_labels([('stage', stage)])} {h[-1]:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=METRICS_FILE):
+    """ Atomically replace `path` with the current metrics. """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as file:
+        file.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def _write_loop():
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        try:
+            write_metrics_file()
+        except OSError as e:
+            print(f"Error writing metrics file: {e}")
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None and METRICS_FILE:
+        with _lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_loop, name="metrics-writer", daemon=True)
+                _writer.start()
@@ -0,0 +1,199 @@
+"""Netlist format for resistor/source circuits and the Kirchhoff equations they imply.
+
+One branch per line: a current label, the node the current leaves, the node it enters, the
+branch resistance and (optionally) the EMF of a source in series, positive when it pushes
+current from the first node towards the second. Node "0" is ground; "#" starts a comment.
+
+    # label from to  R=ohms  V=volts
+    I1      0    a   R=120   V=15
+    I2      a    0   R=180   V=-5
+    I3      a    0   R=220
+
+That is the two-loop circuit of compute_kirchhoff_coefficients(15, 5, 120, 180, 220).
+"""
+import hashlib
+from collections import deque, namedtuple
+
+import numpy as np
+
+GROUND = "0"
+
+Branch = namedtuple("Branch", ["label", "node_from", "node_to", "R", "V"])
+
+
+class Netlist:
+    """ A parsed circuit: branches in file order and nodes with ground first. """
+
+    def __init__(self, branches):
+        if not branches:
+            raise ValueError("netlist has no branches")
+        labels = [b.label for b in branches]
+        if len(set(labels)) != len(labels):
+            raise ValueError("branch labels must be unique")
+        for b in branches:
+            if b.R < 0:
+                raise ValueError(f"branch {b.label}: negative resistance")
+            if b.node_from == b.node_to:
+                raise ValueError(f"branch {b.label}: both ends on node {b.node_from}")
+        self.branches = list(branches)
+        nodes = {GROUND: 0}
+        for b in self.branches:
+            for node in (b.node_from, b.node_to):
+                nodes.setdefault(node, len(nodes))
+        if not any(GROUND in (b.node_from, b.node_to) for b in self.branches):
+            raise ValueError("netlist must connect to ground node '0'")
+        self.nodes = list(nodes)
+        self.node_index = nodes
+
+    @property
+    def labels(self):
+        return [b.label for b in self.branches]
+
+    def to_text(self):
+        """ Canonical text form (also what the netlist hash is computed from). """
+        lines = []
+        for b in self.branches:
+            line = f"{b.label} {b.node_from} {b.node_to} R={b.R!r}"
+            if b.V:
+                line += f" V={b.V!r}"
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    def hash(self):
+        return hashlib.sha256(self.to_text().encode()).hexdigest()
+
+
+def parse_netlist(text):
+    """ Parse netlist text into a Netlist. """
+    branches = []
+    for number, raw in enumerate(text.splitlines(), start=1):
+        line = raw.split("#", 1)[0].strip()
+        if not line:
+            continue
+        fields = line.split()
+        if len(fields) < 4:
+            raise ValueError(f"line {number}: expected 'label from to R=... [V=...]'")
+        label, node_from, node_to = fields[:3]
+        values = {"R": None, "V": 0.0}
+        for field in fields[3:]:
+            key, _, value = field.partition("=")
+            if key.upper() not in values or not value:
+                raise ValueError(f"line {number}: unknown field {field!r}")
+            try:
+                values[key.upper()] = float(value)
+            except ValueError:
+                raise ValueError(f"line {number}: {field!r} is not a number") from None
+        if values["R"] is None:
+            raise ValueError(f"line {number}: missing R=")
+        branches.append(Branch(label, node_from, node_to, values["R"], values["V"]))
+    return Netlist(branches)
+
+
+def load_netlist(path):
+    with open(path, "r") as file:
+        return parse_netlist(file.read())
+
+
+def two_loop_netlist(V1, V2, R1, R2, R3):
+    """ The circuit used by compute_kirchhoff_coefficients, with the same current directions. """
+    return Netlist([
+        Branch("I1", GROUND, "a", float(R1), float(V1)),
+        Branch("I2", "a", GROUND, float(R2), -float(V2)),
+        Branch("I3", "a", GROUND, float(R3), 0.0),
+    ])
+
+
+def cycle_basis(netlist):
+    """ Fundamental cycles of the circuit graph from a BFS spanning tree.
+
+    Returns one list of (branch index, +1/-1) per independent loop; the sign says whether the
+    loop traverses the branch along its current direction.
+    """
+    adjacency = [[] for _ in netlist.nodes]
+    for k, b in enumerate(netlist.branches):
+        f, t = netlist.node_index[b.node_from], netlist.node_index[b.node_to]
+        adjacency[f].append((t, k, 1))
+        adjacency[t].append((f, k, -1))
+
+    # parent[node] = (parent node, branch index, sign of branch when walking parent -> node)
+    parent = {0: None}
+    depth = {0: 0}
+    tree = set()
+    queue = deque([0])
+    while queue:
+        node = queue.popleft()
+        for other, k, sign in adjacency[node]:
+            if other not in parent:
+                parent[other] = (node, k, sign)
+                depth[other] = depth[node] + 1
+                tree.add(k)
+                queue.append(other)
+    if len(parent) != len(netlist.nodes):
+        raise ValueError("circuit is not connected")
+
+    cycles = []
+    for k, b in enumerate(netlist.branches):
+        if k in tree:
+            continue
+        # Walk the branch from -> to, then back through the tree from `to` to `from`
+        u, v = netlist.node_index[b.node_to], netlist.node_index[b.node_from]
+        up, down = [], []  # up: from u towards the common ancestor; down: from v towards it
+        while depth[u] > depth[v]:
+            p, kk, s = parent[u]
+            up.append((kk, -s))
+            u = p
+        while depth[v] > depth[u]:
+            p, kk, s = parent[v]
+            down.append((kk, s))
+            v = p
+        while u != v:
+            p, kk, s = parent[u]
+            up.append((kk, -s))
+            u = p
+            p, kk, s = parent[v]
+            down.append((kk, s))
+            v = p
+        cycles.append([(k, 1)] + up + down[::-1])
+    return cycles
+
+
+def expected_equations(netlist):
+    """ Independent Kirchhoff equations as rows [coefficients of each branch current..., constant].
+
+    Same convention as compute_kirchhoff_coefficients (sum(coeff * I) + constant = 0): one junction
+    rule per non-ground node (currents in positive) and one loop rule per fundamental cycle
+    (EMF rises positive, IR drops negative along the loop). Returns a NumPy array.
+    """
+    n = len(netlist.branches)
+    cycles = cycle_basis(netlist)
+    n_nodes = len(netlist.nodes) - 1
+    rows = np.zeros((n_nodes + len(cycles), n + 1))
+    for k, b in enumerate(netlist.branches):
+        t, f = netlist.node_index[b.node_to] - 1, netlist.node_index[b.node_from] - 1
+        if t >= 0:
+            rows[t, k] += 1
+        if f >= 0:
+            rows[f, k] -= 1
+    for c, cycle in enumerate(cycles, start=n_nodes):
+        for k, sign in cycle:
+            b = netlist.branches[k]
+            rows[c, k] -= sign * b.R
+            rows[c, n] += sign * b.V
+    return rows
+
+
+def expected_equations_table(netlist, R, V):
+    """ expected_equations for many circuits with the netlist's topology, vectorized.
+
+    R, V: (..., branches) resistances and EMFs in branch order. The rows are linear in R and V, so
+    they are built from the topology's equations with each R and V set to 1 in turn.
+    Returns (..., junctions + loops, branches + 1).
+    """
+    zero = [b._replace(R=0.0, V=0.0) for b in netlist.branches]
+    base = expected_equations(Netlist(zero))
+    per_R, per_V = [], []
+    for k in range(len(zero)):
+        per_R.append(expected_equations(Netlist(zero[:k] + [zero[k]._replace(R=1.0)] + zero[k + 1:])) - base)
+        per_V.append(expected_equations(Netlist(zero[:k] + [zero[k]._replace(V=1.0)] + zero[k + 1:])) - base)
+    R, V = np.asarray(R, dtype=np.float64), np.asarray(V, dtype=np.float64)
+    return base + np.einsum("...k,kij->...ij", R, np.array(per_R)) + np.einsum("...k,kij->...ij", V, np.array(per_V))
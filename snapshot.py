@@ -0,0 +1,218 @@
+"""Startup snapshot of the answer key: everything the app needs per set, loaded in one read without NumPy.
+
+After an idle sleep the first student waits for the whole cold start, and parsing data/*.json into
+ProblemStore pulls in NumPy and the circuit solver before anything is drawn. The snapshot holds the
+derived per-set data in one small binary file, read with struct/array only:
+
+    header: magic b"KIRCHSNP", version u32, set count u32, 16-byte digest of the source JSON files
+    set numbers: count x int32
+    records: count x float64[RECORD_WIDTH] = params (5), answers (3), tolerances (3, NaN = none),
+             normalized expected equations (4 x 4), solution vector x = (I1, I2, I3, 1) (4)
+
+Snapshot has the same lookups as ProblemStore (problem, answer, tolerance, set_numbers) and builds
+the NumPy tables grading needs on first use. The digest is checked against data/*.json when the app
+starts and whenever one of the files changes; a stale or missing snapshot falls back to ProblemStore.
+
+    python snapshot.py            # write data/snapshot.bin (re-run after changing data/*.json)
+    python snapshot.py --check    # exit 1 if the snapshot is missing or stale
+"""
+import argparse
+import hashlib
+import math
+import os
+import struct
+import sys
+import threading
+from array import array
+from functools import cached_property
+
+from store import ANSWERS_PATH, PROBLEMS_PATH, TOLERANCES_PATH, get_store, new_version
+
+SNAPSHOT_PATH = os.environ.get("ANSWER_SNAPSHOT", "data/snapshot.bin")
+
+MAGIC = b"KIRCHSNP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII16s")
+RECORD_WIDTH = 5 + 3 + 3 + 16 + 4
+
+# Column offsets of each field in a record
+PARAMS, ANSWERS, TOLERANCES, EQUATIONS, SOLUTIONS = 0, 5, 8, 11, 27
+
+SOURCES = (ANSWERS_PATH, PROBLEMS_PATH, TOLERANCES_PATH)
+
+
+def source_digest(paths=SOURCES):
+    """ Digest of the JSON files' contents (a missing file counts as empty). """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            data = b""
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.digest()
+
+
+class Snapshot:
+    """ Per-set data read from a snapshot file, with ProblemStore's lookups. """
+
+    def __init__(self, set_numbers, records):
+        self.version = new_version()
+        self.set_numbers = list(set_numbers)
+        self._records = records
+        self._rows = {s: i * RECORD_WIDTH for i, s in enumerate(self.set_numbers)}
+
+    def refresh(self, force=False):
+        # get_startup_store() notices changed sources and switches to ProblemStore
+        return False
+
+    def _field(self, set_number, offset, width):
+        start = self._rows.get(int(set_number))
+        if start is None:
+            return None
+        return self._records[start + offset:start + offset + width].tolist()
+
+    def problem(self, set_number):
+        """ (V1, V2, R1, R2, R3) for a set, or None if the set does not exist. """
+        row = self._field(set_number, PARAMS, 5)
+        return None if row is None else tuple(row)
+
+    def answer(self, set_number):
+        """ [I1, I2, I3] in mA for a set, or None if the set has no answer key. """
+        return self._field(set_number, ANSWERS, 3)
+
+    def tolerance(self, set_number):
+        """ Per-current tolerances in mA for a set, or None if none were derived for it. """
+        row = self._field(set_number, TOLERANCES, 3)
+        return None if row is None or math.isnan(row[0]) else row
+
+    def solution(self, set_number):
+        """ The set's solution vector (I1, I2, I3, 1) in A, as equation_matcher.solution_table() has it, or None. """
+        return self._field(set_number, SOLUTIONS, 4)
+
+    # NumPy tables indexed by set number (NaN rows for unknown sets), built when grading first needs them
+
+    def _table(self, offset, width):
+        import numpy as np
+
+        records = np.frombuffer(self._records, dtype=np.float64).reshape(-1, RECORD_WIDTH)
+        table = np.full((max(self.set_numbers) + 1, width), np.nan)
+        table[self.set_numbers] = records[:, offset:offset + width]
+        return table
+
+    @cached_property
+    def problems(self):
+        return self._table(PARAMS, 5)
+
+    @cached_property
+    def answers(self):
+        return self._table(ANSWERS, 3)
+
+    @cached_property
+    def tolerances(self):
+        return self._table(TOLERANCES, 3)
+
+    @cached_property
+    def equations(self):
+        """ (max_set + 1, 4, 4) normalized expected equations. """
+        return self._table(EQUATIONS, 16).reshape(-1, 4, 4)
+
+    @cached_property
+    def solutions(self):
+        """ Solution vectors as equation_matcher.solution_table() returns them. """
+        return self._table(SOLUTIONS, 4)
+
+
+def load_snapshot(path=SNAPSHOT_PATH, digest=None):
+    """ The Snapshot at `path`, or None if it is missing, malformed or was built from other sources. """
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, count, built_from = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION or built_from != (digest or source_digest()):
+        return None
+    set_numbers = array("i")
+    records = array("d")
+    body = memoryview(data)[HEADER.size:]
+    if len(body) != count * (set_numbers.itemsize + records.itemsize * RECORD_WIDTH):
+        return None
+    set_numbers.frombytes(body[:count * set_numbers.itemsize])
+    records.frombytes(body[count * set_numbers.itemsize:])
+    if sys.byteorder == "big":
+        set_numbers.byteswap()
+        records.byteswap()
+    return Snapshot(set_numbers, records)
+
+
+def write_snapshot(store=None, path=SNAPSHOT_PATH):
+    """ Write the snapshot for `store` (default: data/*.json) atomically. Returns the set count. """
+    import numpy as np
+
+    from equation_matcher import expected_systems, solution_vectors
+    from grading import kirchhoff_coefficients_table, normalize_equations
+
+    store = store or get_store()
+    store.refresh(force=True)
+    sets = np.array(store.set_numbers, dtype="<i4")
+    expected = kirchhoff_coefficients_table(store.problems[sets])
+    records = np.concatenate([
+        store.problems[sets], store.answers[sets], store.tolerances[sets],
+        normalize_equations(expected).reshape(len(sets), 16), solution_vectors(expected_systems(store.problems[sets])),
+    ], axis=1).astype("<f8")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sets), source_digest()))
+        file.write(sets.tobytes())
+        file.write(records.tobytes())
+    os.replace(tmp, path)
+    return len(sets)
+
+
+_startup = {"stamp": None, "store": None}
+_startup_lock = threading.Lock()
+
+
+def _stamp(path):
+    stamps = []
+    for source in (*SOURCES, path):
+        try:
+            stat = os.stat(source)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def get_startup_store(path=SNAPSHOT_PATH):
+    """ The snapshot while it matches data/*.json, otherwise the process-wide ProblemStore. """
+    stamp = _stamp(path)
+    if _startup["stamp"] != stamp:
+        with _startup_lock:
+            if _startup["stamp"] != stamp:
+                _startup["store"] = load_snapshot(path)
+                _startup["stamp"] = stamp
+    return _startup["store"] or get_store()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or check the answer key startup snapshot.")
+    parser.add_argument("-o", "--output", default=SNAPSHOT_PATH)
+    parser.add_argument("--check", action="store_true", help="only check that the snapshot is up to date")
+    args = parser.parse_args()
+    if args.check:
+        if load_snapshot(args.output) is None:
+            parser.exit(1, f"{args.output} is missing or stale; run python snapshot.py\n")
+        print(f"{args.output} is up to date")
+        return
+    count = write_snapshot(path=args.output)
+    print(f"Wrote {count} sets to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
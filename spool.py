@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Where unsent submissions are kept. SQLite in WAL mode makes each append a short local write,
+# and the rows survive a crash or restart until the flusher has delivered them.
+SPOOL_PATH = os.environ.get("SUBMISSION_SPOOL", "spool/submissions.db")
+
+# NORMAL only syncs the WAL at checkpoints (survives app crashes); FULL syncs every append.
+SPOOL_SYNC = os.environ.get("SPOOL_SYNC", "NORMAL")
+
+
+class Spool:
+    """ Append-only submission spool with per-consumer delivery offsets. """
+
+    def __init__(self, path=SPOOL_PATH, synchronous=SPOOL_SYNC):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS offsets (consumer TEXT PRIMARY KEY, position INTEGER NOT NULL)"
+        )
+        # Copies of rows a consumer's endpoint rejected for good (e.g. HTTP 400), kept for inspection
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rejected ("
+            "id INTEGER NOT NULL, consumer TEXT NOT NULL, rejected REAL NOT NULL, reason TEXT NOT NULL, "
+            "payload TEXT NOT NULL, PRIMARY KEY (consumer, id))"
+        )
+
+    def append(self, payload):
+        """ Write one payload to the spool and return its id. """
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO spool (created, payload) VALUES (?, ?)", (time.time(), data)
+            )
+        return cursor.lastrowid
+
+    def read(self, after, limit):
+        """ Return up to `limit` (id, payload) rows with id greater than `after`, oldest first. """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM spool WHERE id > ? ORDER BY id LIMIT ?", (after, limit)
+            ).fetchall()
+        return [(row_id, json.loads(data)) for row_id, data in rows]
+
+    def offset(self, consumer="apps_script"):
+        """ Id of the last row the consumer has delivered (0 if none). """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT position FROM offsets WHERE consumer = ?", (consumer,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def commit(self, position, consumer="apps_script"):
+        """ Record that every row up to and including `position` has been delivered. """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO offsets (consumer, position) VALUES (?, ?) "
+                "ON CONFLICT(consumer) DO UPDATE SET position = excluded.position",
+                (consumer, position),
+            )
+
+    def reject(self, rows, reason, consumer="apps_script"):
+        """ Set aside (id, payload) rows the consumer can never deliver and commit past them. """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rejected (id, consumer, rejected, reason, payload) VALUES (?, ?, ?, ?, ?)",
+                    [(row_id, consumer, now, reason, json.dumps(payload, ensure_ascii=False)) for row_id, payload in rows],
+                )
+                self._conn.execute(
+                    "INSERT INTO offsets (consumer, position) VALUES (?, ?) "
+                    "ON CONFLICT(consumer) DO UPDATE SET position = excluded.position",
+                    (consumer, rows[-1][0]),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def rejected(self, consumer="apps_script"):
+        """ (id, reason, payload) of the rows set aside for the consumer, oldest first. """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, reason, payload FROM rejected WHERE consumer = ? ORDER BY id", (consumer,)
+            ).fetchall()
+        return [(row_id, reason, json.loads(data)) for row_id, reason, data in rows]
+
+    def pending(self, consumer="apps_script"):
+        """ Number of rows the consumer has not delivered yet. """
+        after = self.offset(consumer)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool WHERE id > ?", (after,)).fetchone()[0]
+
+    def compact(self, keep_seconds=7 * 24 * 3600):
+        """ Delete delivered rows older than `keep_seconds` (kept a while for local analysis). """
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(position) FROM offsets").fetchone()
+            if row[0] is None:
+                return 0
+            cursor = self._conn.execute(
+                "DELETE FROM spool WHERE id <= ? AND created < ?", (row[0], time.time() - keep_seconds)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
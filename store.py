@@ -0,0 +1,169 @@
+import itertools
+import json
+import math
+import os
+import threading
+import time
+
+# NumPy and the circuit solver are imported on first load, so importing this module (for its paths, or
+# from snapshot.py) costs nothing at app startup
+
+ANSWERS_PATH = "data/javab.json"
+PROBLEMS_PATH = "data/problems.json"
+TOLERANCES_PATH = "data/tolerances.json"  # optional, written by tolerances.py
+
+# How often (seconds) to stat the files for changes. Reruns in between reuse the parsed data.
+CHECK_INTERVAL = 2.0
+
+
+def _parse_sets(data, width, name):
+    """ Validate a {"<set number>": [numbers...]} mapping and return {int: tuple}. """
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f"{name}: expected a non-empty object keyed by set number")
+    sets = {}
+    for key, values in data.items():
+        if not str(key).isdigit() or int(key) < 1:
+            raise ValueError(f"{name}: set number {key!r} is not a positive integer")
+        if not isinstance(values, list) or len(values) != width:
+            raise ValueError(f"{name}: set {key} must be a list of {width} numbers")
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"{name}: set {key} contains a non-numeric value")
+        sets[int(key)] = tuple(values)
+    return sets
+
+
+# Store versions are unique in the process, so a cache keyed on one also tells different stores apart
+_versions = itertools.count(1)
+
+
+def new_version():
+    return next(_versions)
+
+
+def _to_table(sets, width):
+    """ Pack {set: values} into a float64 array indexed by set number (missing rows are NaN). """
+    import numpy as np
+
+    table = np.full((max(sets, default=0) + 1, width), np.nan)
+    for set_number, values in sets.items():
+        table[set_number] = values
+    return table
+
+
+class ProblemStore:
+    """ Answer key and circuit parameters, parsed once and reloaded when the JSON files change.
+
+    Sets in problems.json that are missing from the answer key are solved with circuit_solver.
+    Per-set current tolerances are read from tolerances.json when it exists.
+    """
+
+    def __init__(self, answers_path=ANSWERS_PATH, problems_path=PROBLEMS_PATH, check_interval=CHECK_INTERVAL,
+                 tolerances_path=TOLERANCES_PATH):
+        self.answers_path = answers_path
+        self.problems_path = problems_path
+        self.tolerances_path = tolerances_path
+        self.check_interval = check_interval
+        self.version = 0  # a new_version() on every successful (re)load so callers can key caches on it
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._checked = 0.0
+        self._load()
+
+    def _file_stamp(self):
+        stats = [os.stat(path) for path in (self.answers_path, self.problems_path)]
+        try:
+            stats.append(os.stat(self.tolerances_path))
+        except OSError:
+            stats.append(None)
+        return tuple(s and (s.st_mtime_ns, s.st_size) for s in stats)
+
+    def _load(self):
+        stamp = self._file_stamp()
+        with open(self.answers_path, "r") as file:
+            answers = _parse_sets(json.load(file), 3, self.answers_path)
+        with open(self.problems_path, "r") as file:
+            problems = _parse_sets(json.load(file), 5, self.problems_path)
+        missing = sorted(set(answers) - set(problems))
+        if missing:
+            raise ValueError(f"{self.answers_path}: sets {missing} have no circuit in {self.problems_path}")
+        # Sets without a hand-entered answer get one from the circuit solver
+        from circuit_solver import derive_answer_key
+
+        unsolved = {s: problems[s] for s in problems if s not in answers}
+        for s, answer in derive_answer_key(unsolved).items():
+            answers[int(s)] = tuple(answer)
+
+        tolerances = {}
+        if stamp[-1] is not None:
+            with open(self.tolerances_path, "r") as file:
+                tolerances = _parse_sets(json.load(file), 3, self.tolerances_path)
+
+        self._install(answers, problems, tolerances)
+        self._stamp = stamp
+
+    def _install(self, answers, problems, tolerances):
+        """ Swap in parsed {set: values} mappings at once so readers never see a half-updated store. """
+        import numpy as np
+
+        self.answers = _to_table(answers, 3)
+        self.problems = _to_table(problems, 5)
+        # NaN rows (sets without a derived band) fall back to grading.TOLERANCE
+        self.tolerances = np.full_like(self.answers, np.nan)
+        for set_number, band in tolerances.items():
+            if set_number < len(self.tolerances):
+                self.tolerances[set_number] = band
+        self.set_numbers = sorted(problems)
+        self.version = new_version()
+
+    def refresh(self, force=False):
+        """ Reload the files if they changed on disk. A bad edit keeps the previous data. """
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            try:
+                if not force and self._file_stamp() == self._stamp:
+                    return False
+                self._load()
+                return True
+            except (OSError, ValueError) as e:
+                print(f"Keeping previous answer key, reload failed: {e}")
+                return False
+
+    def _row(self, name, set_number):
+        self.refresh()
+        table = getattr(self, name)
+        if not 0 < set_number < len(table) or math.isnan(table[set_number, 0]):
+            return None
+        return table[set_number]
+
+    def problem(self, set_number):
+        """ (V1, V2, R1, R2, R3) for a set, or None if the set does not exist. """
+        row = self._row("problems", int(set_number))
+        return None if row is None else tuple(row.tolist())
+
+    def answer(self, set_number):
+        """ [I1, I2, I3] in mA for a set, or None if the set has no answer key. """
+        row = self._row("answers", int(set_number))
+        return None if row is None else row.tolist()
+
+    def tolerance(self, set_number):
+        """ Per-current tolerances in mA for a set, or None if none were derived for it. """
+        row = self._row("tolerances", int(set_number))
+        return None if row is None else row.tolist()
+
+
+# Shared by every session in the process (modules survive Streamlit reruns)
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """ Return the process-wide ProblemStore, loading it on first use. """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProblemStore()
+    return _store
@@ -0,0 +1,242 @@
+"""Per-student problem sets: parameters derived from a hash of the student ID, solved in bulk.
+
+Every student gets their own (V1, V2, R1, R2, R3) in the same ranges as data/problems.json,
+derived deterministically from the student ID and a course seed, so the same ID always gets the
+same circuit and no answer key needs to be kept per student. The whole roster is solved in one
+batched np.linalg.solve over the 3x3 systems of compute_kirchhoff_coefficients and written to a
+binary table that is memory-mapped at grading time:
+
+    header | bucket offsets (buckets + 1, uint64) | records sorted by bucket
+
+A record holds the 64-bit student hash, the five parameters and the three answers in mA. A lookup
+hashes the ID, reads the two offsets of its bucket and compares a record or two: O(1), no parsing,
+and only the touched pages are read from disk.
+
+    python student_sets.py build roster.csv --seed 2026     # first column of the CSV is the ID
+    python student_sets.py lookup A01234567
+    python student_sets.py bench --count 50000
+"""
+import argparse
+import csv
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from grading import kirchhoff_coefficients_table
+
+TABLE_PATH = os.environ.get("STUDENT_SETS", "data/students.bin")
+
+MAGIC = b"KIRCHSTU"
+FORMAT_VERSION = 1
+
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("reserved", "<u4"), ("seed", "<i8"),
+                   ("count", "<u8"), ("buckets", "<u8")])
+RECORD = np.dtype([("hash", "<u8"), ("params", "<f4", (5,)), ("answers", "<f8", (3,))])
+
+# Parameter ranges (inclusive, with step) matching the hand-made sets: V1, V2 in volts, R1-R3 in ohms
+RANGES = ((12, 20, 1), (3, 8, 1), (100, 200, 10), (140, 250, 10), (150, 300, 10))
+
+# Answers are rounded like data/javab.json
+DECIMALS = 1
+
+
+def normalize_id(student_id):
+    return str(student_id).strip().lower()
+
+
+def student_hash(student_id, seed):
+    """ 64-bit hash of a student ID under a course seed. """
+    digest = hashlib.blake2b(normalize_id(student_id).encode(), digest_size=8, key=str(seed).encode()).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _mix(x):
+    """ SplitMix64 finalizer on a uint64 array (wrapping arithmetic). """
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def derive_parameters(hashes, attempt=0):
+    """ (N, 5) parameters from (N,) uint64 student hashes; `attempt` gives an independent redraw. """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    params = np.empty((len(hashes), len(RANGES)))
+    with np.errstate(over="ignore"):
+        for column, (low, high, step) in enumerate(RANGES):
+            stream = np.uint64((attempt * len(RANGES) + column + 1) * 0x9E3779B97F4A7C15 % 2**64)
+            choices = np.uint64((high - low) // step + 1)
+            params[:, column] = low + step * (_mix(hashes + stream) % choices).astype(np.float64)
+    return params
+
+
+def solve_sets(params):
+    """ Currents in mA for (N, 5) parameters, one batched solve of the junction, left and right loop rules. """
+    equations = kirchhoff_coefficients_table(params)[:, :3]  # (N, 3, 4): A | D with A I + D = 0
+    currents = np.linalg.solve(equations[..., :3], -equations[..., 3:])[..., 0]
+    return np.round(currents * 1000, DECIMALS)
+
+
+def generate(student_ids, seed):
+    """ (hashes, params, answers) for a roster; duplicate IDs are kept once.
+
+    Circuits where a current comes out zero or negative are redrawn, as every hand-made set has all
+    three currents flowing in the drawn directions.
+    """
+    hashes = np.unique(np.fromiter((student_hash(s, seed) for s in student_ids), dtype=np.uint64))
+    params = derive_parameters(hashes)
+    answers = solve_sets(params)
+    for attempt in range(1, 64):
+        redo = np.flatnonzero((answers <= 0).any(axis=1))
+        if not len(redo):
+            break
+        params[redo] = derive_parameters(hashes[redo], attempt)
+        answers[redo] = solve_sets(params[redo])
+    return hashes, params, answers
+
+
+def write_table(path, hashes, params, answers, seed):
+    """ Write the memory-mappable table (atomically replacing `path`). """
+    count = len(hashes)
+    buckets = 1 << max(count - 1, 1).bit_length()  # power of two >= count: about one record per bucket
+    bucket = hashes & np.uint64(buckets - 1)
+    order = np.argsort(bucket, kind="stable")
+    offsets = np.zeros(buckets + 1, dtype="<u8")
+    np.cumsum(np.bincount(bucket.astype(np.int64), minlength=buckets), out=offsets[1:])
+
+    records = np.empty(count, dtype=RECORD)
+    records["hash"] = hashes[order]
+    records["params"] = params[order]
+    records["answers"] = answers[order]
+    header = np.zeros(1, dtype=HEADER)
+    header[0] = (MAGIC, FORMAT_VERSION, 0, seed, count, buckets)
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as file:
+        file.write(header.tobytes())
+        file.write(offsets.tobytes())
+        file.write(records.tobytes())
+    os.replace(tmp, path)
+
+
+def build(student_ids, seed, path=TABLE_PATH):
+    hashes, params, answers = generate(student_ids, seed)
+    write_table(path, hashes, params, answers, seed)
+    return len(hashes)
+
+
+class StudentTable:
+    """ Read-only, memory-mapped view of a table written by build(). """
+
+    def __init__(self, path=TABLE_PATH):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) != 1 or header[0]["magic"] != MAGIC or header[0]["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path}: not a student set table (rebuild it with student_sets.py build)")
+        self.seed = int(header[0]["seed"])
+        self.count = int(header[0]["count"])
+        self.buckets = int(header[0]["buckets"])
+        self._mask = self.buckets - 1
+        self.offsets = np.memmap(path, dtype="<u8", mode="r", offset=HEADER.itemsize, shape=(self.buckets + 1,))
+        self.records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER.itemsize + 8 * (self.buckets + 1),
+                                 shape=(self.count,))
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, student_id):
+        """ The student's record (hash, params, answers), or None if they are not on the roster. """
+        h = student_hash(student_id, self.seed)
+        b = h & self._mask
+        for i in range(int(self.offsets[b]), int(self.offsets[b + 1])):
+            if int(self.records[i]["hash"]) == h:
+                return self.records[i]
+        return None
+
+    def problem(self, student_id):
+        """ (V1, V2, R1, R2, R3) for a student, or None. """
+        record = self.lookup(student_id)
+        return None if record is None else tuple(float(v) for v in record["params"])
+
+    def answer(self, student_id):
+        """ [I1, I2, I3] in mA for a student, or None (same shape as ProblemStore.answer). """
+        record = self.lookup(student_id)
+        return None if record is None else [float(v) for v in record["answers"]]
+
+
+_table = {"stamp": None, "table": None}
+_table_lock = threading.Lock()
+
+
+def get_student_table(path=TABLE_PATH):
+    """ The roster table, reopened when the file is rebuilt; None when no table has been built. """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    if _table["stamp"] != stamp:
+        with _table_lock:
+            if _table["stamp"] != stamp:
+                _table["table"] = StudentTable(path)
+                _table["stamp"] = stamp
+    return _table["table"]
+
+
+def read_roster(path):
+    """ Student IDs from the first column of a CSV (a header row starting with a non-ID is skipped). """
+    with open(path, "r", newline="") as file:
+        rows = [row[0] for row in csv.reader(file) if row and row[0].strip()]
+    if rows and rows[0].strip().lower() in ("id", "student_id", "student id", "email", "username"):
+        rows = rows[1:]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and look up per-student problem sets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build the table from a roster CSV")
+    build_parser.add_argument("roster")
+    build_parser.add_argument("--seed", type=int, required=True, help="course seed; change it to reshuffle every set")
+    build_parser.add_argument("-o", "--output", default=TABLE_PATH)
+    lookup_parser = commands.add_parser("lookup", help="show one student's circuit and answers")
+    lookup_parser.add_argument("student_id")
+    lookup_parser.add_argument("--table", default=TABLE_PATH)
+    bench_parser = commands.add_parser("bench", help="time generation and lookups for synthetic IDs")
+    bench_parser.add_argument("--count", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build(read_roster(args.roster), args.seed, args.output)
+        print(f"Wrote {count} students to {args.output}")
+    elif args.command == "lookup":
+        table = StudentTable(args.table)
+        problem = table.problem(args.student_id)
+        if problem is None:
+            parser.exit(1, f"{args.student_id} is not in {args.table}\n")
+        print("V1, V2, R1, R2, R3 =", problem)
+        print("I1, I2, I3 (mA)    =", table.answer(args.student_id))
+    else:
+        import tempfile
+        ids = [f"S{i:08d}" for i in range(args.count)]
+        path = os.path.join(tempfile.mkdtemp(prefix="kirchhoff-students-"), "students.bin")
+        start = time.perf_counter()
+        build(ids, seed=1, path=path)
+        built = time.perf_counter() - start
+        table = StudentTable(path)
+        start = time.perf_counter()
+        for student_id in ids[:10000]:
+            table.lookup(student_id)
+        lookup = (time.perf_counter() - start) / min(len(ids), 10000)
+        print(f"{args.count} students: generated, solved and written in {built:.3f} s "
+              f"({os.path.getsize(path) / 1024:.0f} KiB); lookup {lookup * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
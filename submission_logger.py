@@ -0,0 +1,262 @@
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from spool import SPOOL_PATH, Spool
+
+# Google Apps Script Web App URL (can be pointed at a local stand-in server for testing)
+APPS_SCRIPT_URL = os.environ.get(
+    "APPS_SCRIPT_URL",
+    "https://script.google.com/macros/s/AKfycbwYkzqimnnqLgoWS6BSmmpRbwPPMsPV-K2OZcBMcSRVlmFl-akUPRNf7nXBhKF1hg5J/exec",
+)
+
+# Tuning knobs (environment overrides so deployments can adjust without code changes).
+# A batch size of 1 keeps the one-object-per-POST format the current Apps Script expects;
+# larger batches are sent as a JSON array and need a doPost that loops over the list.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "1"))
+LOG_BATCH_WAIT = float(os.environ.get("LOG_BATCH_WAIT", "0.25"))  # seconds to wait for a batch to fill
+LOG_TIMEOUT = float(os.environ.get("LOG_TIMEOUT", "10"))  # seconds per POST
+LOG_RETRIES = int(os.environ.get("LOG_RETRIES", "4"))
+LOG_WORKERS = int(os.environ.get("LOG_WORKERS", "2"))
+
+
+# Outcomes of sending a batch
+SENT, REJECTED, FAILED = "sent", "rejected", "failed"
+
+
+def is_permanent(error):
+    """ True for a rejection that retrying cannot fix: a 4xx other than 408 (timeout) or 429 (rate limited). """
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+
+
+def make_session(pool_size=LOG_WORKERS):
+    """ Create a keep-alive HTTP session with a connection pool sized for the workers. """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def post_batch(session, url, payloads, timeout=LOG_TIMEOUT):
+    """ POST one batch of payloads. A single payload is sent as a plain object. """
+    body = payloads[0] if len(payloads) == 1 else payloads
+    response = session.post(url, json=body, timeout=timeout)
+    response.raise_for_status()
+    return response
+
+
+class SubmissionLogger:
+    """ Background logger: payloads go on a bounded queue and worker threads POST them in batches.
+
+    With a `spool`, payloads are appended to it instead and a single flusher thread drains it
+    in order, only advancing the delivery offset once a batch has been accepted. Anything not
+    yet delivered (endpoint down, app restarted) is replayed from the spool. Rows the endpoint
+    rejects with a 4xx (other than 408/429) are set aside with Spool.reject instead of retried.
+    """
+
+    def __init__(self, url=APPS_SCRIPT_URL, queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 batch_wait=LOG_BATCH_WAIT, timeout=LOG_TIMEOUT, retries=LOG_RETRIES,
+                 workers=LOG_WORKERS, backoff=0.5, spool=None, max_backoff=60):
+        self.url = url
+        self.spool = spool
+        self.max_backoff = max_backoff
+        self.batch_size = max(batch_size, 1)
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.session = make_session(workers)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads = []
+        if spool is not None:
+            targets = [self._run_spool]  # one flusher keeps delivery in spool order
+        else:
+            targets = [self._run] * max(workers, 1)
+        for i, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f"submission-logger-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, payload):
+        """ Queue a payload without blocking. Returns False if the queue is full and it was dropped. """
+        if self.spool is not None:
+            try:
+                self.spool.append(payload)
+            except Exception as e:  # never let logging break grading
+                with self._lock:
+                    self.dropped += 1
+                metrics.inc("kirchhoff_log_dropped_total")
+                print(f"Error writing submission to spool: {e}")
+                return False
+            self._wake.set()
+            return True
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            metrics.inc("kirchhoff_log_dropped_total")
+            print("Logging queue full, dropping submission.")
+            return False
+
+    def pending(self):
+        """ Number of payloads waiting to be sent. """
+        if self.spool is not None:
+            return self.spool.pending()
+        return self.queue.qsize()
+
+    def _next_batch(self):
+        """ Block for the first payload, then collect more until the batch is full or the wait runs out. """
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch):
+        """ Send a batch, retrying network errors and 5xx with exponential backoff. Returns (outcome, error). """
+        for attempt in range(self.retries + 1):
+            try:
+                post_batch(self.session, self.url, batch, timeout=self.timeout)
+                with self._lock:
+                    self.sent += len(batch)
+                metrics.inc("kirchhoff_log_sent_total", len(batch))
+                return SENT, None
+            except requests.RequestException as e:
+                if is_permanent(e):
+                    print(f"Submission rejected by the logging endpoint: {e}")
+                    return REJECTED, e
+                if attempt == self.retries or self._stop.is_set():
+                    print(f"Error logging submission: {e}")
+                    return FAILED, e
+                self._stop.wait(self.backoff * (2 ** attempt))
+            except Exception as e:  # a bug or bad payload must not kill the worker thread
+                print(f"Unexpected error logging submission: {e!r}")
+                return FAILED, e
+        return FAILED, None
+
+    def _count_failed(self, count):
+        with self._lock:
+            self.failed += count
+        metrics.inc("kirchhoff_log_failures_total", count)
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            if self._send(batch)[0] != SENT:
+                self._count_failed(len(batch))
+            for _ in batch:
+                self.queue.task_done()
+
+    def _run_spool(self):
+        delay = self.backoff
+        last_compact = time.monotonic()
+        counted = 0   # rows up to this id have already been counted as failed
+        isolate = 0   # rows up to this id are sent one at a time to find the ones the endpoint rejects
+        while not self._stop.is_set():
+            try:
+                position = self.spool.offset()
+                limit = 1 if position < isolate else self.batch_size
+                rows = self.spool.read(position, limit)
+                if not rows:
+                    self._wake.wait(1.0)
+                    self._wake.clear()
+                    continue
+                if len(rows) < limit and self.batch_wait > 0:
+                    # Give a burst of clicks a moment to fill the batch
+                    self._stop.wait(self.batch_wait)
+                    rows = self.spool.read(position, limit)
+                outcome, error = self._send([payload for _, payload in rows])
+                if outcome == SENT:
+                    self.spool.commit(rows[-1][0])
+                    delay = self.backoff
+                elif outcome == REJECTED and len(rows) > 1:
+                    isolate = rows[-1][0]
+                elif outcome == REJECTED:
+                    # Retrying can't help, so set the row aside rather than block everything behind it
+                    self.spool.reject(rows, str(error))
+                    self._count_failed(sum(1 for row_id, _ in rows if row_id > counted))
+                    counted = max(counted, rows[-1][0])
+                else:
+                    # Endpoint still failing: keep the rows and try again later, counting them as failed once
+                    self._count_failed(sum(1 for row_id, _ in rows if row_id > counted))
+                    counted = max(counted, rows[-1][0])
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                if time.monotonic() - last_compact > 3600:
+                    last_compact = time.monotonic()  # a failing compact is retried in an hour, not every batch
+                    self.spool.compact()
+            except Exception as e:
+                # e.g. sqlite3.Error from the spool: keep the only flusher alive and try again later
+                print(f"Error flushing the submission spool: {e!r}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def flush(self, timeout=None):
+        """ Wait until everything queued so far has been sent (or given up on). """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending() if self.spool is not None else self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5):
+        """ Drain the queue and stop the workers. """
+        self.flush(timeout)
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.session.close()
+        if self.spool is not None:
+            self.spool.close()
+
+
+# One logger per process: Streamlit reruns re-execute app.py but keep imported modules,
+# so every session shares the same queue, workers and connection pool.
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_logger():
+    """ Return the process-wide SubmissionLogger, starting it on first use. """
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                # SUBMISSION_SPOOL="" turns the spool off and keeps payloads in memory only
+                _logger = SubmissionLogger(spool=Spool(SPOOL_PATH) if SPOOL_PATH else None)
+                metrics.set_gauge("kirchhoff_log_queue_depth", _logger.pending)
+    return _logger
+
+
+def log_payload(payload):
+    """ Hand a payload to the background logger and return immediately. """
+    return get_logger().submit(payload)
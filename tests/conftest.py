@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # The store and snapshot read data/ relative to the working directory, like the app
+    monkeypatch.chdir(ROOT)
+
+
+class StandIn:
+    """ Local stand-in for the Apps Script endpoint: records what it accepts and answers with `statuses`. """
+
+    def __init__(self):
+        self.received = []   # payloads of accepted POSTs, in order
+        self.requests = 0
+        self.statuses = []   # status codes for the next POSTs (200 once these run out)
+        self.reject = None   # payload -> True to answer 400 for any POST containing it
+        self.lock = threading.Lock()
+
+    def handle(self, body):
+        payloads = body if isinstance(body, list) else [body]
+        with self.lock:
+            self.requests += 1
+            if self.reject is not None and any(self.reject(p) for p in payloads):
+                return 400
+            status = self.statuses.pop(0) if self.statuses else 200
+            if status == 200:
+                self.received.extend(payloads)
+            return status
+
+
+@pytest.fixture
+def stand_in():
+    state = StandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(state.handle(body))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_port}/"
+    yield state
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,78 @@
+import types
+
+import pytest
+
+import dedupe
+from dedupe import SubmissionGate, TokenBucket, TTLCache, submission_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ A fake monotonic clock for dedupe; advance it with clock.now += seconds. """
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(dedupe, "time", fake)
+    return fake
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(10, ttl=5)
+    cache.put("a", 1)
+    clock.now += 4.9
+    assert cache.get("a") == 1
+    clock.now += 0.2
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TTLCache(2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=0.5, burst=2)
+    assert bucket.take() and bucket.take() and not bucket.take()
+    assert bucket.wait_time() == pytest.approx(2.0)
+    clock.now += 1.0
+    assert not bucket.take()
+    clock.now += 1.0
+    assert bucket.take()
+    clock.now += 100  # refill is capped at burst
+    assert bucket.take() and bucket.take() and not bucket.take()
+
+
+def test_submission_key_rounds_inputs_and_includes_the_version():
+    key = submission_key("s", "currents", 1, [1.0, -0.0, 2.00001])
+    assert key == submission_key("s", "currents", 1, [1.00000001, 0.0, 2.000012])
+    assert key != submission_key("s", "currents", 1, [1.0, 0.0, 2.001])
+    assert key != submission_key("s", "currents", 1, [1.0, 0.0, 2.00001], version=2)
+    assert submission_key("s", "equations", 1, [[1, 2], [3]]) == submission_key("s", "equations", 1, [1, 2, 3])
+
+
+def test_gate_reuses_results_and_limits_new_submissions(clock):
+    gate = SubmissionGate(ttl=600, max_items=100, rate=0.1, burst=2)
+    calls = []
+
+    def grade():
+        calls.append(1)
+        return len(calls)
+
+    assert gate.submit("s", "currents", 1, [1, 2, 3], grade) == (1, True)
+    assert gate.submit("s", "currents", 1, [1, 2, 3], grade) == (1, False)
+    assert gate.submit("s", "currents", 1, [1, 2, 4], grade) == (2, True)
+    assert gate.submit("s", "currents", 1, [1, 2, 5], grade) is None
+    assert gate.retry_after("s") == pytest.approx(10.0)
+    assert gate.submit("other", "currents", 1, [1, 2, 5], grade) == (3, True)
+    clock.now += 10
+    assert gate.submit("s", "currents", 1, [1, 2, 5], grade) == (4, True)
+
+
+def test_gate_regrades_after_the_answer_key_changes(clock):
+    gate = SubmissionGate(ttl=600, max_items=100, rate=1, burst=5)
+    assert gate.submit("s", "currents", 1, [1, 2, 3], lambda: "old", version=1) == ("old", True)
+    assert gate.submit("s", "currents", 1, [1, 2, 3], lambda: "new", version=1) == ("old", False)
+    assert gate.submit("s", "currents", 1, [1, 2, 3], lambda: "new", version=2) == ("new", True)
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+
+from equation_matcher import expected_systems
+from grade_export import grade_export
+from store import get_store
+
+
+def _mixed_rows():
+    """ Equation submissions first, then currents, as both logging functions append to the same sheet. """
+    store = get_store()
+    equations = expected_systems(store.problem(1)).tolist()
+    wrong = [[1, 1, 1, 0], [2, 0, 0, 1], [0, 3, 0, 1]]
+    return [
+        {"set_number": 1, "student_equations": json.dumps(equations)},
+        {"set_number": 1, "I1": store.answer(1)[0], "I2": store.answer(1)[1], "I3": store.answer(1)[2]},
+        {"set_number": 1, "student_equations": json.dumps(wrong)},
+        {"set_number": 1, "I1": 0, "I2": 0, "I3": 0},
+    ]
+
+
+def test_mixed_export_is_graded_per_row():
+    out = io.StringIO()
+    assert grade_export(_mixed_rows(), out, "jsonl") == 4
+    right_eqs, right_currents, wrong_eqs, wrong_currents = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [right_eqs[f"eq{i}_correct"] for i in (1, 2, 3)] + [right_eqs["independent"]] == [True] * 4
+    assert not any(wrong_eqs[f"eq{i}_correct"] for i in (1, 2, 3))
+    assert right_currents["graded_result"] == "Correct" and "eq1_correct" not in right_currents
+    assert wrong_currents["graded_result"] == "Incorrect" and "graded_result" not in right_eqs
+
+
+def test_mixed_csv_export_keeps_both_kinds_of_columns():
+    rows = _mixed_rows()
+    columns = ["set_number", "I1", "I2", "I3", "student_equations"]
+    source = io.StringIO()
+    writer = csv.DictWriter(source, fieldnames=columns)
+    writer.writeheader()
+    writer.writerows(rows)
+    source.seek(0)
+
+    out = io.StringIO()
+    grade_export(csv.DictReader(source), out, "csv", chunk_size=3)
+    out.seek(0)
+    graded = list(csv.DictReader(out))
+    assert [row["graded_result"] for row in graded] == ["", "Correct", "", "Incorrect"]
+    assert [row["eq1_correct"] for row in graded][0::2] == ["True", "False"]
+    assert graded[1]["eq1_correct"] == graded[3]["eq1_correct"] == ""
@@ -0,0 +1,57 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from grading_api import MicroBatcher, RequestError, grade_current_items, parse_currents, parse_equations
+
+
+@pytest.mark.parametrize("body", [
+    '{"set_number": NaN, "I1": 1, "I2": 2, "I3": 3}',
+    '{"set_number": Infinity, "I1": 1, "I2": 2, "I3": 3}',
+    '{"set_number": 1000000000000000000000000000000, "I1": 1, "I2": 2, "I3": 3}',
+    '{"set_number": 2.5, "I1": 1, "I2": 2, "I3": 3}',
+    '{"set_number": true, "I1": 1, "I2": 2, "I3": 3}',
+    '{"set_number": 1, "I1": NaN, "I2": 2, "I3": 3}',
+    '{"set_number": 1, "I1": "1", "I2": 2, "I3": 3}',
+    '{"set_number": 1, "I1": 1, "I2": 2, "I3": 3, "course": 7}',
+    '[1, 2, 3]',
+])
+def test_parse_currents_rejects_bad_requests(body):
+    with pytest.raises(RequestError) as e:
+        parse_currents(json.loads(body))
+    assert e.value.status == 400
+
+
+def test_parse_currents_and_equations():
+    assert parse_currents({"set_number": 3.0, "I1": 1, "I2": 2.5, "I3": -3}) == (3, [1.0, 2.5, -3.0], None)
+    assert parse_currents({"set_number": 3, "I1": 1, "I2": 2, "I3": 3, "course": "phys101", "assignment": "hw2"})[2] \
+        == ("phys101", "hw2")
+    eqs = [[1, -1, -1, 0], [1, 0, 1, 5], [0, 1, -1, 2]]
+    assert parse_equations({"set_number": 1, "equations": eqs}) == (1, [[float(v) for v in eq] for eq in eqs], None)
+    with pytest.raises(RequestError):
+        parse_equations({"set_number": 1, "equations": eqs[:2]})
+
+
+def test_grade_current_items_handles_unknown_sets():
+    results = grade_current_items([(1, [55.9, 18.3, 37.7], None), (2 ** 31 - 1, [1, 2, 3], None), (0, [1, 2, 3], None)])
+    assert [r["set_number"] for r in results] == [1, 2 ** 31 - 1, 0]
+    assert results[0]["result"] == "Correct"
+    assert results[1]["result"] == results[2]["result"] != "Correct"
+
+
+def test_micro_batcher_falls_back_to_single_items():
+    def grade(items):
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [item.upper() for item in items]
+
+    async def run(executor):
+        batcher = MicroBatcher(grade, executor, max_delay=0.01)
+        return await asyncio.gather(*(batcher.submit(item) for item in ["a", "bad", "c"]), return_exceptions=True)
+
+    with ThreadPoolExecutor(1) as executor:
+        a, bad, c = asyncio.run(run(executor))
+    assert (a, c) == ("A", "C")
+    assert isinstance(bad, ValueError)
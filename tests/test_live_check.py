@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+import pytest
+
+from equation_matcher import expected_systems, independent_rows, solution_vectors, span_matches
+from live_check import LiveMatcher
+from store import get_store
+
+
+@pytest.fixture
+def problem():
+    store = get_store()
+    return store.problem(store.set_numbers[0])
+
+
+def _rows(problem, rng, count):
+    """ Valid equations (random combinations of the expected ones, at any scale) mixed with random rows. """
+    expected = expected_systems(problem)
+    valid = rng.normal(size=(count, 3)) @ expected * 10.0 ** rng.integers(-3, 4, size=(count, 1))
+    noise = rng.normal(size=(count, 4)) * 10.0 ** rng.integers(-3, 4, size=(count, 1))
+    return np.where(rng.random((count, 1)) < 0.5, valid, noise)
+
+
+def test_match_agrees_with_span_matches(problem):
+    rng = np.random.default_rng(0)
+    rows = _rows(problem, rng, 500)
+    matcher = LiveMatcher.for_problem(problem)
+    expected = span_matches(rows[:, None, :], solution_vectors(expected_systems(problem)))[:, 0]
+    assert expected.any() and not expected.all()
+    assert [matcher.match(row) for row in rows.tolist()] == expected.tolist()
+
+
+def test_independent_agrees_with_independent_rows(problem):
+    rng = np.random.default_rng(1)
+    matcher = LiveMatcher.for_problem(problem)
+    systems = _rows(problem, rng, 300).reshape(100, 3, 4)
+    systems[::4, 2] = systems[::4, 0] * 3 - systems[::4, 1] * 0.5  # dependent
+    systems[1::4, 1] = systems[1::4, 0] * -2e-3
+    expected = independent_rows(systems)
+    matches = span_matches(systems, matcher.x)
+    assert expected.any() and not expected.all()
+    for system, indep, match in zip(systems.tolist(), expected.tolist(), matches.tolist()):
+        for k, row in enumerate(system):
+            matcher.update(k, row)
+        assert matcher.independent() == indep
+        assert matcher.matches == match
+
+
+def test_non_finite_and_empty_rows_never_match(problem):
+    matcher = LiveMatcher.for_problem(problem)
+    x = matcher.x
+    assert matcher.match([1.0, -1.0, -1.0, 0.0]) == bool(span_matches([[[1.0, -1.0, -1.0, 0.0]]], x)[0, 0])
+    for row in ([math.inf, 0, 0, 0], [1, -math.inf, 0, 0], [math.nan, 1, 1, 0], [0, 0, 0, 5], [0, 0, 0, 0]):
+        assert not matcher.match(row)
+        assert not span_matches([[row]], x)[0, 0]
+    matcher.update(0, [math.inf, 0, 0, 0])
+    matcher.update(1, [0, 1, 0, 0])
+    matcher.update(2, [0, 0, 1, 0])
+    assert not matcher.independent()
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import snapshot
+from snapshot import HEADER, Snapshot, get_startup_store, load_snapshot, source_digest, write_snapshot
+from store import ProblemStore, get_store
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "_startup", {"stamp": None, "store": None})
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path=path)
+    return path
+
+
+def _restamp(path, digest):
+    """ Rewrite the snapshot's source digest, as if it had been built from other data/*.json. """
+    with open(path, "r+b") as file:
+        header = list(HEADER.unpack(file.read(HEADER.size)))
+        file.seek(0)
+        file.write(HEADER.pack(*header[:3], digest))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_snapshot_matches_the_store(snapshot_path):
+    snap = load_snapshot(snapshot_path)
+    store = get_store()
+    assert isinstance(snap, Snapshot)
+    assert snap.set_numbers == store.set_numbers
+    for s in store.set_numbers:
+        assert snap.problem(s) == store.problem(s)
+        assert snap.answer(s) == store.answer(s)
+        assert snap.tolerance(s) == store.tolerance(s)
+    assert snap.problem(0) is None and snap.answer(max(store.set_numbers) + 1) is None
+
+
+def test_snapshot_with_another_digest_is_rejected(snapshot_path):
+    assert load_snapshot(snapshot_path, digest=source_digest()) is not None
+    assert load_snapshot(snapshot_path, digest=b"\0" * 16) is None
+    with open(snapshot_path, "r+b") as file:
+        file.truncate(HEADER.size + 3)
+    assert load_snapshot(snapshot_path) is None
+    assert load_snapshot(snapshot_path + ".missing") is None
+
+
+def test_startup_store_falls_back_to_problem_store_when_stale(snapshot_path):
+    assert isinstance(get_startup_store(snapshot_path), Snapshot)
+    _restamp(snapshot_path, b"\0" * 16)
+    assert isinstance(get_startup_store(snapshot_path), ProblemStore)
+    write_snapshot(path=snapshot_path)
+    assert isinstance(get_startup_store(snapshot_path), Snapshot)
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+
+from spool import Spool
+from submission_logger import SubmissionLogger
+
+
+def make_logger(url, spool, **kwargs):
+    return SubmissionLogger(url=url, spool=spool, batch_wait=0, backoff=0.01, max_backoff=0.05, **kwargs)
+
+
+def test_offsets_are_per_consumer(tmp_path):
+    spool = Spool(str(tmp_path / "s.db"))
+    ids = [spool.append({"n": n}) for n in range(5)]
+    assert spool.read(0, 2) == [(ids[0], {"n": 0}), (ids[1], {"n": 1})]
+    spool.commit(ids[2])
+    assert spool.offset() == ids[2] and spool.pending() == 2
+    assert spool.offset("analytics") == 0 and spool.pending("analytics") == 5
+    assert [row_id for row_id, _ in spool.read(spool.offset(), 10)] == ids[3:]
+    spool.close()
+
+
+def test_undelivered_rows_are_replayed_after_a_restart(tmp_path, stand_in):
+    path = str(tmp_path / "s.db")
+    stand_in.statuses = [503] * 1000  # endpoint down
+    logger = make_logger(stand_in.url, Spool(path), retries=0)
+    for n in range(3):
+        logger.submit({"n": n})
+    assert not logger.flush(0.3)
+    logger.close(timeout=1)
+    assert stand_in.received == []
+
+    # The app restarts after Apps Script recovers: the spool still holds all three, in order
+    stand_in.statuses = []
+    spool = Spool(path)
+    assert spool.pending() == 3
+    logger = make_logger(stand_in.url, spool)
+    assert logger.flush(5)
+    logger.close()
+    assert [p["n"] for p in stand_in.received] == [0, 1, 2]
+
+
+def test_failures_are_counted_once_per_row(tmp_path, stand_in):
+    stand_in.statuses = [503] * 5
+    logger = make_logger(stand_in.url, Spool(str(tmp_path / "s.db")), retries=0)
+    logger.submit({"n": 1})
+    assert logger.flush(5)
+    logger.close()
+    assert stand_in.requests == 6
+    assert logger.failed == 1 and logger.sent == 1
+
+
+def test_rejected_rows_are_set_aside_and_do_not_block_the_rest(tmp_path, stand_in):
+    stand_in.reject = lambda payload: payload.get("bad")
+    spool = Spool(str(tmp_path / "s.db"))
+    logger = make_logger(stand_in.url, spool, batch_size=4)
+    for n in range(6):
+        logger.submit({"n": n, "bad": n == 2})
+    assert logger.flush(5)
+    assert [p["n"] for p in stand_in.received] == [0, 1, 3, 4, 5]
+    assert [(payload["n"], reason.startswith("400")) for _, reason, payload in spool.rejected()] == [(2, True)]
+    assert logger.failed == 1
+    logger.close()
+
+
+class FlakySpool(Spool):
+    """ A spool whose reads fail a few times, like a locked or briefly unavailable database. """
+
+    failures = 3
+
+    def read(self, after, limit):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().read(after, limit)
+
+
+def test_spool_errors_do_not_stop_the_flusher(tmp_path, stand_in):
+    spool = FlakySpool(str(tmp_path / "s.db"))
+    logger = make_logger(stand_in.url, spool)
+    logger.submit({"n": 1})
+    assert logger.flush(5)
+    logger.close()
+    assert spool.failures == 0 and stand_in.received == [{"n": 1}]
+
+
+def test_spool_directory_is_created(tmp_path):
+    path = tmp_path / "nested" / "s.db"
+    Spool(str(path)).close()
+    assert os.path.exists(path)
@@ -0,0 +1,66 @@
+from submission_logger import SubmissionLogger
+
+
+def make_logger(url, **kwargs):
+    kwargs.setdefault("batch_wait", 0)
+    kwargs.setdefault("backoff", 0.01)
+    return SubmissionLogger(url=url, **kwargs)
+
+
+def test_single_payloads_are_posted_as_objects(stand_in):
+    logger = make_logger(stand_in.url, workers=1)
+    for n in range(5):
+        assert logger.submit({"n": n})
+    assert logger.flush(5)
+    logger.close()
+    assert [p["n"] for p in stand_in.received] == list(range(5))
+    assert logger.sent == 5 and logger.failed == 0
+
+
+def test_batches_are_posted_as_lists(stand_in):
+    logger = make_logger(stand_in.url, workers=1, batch_size=10, batch_wait=0.2)
+    for n in range(10):
+        logger.submit({"n": n})
+    assert logger.flush(5)
+    logger.close()
+    assert sorted(p["n"] for p in stand_in.received) == list(range(10))
+    assert stand_in.requests < 10
+
+
+def test_server_errors_are_retried(stand_in):
+    stand_in.statuses = [503, 503]
+    logger = make_logger(stand_in.url, workers=1, retries=3)
+    logger.submit({"n": 1})
+    assert logger.flush(5)
+    logger.close()
+    assert stand_in.received == [{"n": 1}]
+    assert stand_in.requests == 3 and logger.failed == 0
+
+
+def test_bad_request_is_not_retried(stand_in):
+    stand_in.statuses = [400]
+    logger = make_logger(stand_in.url, workers=1, retries=3)
+    logger.submit({"n": 1})
+    assert logger.flush(5)
+    logger.close()
+    assert stand_in.requests == 1 and logger.failed == 1
+
+
+def test_full_queue_drops_instead_of_blocking(stand_in):
+    logger = make_logger(stand_in.url, workers=1, queue_size=1)
+    logger._stop.set()  # workers stop taking from the queue
+    for thread in logger._threads:
+        thread.join(2)
+    assert logger.submit({"n": 1})
+    assert not logger.submit({"n": 2})
+    assert logger.dropped == 1
+
+
+def test_unexpected_errors_do_not_stop_the_workers(stand_in):
+    logger = make_logger(stand_in.url, workers=1)
+    logger.submit({"n": object()})  # not JSON serializable: a TypeError, not a RequestException
+    logger.submit({"n": 1})
+    assert logger.flush(5)
+    logger.close()
+    assert stand_in.received == [{"n": 1}]
+    assert logger.failed == 1 and logger.sent == 1
@@ -0,0 +1,93 @@
+"""Per-set, per-current tolerance bands from a Monte Carlo of students rounding as they solve.
+
+How far an honest answer drifts from the key depends on the circuit: some systems amplify rounding
+of intermediate values much more than others, so one global ±1 mA is too strict for a few sets.
+For every set this simulates many students solving the junction rule and two of the loop rules
+by elimination, rounding every intermediate value to 2-4 significant figures, all sets and samples
+at once in NumPy. The 95th percentile of the resulting error becomes that current's tolerance
+(never below grading.TOLERANCE, so nothing accepted before is rejected now).
+
+    python tolerances.py              # write data/tolerances.json for every set in data/problems.json
+    python tolerances.py --samples 20000 --seed 1
+
+The store loads the file next to the answer key; check_answer then looks the bands up per set.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from grading import TOLERANCE, kirchhoff_coefficients_table
+from store import TOLERANCES_PATH, get_store
+
+SAMPLES = 4000
+PERCENTILE = 95
+
+# Significant figures students keep for intermediate values, and how often
+SIG_FIGS = (2, 3, 4)
+SIG_FIG_WEIGHTS = (0.1, 0.5, 0.4)
+
+# Upper bound on any band (mA), so a badly conditioned set can't accept anything
+MAX_TOLERANCE = 3.0
+
+
+def round_sig(x, figures):
+    """ Round to a number of significant figures (elementwise; `figures` broadcasts). """
+    x = np.asarray(x, dtype=np.float64)
+    magnitude = np.floor(np.log10(np.abs(np.where(x == 0, 1.0, x))))
+    scale = 10.0 ** (figures - 1 - magnitude)
+    return np.where(x == 0, 0.0, np.round(x * scale) / scale)
+
+
+def simulate_currents(params, samples=SAMPLES, seed=0):
+    """ Currents in mA (N, samples, 3) that students would get for (N, 5) circuit parameters. """
+    rng = np.random.default_rng(seed)
+    params = np.asarray(params, dtype=np.float64)
+    n = len(params)
+    equations = kirchhoff_coefficients_table(params)  # (N, 4, 4): junction, left, right, outer loop
+
+    # Junction rule plus two of the three loops, in either order
+    pairs = np.array([[1, 2], [2, 1], [1, 3], [3, 1], [2, 3], [3, 2]])
+    rows = np.concatenate([np.zeros((n, samples, 1), dtype=np.int64), pairs[rng.integers(0, len(pairs), (n, samples))]], axis=-1)
+    chosen = np.take_along_axis(equations[:, None], rows[..., None], axis=2)  # (N, S, 3, 4)
+    system = np.concatenate([chosen[..., :3], -chosen[..., 3:]], axis=-1)     # [A | b] with A I = b
+    figures = rng.choice(SIG_FIGS, p=SIG_FIG_WEIGHTS, size=(n, samples))
+
+    # Forward elimination and back substitution, rounding every intermediate value
+    for i in range(3):
+        for j in range(i + 1, 3):
+            factor = round_sig(system[..., j, i] / system[..., i, i], figures)
+            system[..., j, :] = round_sig(system[..., j, :] - factor[..., None] * system[..., i, :], figures[..., None])
+    currents = np.zeros((n, samples, 3))
+    for i in (2, 1, 0):
+        rhs = system[..., i, 3] - (system[..., i, i + 1:3] * currents[..., i + 1:]).sum(axis=-1)
+        currents[..., i] = round_sig(rhs / system[..., i, i], figures)
+    return currents * 1000
+
+
+def tolerance_bands(params, answers, samples=SAMPLES, seed=0):
+    """ (N, 3) tolerances in mA for circuits (N, 5) with answer keys (N, 3). """
+    errors = np.abs(simulate_currents(params, samples, seed) - np.asarray(answers)[:, None, :])
+    bands = np.ceil(np.nanpercentile(errors, PERCENTILE, axis=1) * 10) / 10
+    return np.clip(bands, TOLERANCE, MAX_TOLERANCE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive per-set current tolerances by Monte Carlo.")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=TOLERANCES_PATH)
+    args = parser.parse_args()
+
+    store = get_store()
+    sets = store.set_numbers
+    bands = tolerance_bands(store.problems[sets], store.answers[sets], args.samples, args.seed)
+    with open(args.output, "w") as file:
+        json.dump({str(s): band for s, band in zip(sets, bands.tolist())}, file, indent=4)
+        file.write("\n")
+    for s, band in zip(sets, bands.tolist()):
+        print(f"Set {s}: ±{band[0]:.1f} / ±{band[1]:.1f} / ±{band[2]:.1f} mA")
+
+
+if __name__ == "__main__":
+    main()